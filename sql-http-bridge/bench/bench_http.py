@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Load benchmark: sql_http_service.py throughput, latency and memory.
+
+Starts the service on a free local port against a stand-in backend, drives
+it with concurrent keep-alive (or connection-per-request) clients for a
+fixed time per concurrency level, and reports requests/s, p50/p95/p99
+latency and service RSS. Results are written as JSON so later runs can be
+compared against a saved baseline offline.
+
+Backends:
+  sqlcmd  the real SqlcmdBackend spawning bench/fake_sqlcmd.py per call (POSIX)
+  fake    bench/fake_service.py: in-memory driver-like backend, no processes
+
+Usage:
+  python bench/bench_http.py --backend sqlcmd --rows 100 --latency-ms 20 \\
+      --concurrency 1,8,32 --duration 10 --output bench/results/baseline.json
+  python bench/bench_http.py ... --compare bench/results/baseline.json
+"""
+
+import argparse
+import collections
+import datetime
+import http.client
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICE = os.path.join(BENCH_DIR, "..", "service", "sql_http_service.py")
+
+# Metrics compared against a baseline: (key path, higher_is_better)
+_COMPARED = (
+    (("rps",), True),
+    (("latency_ms", "p50"), False),
+    (("latency_ms", "p95"), False),
+    (("latency_ms", "p99"), False),
+    (("rss_mb", "max"), False),
+)
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _rss_mb(pid):
+    """Resident set size of `pid` in MB, or None where it cannot be read."""
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss / 1048576.0
+        except psutil.Error:
+            return None
+    try:
+        with open("/proc/%d/status" % pid) as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class ServiceUnderTest:
+    """The bridge running in a child process with a generated config."""
+
+    def __init__(self, args):
+        self.args = args
+        self.workdir = tempfile.mkdtemp(prefix="sqlbridge-bench-")
+        self.port = _free_port()
+        self.proc = None
+
+    def _write_config(self):
+        settings = {
+            "sql_server": "localhost",
+            "database": "BenchDB",
+            "port": str(self.port),
+            "allowed_procs": "Bench:dbo.Api_Bench",
+            "workers": str(self.args.workers),
+            # measure the execution path itself unless asked otherwise
+            "max_concurrent_per_proc": "0",
+            "coalesce_requests": "false",
+        }
+        for item in self.args.set:
+            key, _, value = item.partition("=")
+            settings[key.strip()] = value.strip()
+        path = os.path.join(self.workdir, "bench.conf")
+        with open(path, "w") as f:
+            f.write("[service]\n")
+            for key, value in settings.items():
+                f.write("%s=%s\n" % (key, value))
+        return path
+
+    def _write_sqlcmd_shim(self):
+        if platform.system().lower().startswith("win"):
+            raise SystemExit("--backend sqlcmd needs a POSIX shell; use --backend fake on Windows")
+        shim = os.path.join(self.workdir, "sqlcmd")
+        with open(shim, "w") as f:
+            f.write('#!/bin/sh\nexec "%s" "%s" "$@"\n'
+                    % (sys.executable, os.path.join(BENCH_DIR, "fake_sqlcmd.py")))
+        os.chmod(shim, 0o755)
+
+    def start(self):
+        conf = self._write_config()
+        env = dict(os.environ)
+        env.update({
+            "FAKE_SQLCMD_ROWS": str(self.args.rows),
+            "FAKE_SQLCMD_COLS": str(self.args.cols),
+            "FAKE_SQLCMD_SETS": str(self.args.sets),
+            "FAKE_SQLCMD_LATENCY_MS": str(self.args.latency_ms),
+            "FAKE_SQLCMD_JITTER_MS": str(self.args.jitter_ms),
+            "FAKE_SQLCMD_CACHE_DIR": self.workdir,
+        })
+        if self.args.backend == "sqlcmd":
+            self._write_sqlcmd_shim()
+            env["PATH"] = self.workdir + os.pathsep + env.get("PATH", "")
+            cmd = [sys.executable, SERVICE, conf]
+        else:
+            cmd = [sys.executable, os.path.join(BENCH_DIR, "fake_service.py"), conf]
+
+        self.log = open(os.path.join(self.workdir, "service.log"), "w")
+        self.proc = subprocess.Popen(cmd, env=env, stdout=self.log, stderr=subprocess.STDOUT)
+
+        deadline = time.monotonic() + 15
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise SystemExit("service exited during startup, see %s" % self.log.name)
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=1)
+                conn.request("GET", "/stats")
+                conn.getresponse().read()
+                conn.close()
+                return
+            except OSError:
+                time.sleep(0.1)
+        raise SystemExit("service did not start listening on port %d" % self.port)
+
+    def stop(self):
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+        if self.proc is not None:
+            self.log.close()
+        if self.args.keep_workdir:
+            print("Service config and log kept in %s" % self.workdir)
+        else:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def run_level(port, path, concurrency, duration, keepalive, pid):
+    """Run `concurrency` clients for `duration` seconds; returns one result dict."""
+    headers = {} if keepalive else {"Connection": "close"}
+    stop_at = None      # set when every client is ready
+    per_client = []
+    start_barrier = threading.Barrier(concurrency + 1)
+
+    def client():
+        latencies = []
+        statuses = collections.Counter()
+        per_client.append((latencies, statuses))
+        conn = None
+        start_barrier.wait()
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            # Like common HTTP clients, retry once when a reused connection
+            # turns out to have been closed by the server while idle
+            for attempt in (0, 1):
+                reused = conn is not None
+                try:
+                    if conn is None:
+                        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+                    conn.request("GET", path, headers=headers)
+                    resp = conn.getresponse()
+                    resp.read()
+                    status = resp.status
+                    if resp.will_close:
+                        conn.close()
+                        conn = None
+                    break
+                except (OSError, http.client.HTTPException) as ex:
+                    status = "error"
+                    if conn is not None:
+                        conn.close()
+                    conn = None
+                    if not (reused and isinstance(ex, (http.client.RemoteDisconnected,
+                                                       ConnectionResetError, BrokenPipeError))):
+                        break
+            latencies.append(time.perf_counter() - started)
+            statuses[status] += 1
+        if conn is not None:
+            conn.close()
+
+    rss_samples = []
+    sampling = threading.Event()
+
+    def sample_rss():
+        while not sampling.wait(0.2):
+            rss = _rss_mb(pid)
+            if rss is not None:
+                rss_samples.append(rss)
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    rss_start = _rss_mb(pid)
+    started = time.perf_counter()
+    stop_at = started + duration
+    start_barrier.wait()
+    sampler.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    sampling.set()
+    sampler.join()
+    rss_end = _rss_mb(pid)
+
+    latencies = sorted(x for lats, _ in per_client for x in lats)
+    statuses = collections.Counter()
+    for _, s in per_client:
+        statuses.update(s)
+    ok = sum(n for status, n in statuses.items() if status == 200)
+    rss_all = [x for x in [rss_start] + rss_samples + [rss_end] if x is not None]
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 3),
+        "requests": len(latencies),
+        "errors": len(latencies) - ok,
+        "status_counts": {str(k): v for k, v in sorted(statuses.items(), key=str)},
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            "mean": ms(sum(latencies) / len(latencies)) if latencies else None,
+            "p50": ms(_percentile(latencies, 50)),
+            "p95": ms(_percentile(latencies, 95)),
+            "p99": ms(_percentile(latencies, 99)),
+            "max": ms(latencies[-1] if latencies else None),
+        },
+        "rss_mb": {
+            "start": round(rss_start, 1) if rss_start is not None else None,
+            "max": round(max(rss_all), 1) if rss_all else None,
+            "end": round(rss_end, 1) if rss_end is not None else None,
+        },
+    }
+
+
+def _lookup(level, key_path):
+    value = level
+    for key in key_path:
+        value = (value or {}).get(key)
+    return value
+
+
+def compare(results, baseline, tolerance):
+    """Print per-level deltas against `baseline`; returns the regressions found."""
+    by_concurrency = {lvl["concurrency"]: lvl for lvl in baseline.get("levels", [])}
+    regressions = []
+    print("\nAgainst baseline %s (tolerance %.0f%%):" % (baseline.get("created", "?"), tolerance * 100))
+    for level in results["levels"]:
+        base = by_concurrency.get(level["concurrency"])
+        if base is None:
+            print("  c=%-4d no baseline level" % level["concurrency"])
+            continue
+        parts = []
+        for key_path, higher_is_better in _COMPARED:
+            new, old = _lookup(level, key_path), _lookup(base, key_path)
+            if new is None or not old:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            label = ".".join(key_path)
+            flag = ""
+            if worse > tolerance:
+                flag = " REGRESSION"
+                regressions.append((level["concurrency"], label, old, new))
+            parts.append("%s %+.1f%%%s" % (label, change * 100, flag))
+        print("  c=%-4d %s" % (level["concurrency"], ", ".join(parts)))
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    ap.add_argument("--backend", choices=("sqlcmd", "fake"), default="sqlcmd")
+    ap.add_argument("--rows", type=int, default=100, help="rows per result set")
+    ap.add_argument("--cols", type=int, default=8, help="columns per result set")
+    ap.add_argument("--sets", type=int, default=1, help="result sets per call")
+    ap.add_argument("--latency-ms", type=int, default=0, help="injected execution latency")
+    ap.add_argument("--jitter-ms", type=int, default=0, help="extra random latency, 0..N ms")
+    ap.add_argument("--format", default="json", help="format= request parameter")
+    ap.add_argument("--stream", action="store_true", help="request stream=1")
+    ap.add_argument("--concurrency", default="1,8,32", help="comma-separated client counts")
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    ap.add_argument("--warmup", type=float, default=2.0, help="seconds before the first level")
+    ap.add_argument("--no-keepalive", action="store_true", help="one connection per request")
+    ap.add_argument("--workers", type=int, default=8, help="service worker threads")
+    ap.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                    help="extra [service] config setting (repeatable)")
+    ap.add_argument("--output", help="write results JSON here")
+    ap.add_argument("--compare", metavar="BASELINE", help="compare against a results JSON")
+    ap.add_argument("--tolerance", type=float, default=10.0, help="allowed regression, percent")
+    ap.add_argument("--keep-workdir", action="store_true", help="keep generated config and log")
+    args = ap.parse_args()
+
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    query = {"proc": "Bench", "user": "bench", "pass": "bench", "format": args.format}
+    if args.stream:
+        query["stream"] = "1"
+    path = "/api?" + urllib.parse.urlencode(query)
+
+    service = ServiceUnderTest(args)
+    service.start()
+    try:
+        if args.warmup > 0:
+            run_level(service.port, path, min(levels), args.warmup, not args.no_keepalive,
+                      service.proc.pid)
+
+        results = {
+            "suite": "sql-http-bridge",
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "host": {
+                "node": platform.node(),
+                "platform": platform.platform(),
+                "python": platform.python_version(),
+                "cpus": os.cpu_count(),
+            },
+            "config": {
+                "backend": args.backend,
+                "rows": args.rows,
+                "cols": args.cols,
+                "sets": args.sets,
+                "latency_ms": args.latency_ms,
+                "jitter_ms": args.jitter_ms,
+                "format": args.format,
+                "stream": args.stream,
+                "keepalive": not args.no_keepalive,
+                "workers": args.workers,
+                "duration_s": args.duration,
+                "settings": args.set,
+            },
+            "levels": [],
+        }
+
+        print("%-6s %9s %8s %9s %9s %9s %9s %8s" % (
+            "conc", "requests", "errors", "req/s", "p50 ms", "p95 ms", "p99 ms", "RSS MB"))
+        for concurrency in levels:
+            level = run_level(service.port, path, concurrency, args.duration,
+                              not args.no_keepalive, service.proc.pid)
+            results["levels"].append(level)
+            lat = level["latency_ms"]
+            print("%-6d %9d %8d %9.1f %9.2f %9.2f %9.2f %8s" % (
+                concurrency, level["requests"], level["errors"], level["rps"] or 0,
+                lat["p50"] or 0, lat["p95"] or 0, lat["p99"] or 0, level["rss_mb"]["max"]))
+    finally:
+        service.stop()
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print("Results written to %s" % args.output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("config", {}).get("backend") != args.backend:
+            print("Warning: baseline used backend %s" % baseline.get("config", {}).get("backend"))
+        if compare(results, baseline, args.tolerance / 100.0):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: sqlcmd output parsing.
+
+Compares the original line-by-line parser that lived in
+SQLHttpHandler.handle_request (strings only, per-row dicts) against
+service/sqlcmd_parser.py, untyped and typed, on synthetic `sqlcmd -W -s "|"`
+output; the "+ encode" cases include building the response body.
+
+Usage: python bench/bench_parser.py [--rows 100000] [--cols 8] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "service"))
+
+from fake_sqlcmd import make_output  # noqa: E402
+from output_formats import render  # noqa: E402
+from sqlcmd_parser import parse_result_sets  # noqa: E402
+
+
+def legacy_parse(stdout):
+    """The parser from handle_request before sqlcmd_parser existed."""
+    lines = stdout.strip().splitlines()
+
+    if len(lines) < 3:
+        return []
+
+    header_line = lines[0]
+    data_lines = []
+    for line in lines[2:]:
+        if "rows affected" in line:
+            break
+        if line.strip() == "":
+            continue
+        data_lines.append(line)
+
+    cols = [h.strip() for h in header_line.split("|")]
+
+    rows_json = []
+    for dl in data_lines:
+        vals = [v.strip() for v in dl.split("|")]
+        row_obj = {}
+        for idx, col_name in enumerate(cols):
+            row_obj[col_name] = vals[idx] if idx < len(vals) else None
+        rows_json.append(row_obj)
+    return rows_json
+
+
+def best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    ap.add_argument("--rows", type=int, default=100000)
+    ap.add_argument("--cols", type=int, default=8)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    text = make_output(args.rows, args.cols)
+    print("Input: %d rows x %d cols, %.1f MB" % (args.rows, args.cols, len(text) / 1e6))
+
+    # Sanity check: both parsers see the same rows
+    legacy_rows = legacy_parse(text)
+    (cols, rows), = parse_result_sets(text)
+    assert len(legacy_rows) == len(rows) == args.rows
+    assert list(legacy_rows[-1].values()) == list(rows[-1])
+
+    cases = [
+        ("legacy (dict rows, strings)", lambda: legacy_parse(text)),
+        ("sqlcmd_parser (untyped)", lambda: parse_result_sets(text)),
+        ("sqlcmd_parser (typed)", lambda: parse_result_sets(text, typed=True)),
+    ]
+    encode_cases = [
+        ("legacy + json indent=2", lambda: json.dumps(
+            {"proc": "p", "sp_name": "p", "rows": legacy_parse(text), "row_count": args.rows}, indent=2)),
+        ("untyped + json", lambda: "".join(
+            render("json", "p", "p", *parse_result_sets(text)[0]))),
+        ("typed + columnar", lambda: "".join(
+            render("columnar", "p", "p", *parse_result_sets(text, typed=True)[0]))),
+    ]
+    run_cases(cases, args)
+    run_cases(encode_cases, args)
+
+
+def run_cases(cases, args):
+    baseline = None
+    for label, fn in cases:
+        elapsed = best_of(fn, args.repeat)
+        baseline = baseline or elapsed
+        print("%-30s %8.1f ms  %10.0f rows/s  %5.2fx" % (
+            label, elapsed * 1000, args.rows / elapsed, baseline / elapsed))
+
+
+if __name__ == "__main__":
+    main()
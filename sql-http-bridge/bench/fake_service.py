@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Run sql_http_service.py with an in-memory fake driver backend.
+
+Same config file and HTTP behaviour as the real service, but executions
+return a pre-built result after an optional delay instead of calling SQL
+Server, so the HTTP, cache and serialization layers can be measured on
+their own (and on Windows, where the sqlcmd stand-in cannot be used).
+Result shape comes from the same FAKE_SQLCMD_* variables as fake_sqlcmd.py.
+
+Usage: python bench/fake_service.py <path to sql-http-service.conf>
+"""
+
+import contextlib
+import datetime
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "service"))
+
+import sql_http_service  # noqa: E402
+from sql_backends import ExecutionError  # noqa: E402
+
+
+class FakeBackend:
+    """Driver-like backend: native values, every result set, no processes."""
+
+    name = "fake"
+
+    def __init__(self, rows=100, cols=8, sets=1, latency_ms=0, jitter_ms=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        base = datetime.datetime(2025, 10, 1, 12, 0, 0)
+        self.result_sets = []
+        for s in range(sets):
+            names = ["Col%d" % i for i in range(cols)]
+            data = []
+            for r in range(rows):
+                row = []
+                for c in range(cols):
+                    kind = c % 4
+                    if kind == 0:
+                        row.append(r * 7 + c + s)
+                    elif kind == 1:
+                        row.append((r % 10000) + (r % 100) / 100.0)
+                    elif kind == 2:
+                        row.append(base + datetime.timedelta(seconds=r))
+                    else:
+                        row.append(None if r % 13 == 0 else "server-%d" % (r % 500))
+                data.append(tuple(row))
+            self.result_sets.append((names, data))
+
+    def _wait(self, password):
+        delay_ms = self.latency_ms
+        if self.jitter_ms:
+            delay_ms += random.uniform(0, self.jitter_ms)
+        if delay_ms:
+            time.sleep(delay_ms / 1000.0)
+        if password == "bad":
+            raise ExecutionError("login failed")
+
+    def execute(self, sp_name, login, password, timings=None, params=(), timeout=None,
+                client_gone=None):
+        started = time.perf_counter()
+        self._wait(password)
+        if timings is not None:
+            timings["exec"] = time.perf_counter() - started
+            timings["parse"] = 0.0
+        return self.result_sets
+
+    @contextlib.contextmanager
+    def stream(self, sp_name, login, password, params=(), timeout=None, client_gone=None,
+               typed=None):
+        self._wait(password)
+        cols, rows = self.result_sets[0] if self.result_sets else ([], [])
+        yield cols, iter(rows)
+
+    def authenticate(self, login, password):
+        self._wait(password)
+
+    def insert_rows(self, table, specs, rows, login, password):
+        self._wait(password)
+
+    def close(self):
+        pass
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: fake_service.py <path to sql-http-service.conf>", file=sys.stderr)
+        sys.exit(1)
+
+    env = os.environ.get
+    backend = FakeBackend(
+        rows=int(env("FAKE_SQLCMD_ROWS", 100)),
+        cols=int(env("FAKE_SQLCMD_COLS", 8)),
+        sets=int(env("FAKE_SQLCMD_SETS", 1)),
+        latency_ms=int(env("FAKE_SQLCMD_LATENCY_MS", 0)),
+        jitter_ms=int(env("FAKE_SQLCMD_JITTER_MS", 0)),
+    )
+    sql_http_service.create_backend = lambda settings: backend
+    sql_http_service.run_server(sys.argv[1])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Stand-in for sqlcmd used by the bridge benchmarks.
+
+Prints a synthetic result in the layout `sqlcmd -s "|"` produces (trimmed
+with -W, padded to fixed width without it), after an optional delay, so
+sql_http_service.py can be measured without a SQL Server. The result shape
+comes from the environment:
+
+  FAKE_SQLCMD_ROWS        data rows per result set (default 100)
+  FAKE_SQLCMD_COLS        columns (default 8)
+  FAKE_SQLCMD_SETS        result sets per call (default 1)
+  FAKE_SQLCMD_LATENCY_MS  delay before any output (default 0)
+  FAKE_SQLCMD_JITTER_MS   extra random delay, uniform 0..N (default 0)
+  FAKE_SQLCMD_CACHE_DIR   reuse generated output across calls (optional)
+
+A password of "bad" fails like a rejected login (message on stderr, rc=1).
+"""
+
+import os
+import random
+import sys
+import time
+
+
+def make_output(rows, cols, sets=1, trimmed=True):
+    """Synthetic sqlcmd output mixing int, decimal, datetime, text and NULL columns."""
+    blocks = []
+    for s in range(sets):
+        names = ["Col%d" % i for i in range(cols)]
+        data = []
+        for r in range(rows):
+            vals = []
+            for c in range(cols):
+                kind = c % 4
+                if kind == 0:
+                    vals.append(str(r * 7 + c + s))
+                elif kind == 1:
+                    vals.append("%d.%02d" % (r % 10000, r % 100))
+                elif kind == 2:
+                    vals.append("2025-10-%02d 12:%02d:%02d.123" % (r % 28 + 1, r % 60, c % 60))
+                else:
+                    vals.append("NULL" if r % 13 == 0 else "server-%d" % (r % 500))
+            data.append(vals)
+
+        if trimmed:
+            lines = ["|".join(names), "|".join("-" * len(n) for n in names)]
+            lines.extend("|".join(vals) for vals in data)
+        else:
+            widths = [max([len(n)] + [len(vals[c]) for vals in data]) for c, n in enumerate(names)]
+            lines = [
+                "|".join(n.ljust(w) for n, w in zip(names, widths)),
+                "|".join("-" * w for w in widths),
+            ]
+            lines.extend("|".join(v.ljust(w) for v, w in zip(vals, widths)) for vals in data)
+        blocks.append("\n".join(lines) + "\n")
+    return "\n".join(blocks)
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def main(argv):
+    if "-P" in argv and argv[argv.index("-P") + 1] == "bad":
+        print("Sqlcmd: Error: Login failed for user.", file=sys.stderr)
+        return 1
+
+    rows = _env_int("FAKE_SQLCMD_ROWS", 100)
+    cols = _env_int("FAKE_SQLCMD_COLS", 8)
+    sets = _env_int("FAKE_SQLCMD_SETS", 1)
+    trimmed = "-W" in argv
+    delay_ms = _env_int("FAKE_SQLCMD_LATENCY_MS", 0)
+    jitter_ms = _env_int("FAKE_SQLCMD_JITTER_MS", 0)
+    if jitter_ms:
+        delay_ms += random.uniform(0, jitter_ms)
+    if delay_ms:
+        time.sleep(delay_ms / 1000.0)
+
+    # A trivial batch (authentication check) prints a single value
+    query = argv[argv.index("-Q") + 1] if "-Q" in argv else ""
+    if "EXEC" not in query.upper():
+        sys.stdout.write("\n-----------\n1\n")
+        return 0
+
+    cache_dir = os.environ.get("FAKE_SQLCMD_CACHE_DIR")
+    if not cache_dir:
+        sys.stdout.write(make_output(rows, cols, sets, trimmed))
+        return 0
+
+    path = os.path.join(cache_dir, "out_%d_%d_%d_%d.txt" % (rows, cols, sets, trimmed))
+    if not os.path.exists(path):
+        tmp = "%s.%d" % (path, os.getpid())
+        with open(tmp, "w", newline="\n") as f:
+            f.write(make_output(rows, cols, sets, trimmed))
+        os.replace(tmp, path)
+    with open(path, "rb") as f:
+        sys.stdout.flush()
+        sys.stdout.buffer.write(f.read())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Admission control for the SQL HTTP bridge.
+
+Every execution against SQL Server (a sqlcmd process or a pooled driver
+call) first takes a slot for its proc key and a slot for its login. Each
+limit has a bounded wait queue and callers wait at most `queue_timeout`
+seconds; beyond that the call fails fast with Overloaded, which the handler
+turns into 503 + Retry-After. A refresh storm therefore queues briefly and
+then sheds load instead of piling up processes and SQL sessions.
+
+Cache hits and coalesced requests never reach admission control.
+"""
+
+import contextlib
+import threading
+import time
+
+from sql_backends import BackendUnavailable
+
+
+class Overloaded(BackendUnavailable):
+    """A concurrency limit and its wait queue are full, or the wait timed out."""
+
+    def __init__(self, message, reason, retry_after):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Gate:
+    """Counting limit with a bounded number of waiters."""
+
+    __slots__ = ("limit", "active", "waiting")
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.waiting = 0
+
+
+class AdmissionController:
+    """
+    Per-proc and per-login concurrency limits (0 = unlimited).
+
+    `proc_limits` overrides `per_proc` for individual proc keys. At most
+    `max_waiting` callers wait on any one limit.
+    """
+
+    def __init__(self, per_proc=4, per_login=0, proc_limits=None, max_waiting=16,
+                 queue_timeout=10.0, retry_after=2):
+        self.per_proc = per_proc
+        self.per_login = per_login
+        self.proc_limits = dict(proc_limits or {})
+        self.max_waiting = max_waiting
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+        self._lock = threading.Condition()
+        self._gates = {}            # ("proc" | "login", key) -> _Gate
+        self._rejected = {"queue_full": 0, "queue_timeout": 0, "queue_wait": 0}
+        self._admitted = 0
+        self._waited = 0
+
+    def _limit_for(self, kind, key):
+        if kind == "proc":
+            return self.proc_limits.get(key, self.per_proc)
+        return self.per_login
+
+    def _reject(self, reason, what):
+        self._rejected[reason] += 1
+        return Overloaded("%s for %s" % (reason.replace("_", " "), what),
+                          reason, self.retry_after)
+
+    def _enter(self, kind, key, deadline):
+        """Take one slot on the (kind, key) gate; caller holds self._lock."""
+        limit = self._limit_for(kind, key)
+        if limit <= 0:
+            return None
+        gate_key = (kind, key)
+        gate = self._gates.get(gate_key)
+        if gate is None:
+            gate = self._gates[gate_key] = _Gate(limit)
+        if gate.active < gate.limit:
+            gate.active += 1
+            return gate_key
+
+        if gate.waiting >= self.max_waiting:
+            raise self._reject("queue_full", "%s %s" % (kind, key))
+        gate.waiting += 1
+        self._waited += 1
+        try:
+            while gate.active >= gate.limit:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise self._reject("queue_timeout", "%s %s" % (kind, key))
+                self._lock.wait(remaining)
+            gate.active += 1
+            return gate_key
+        finally:
+            gate.waiting -= 1
+            if gate.active == 0 and gate.waiting == 0:
+                del self._gates[gate_key]
+
+    def _leave(self, gate_key):
+        """Release one slot; caller holds self._lock."""
+        if gate_key is None:
+            return
+        gate = self._gates[gate_key]
+        gate.active -= 1
+        if gate.active == 0 and gate.waiting == 0:
+            del self._gates[gate_key]
+        self._lock.notify_all()
+
+    @contextlib.contextmanager
+    def admit(self, proc_key, login):
+        """Hold a proc slot and a login slot for the duration of the block."""
+        deadline = time.monotonic() + self.queue_timeout
+        with self._lock:
+            proc_gate = self._enter("proc", proc_key, deadline)
+            try:
+                login_gate = self._enter("login", login, deadline)
+            except Overloaded:
+                self._leave(proc_gate)
+                raise
+            self._admitted += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._leave(login_gate)
+                self._leave(proc_gate)
+
+    def check_queue_wait(self, waited):
+        """Raise Overloaded if a request already waited longer than queue_timeout."""
+        if waited > self.queue_timeout:
+            with self._lock:
+                raise self._reject("queue_wait", "request (%.1fs in server queue)" % waited)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "admitted": self._admitted,
+                "waited": self._waited,
+                "rejected": dict(self._rejected),
+                # per proc key only; login names stay out of /stats
+                "active": {
+                    key: gate.active
+                    for (kind, key), gate in self._gates.items()
+                    if kind == "proc"
+                },
+            }
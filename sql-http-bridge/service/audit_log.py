@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Asynchronous, batched audit trail for the SQL HTTP bridge.
+
+Request threads hand each audit record to AuditWriter.record(), which only
+appends to a bounded in-memory queue. A background thread collects records
+until `batch_size` are waiting or `flush_interval` seconds have passed and
+bulk-inserts them into DBATools.dbo.Api_AccessLog in one round trip, using
+a dedicated audit login through the configured backend.
+
+If the insert fails (database down, login rejected) the batch is appended
+to a local spill file as JSON lines and replayed after the next successful
+insert, so audit logging never blocks or fails a request. When the queue
+or the spill file is full, records are dropped and counted instead.
+"""
+
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from proc_params import ProcParam
+
+# Api_AccessLog columns (sql/DBA_setup.sql); text is cut to the column size
+# so a long value can never fail the whole batch
+AUDIT_COLUMNS = (
+    ProcParam("AccessedDate", "datetime"),
+    ProcParam("ProcName", "varchar", 200),
+    ProcParam("LoginUsed", "varchar", 200),
+    ProcParam("ClientInfo", "varchar", 4000),
+)
+
+
+def _fit(value, spec):
+    if value is None or spec.size is None:
+        return value
+    return value[:spec.size]
+
+
+def spill_path_problem(path):
+    """Why the spill file cannot be appended to, or None if it can."""
+    directory = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(directory):
+        return "directory %s does not exist" % directory
+    if os.path.exists(path):
+        if not os.access(path, os.W_OK):
+            return "%s is not writable" % path
+    elif not os.access(directory, os.W_OK | os.X_OK):
+        return "directory %s is not writable" % directory
+    return None
+
+
+class AuditWriter:
+    """Bounded queue plus one writer thread that bulk-inserts audit rows."""
+
+    def __init__(self, backend, table, login, password, batch_size=200,
+                 flush_interval=2.0, queue_size=10000, spill_path=None,
+                 spill_max_bytes=100 * 1024 * 1024):
+        self.backend = backend
+        self.table = table
+        self.login = login
+        self.password = password
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.spill_path = spill_path
+        self.spill_max_bytes = spill_max_bytes
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._written = 0
+        self._dropped = 0
+        self._spilled = 0
+        self._replayed = 0
+        self._failures = 0
+
+        problem = spill_path_problem(spill_path) if spill_path else None
+        if problem:
+            logging.error("Audit spill file unusable (%s): audit rows are dropped "
+                          "whenever the database rejects an insert", problem)
+
+        self._thread = threading.Thread(target=self._run, name="sql-audit-writer",
+                                        daemon=True)
+        self._thread.start()
+
+    def record(self, proc_name, login, client_info):
+        """Queue one access record. Never blocks; drops it if the queue is full."""
+        row = (datetime.datetime.now(), proc_name, login, client_info)
+        with self._cond:
+            if len(self._queue) >= self.queue_size:
+                self._dropped += 1
+                return
+            self._queue.append(row)
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify()
+
+    def _take_batch(self):
+        """Wait for a full batch or the flush interval; [] once closed and empty."""
+        deadline = time.monotonic() + self.flush_interval
+        with self._cond:
+            while len(self._queue) < self.batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(len(self._queue), self.batch_size)
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch:
+                if self._insert(batch):
+                    self._replay_spill()
+                else:
+                    self._spill(batch)
+            elif self._closed:
+                return
+
+    def _insert(self, rows):
+        rows = [tuple(_fit(v, spec) for v, spec in zip(row, AUDIT_COLUMNS)) for row in rows]
+        try:
+            self.backend.insert_rows(self.table, AUDIT_COLUMNS, rows,
+                                     self.login, self.password)
+        except Exception as ex:
+            self._failures += 1
+            logging.warning("Audit insert of %d rows failed: %s", len(rows), ex)
+            return False
+        self._written += len(rows)
+        return True
+
+    def _spill(self, rows):
+        if not self.spill_path:
+            self._dropped += len(rows)
+            return
+        lines = "".join(
+            json.dumps([row[0].isoformat()] + list(row[1:])) + "\n" for row in rows
+        )
+        try:
+            size = os.path.getsize(self.spill_path) if os.path.exists(self.spill_path) else 0
+            if size + len(lines) > self.spill_max_bytes:
+                logging.error("Audit spill file %s is full, dropping %d rows",
+                              self.spill_path, len(rows))
+                self._dropped += len(rows)
+                return
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                f.write(lines)
+            self._spilled += len(rows)
+        except OSError as ex:
+            logging.error("Audit spill to %s failed: %s", self.spill_path, ex)
+            self._dropped += len(rows)
+
+    def _replay_spill(self):
+        """Insert spilled rows once the database accepts inserts again."""
+        if not self.spill_path:
+            return
+        # A .replay file left by a crash mid-replay is picked up first; its
+        # rows may be inserted twice, but none are lost
+        replaying = self.spill_path + ".replay"
+        rows = []
+        try:
+            if not os.path.exists(replaying):
+                if not os.path.exists(self.spill_path):
+                    return
+                os.replace(self.spill_path, replaying)
+            with open(replaying, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        stamp, proc_name, login, client_info = json.loads(line)
+                        rows.append((datetime.datetime.fromisoformat(stamp),
+                                     proc_name, login, client_info))
+                    except ValueError:
+                        continue    # torn line from a crash mid-write
+        except OSError as ex:
+            logging.error("Audit spill replay from %s failed: %s", self.spill_path, ex)
+            return
+
+        logging.info("Replaying %d spilled audit rows", len(rows))
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            if not self._insert(batch):
+                # Database went away again: keep the rest for the next replay
+                self._spill(rows[start:])
+                break
+            self._replayed += len(batch)
+        try:
+            os.remove(replaying)
+        except OSError as ex:
+            logging.error("Could not remove %s: %s", replaying, ex)
+
+    def stats(self):
+        with self._cond:
+            queued = len(self._queue)
+        return {
+            "queued": queued,
+            "written": self._written,
+            "spilled": self._spilled,
+            "replayed": self._replayed,
+            "dropped": self._dropped,
+            "failures": self._failures,
+        }
+
+    def close(self, timeout=10.0):
+        """Flush what is queued (or spill it) and stop the writer thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
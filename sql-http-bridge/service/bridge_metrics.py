@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Prometheus-style metrics for the SQL HTTP bridge.
+
+Every thread writes to its own shard (plain dicts reached through a
+threading.local), so recording a counter or histogram sample takes no lock
+and never contends with other workers. Shards are only merged when
+/metrics is scraped; shards of threads that have exited are folded into a
+retired total so short-lived threads do not accumulate.
+"""
+
+import bisect
+import threading
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+
+class _Shard:
+    __slots__ = ("thread", "values", "histograms")
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.values = {}        # (name, labels) -> number (counters and gauges)
+        self.histograms = {}    # (name, labels) -> [bucket counts..., +Inf, sum, count]
+
+
+def _snapshot(d):
+    # Another thread may add keys while we copy; retry rather than lock
+    while True:
+        try:
+            return list(d.items())
+        except RuntimeError:
+            continue
+
+
+def _format_labels(labels, extra=()):
+    pairs = tuple(labels) + tuple(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(
+        '%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    ) + "}"
+
+
+def _format_value(v):
+    if isinstance(v, float):
+        return repr(v)
+    return str(v)
+
+
+class MetricsRegistry:
+    """
+    Lock-free (per-thread) counters, gauges and histograms.
+
+    Labels are passed as a tuple of (name, value) pairs and must come from
+    a bounded set (route names, allowlisted proc keys, status codes).
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        self._retired = _Shard(None)
+        self._meta = {}
+
+    def describe(self, name, kind, help_text):
+        """Register TYPE / HELP lines for a metric family."""
+        self._meta[name] = (kind, help_text)
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = _Shard(threading.current_thread())
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def inc(self, name, labels=(), value=1):
+        """Add to a counter, or to a gauge when value may be negative."""
+        values = self._shard().values
+        key = (name, labels)
+        values[key] = values.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        """Record one histogram sample."""
+        histograms = self._shard().histograms
+        key = (name, labels)
+        h = histograms.get(key)
+        if h is None:
+            h = histograms[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        h[bisect.bisect_left(self.buckets, value)] += 1
+        h[-2] += value
+        h[-1] += 1
+
+    def _merge(self):
+        with self._shards_lock:
+            live = []
+            for shard in self._shards:
+                if shard.thread.is_alive():
+                    live.append(shard)
+                else:
+                    self._fold(self._retired, shard)
+            self._shards = live
+            shards = [self._retired] + live
+
+        values = {}
+        histograms = {}
+        for shard in shards:
+            for key, v in _snapshot(shard.values):
+                values[key] = values.get(key, 0) + v
+            for key, h in _snapshot(shard.histograms):
+                acc = histograms.get(key)
+                if acc is None:
+                    histograms[key] = list(h)
+                else:
+                    for i, x in enumerate(h):
+                        acc[i] += x
+        return values, histograms
+
+    @staticmethod
+    def _fold(into, shard):
+        for key, v in shard.values.items():
+            into.values[key] = into.values.get(key, 0) + v
+        for key, h in shard.histograms.items():
+            acc = into.histograms.get(key)
+            if acc is None:
+                into.histograms[key] = list(h)
+            else:
+                for i, x in enumerate(h):
+                    acc[i] += x
+
+    def render(self, extra_values=()):
+        """
+        Prometheus text exposition of every recorded metric, plus
+        `extra_values`: (name, labels, value) samples read at scrape time.
+        """
+        values, histograms = self._merge()
+        for name, labels, v in extra_values:
+            values[(name, labels)] = v
+
+        families = {}
+        for (name, labels), v in values.items():
+            families.setdefault(name, []).append((labels, v))
+        for (name, labels), h in histograms.items():
+            families.setdefault(name, []).append((labels, h))
+
+        lines = []
+        for name in sorted(families):
+            kind, help_text = self._meta.get(name, ("untyped", ""))
+            if help_text:
+                lines.append("# HELP %s %s" % (name, help_text))
+            lines.append("# TYPE %s %s" % (name, kind))
+            for labels, v in sorted(families[name], key=lambda item: item[0]):
+                if kind != "histogram":
+                    lines.append("%s%s %s" % (name, _format_labels(labels), _format_value(v)))
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), v[:-2]):
+                    cumulative += count
+                    le = bound if isinstance(bound, str) else _format_value(float(bound))
+                    lines.append("%s_bucket%s %d" % (name, _format_labels(labels, (("le", le),)), cumulative))
+                lines.append("%s_sum%s %s" % (name, _format_labels(labels), _format_value(v[-2])))
+                lines.append("%s_count%s %d" % (name, _format_labels(labels), v[-1]))
+        return "\n".join(lines) + "\n"
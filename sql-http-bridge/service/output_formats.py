@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Response encoders for the SQL HTTP bridge.
+
+Every format is rendered straight from (columns, row sequences) without
+building a dict per row:
+
+- json:     {"proc", "sp_name", "rows": [{col: value}], "row_count"}
+- columnar: {"proc", "sp_name", "row_count", "columns": [...],
+             "values": [[column 0 values], [column 1 values], ...]}
+- ndjson:   first line is the column-name array, then one value array per row
+- csv:      header row, then one line per row (NULL -> empty field)
+"""
+
+import csv
+import datetime
+import io
+import json
+
+CONTENT_TYPES = {
+    "json": "application/json",
+    "columnar": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# columnar is column-major, so it needs the whole result before writing
+STREAMABLE = frozenset(("json", "ndjson", "csv"))
+
+_ROWS_PER_PIECE = 256
+
+
+def json_default(value):
+    """Serialize native driver values (datetime, Decimal, UUID, bytes)."""
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + value.hex()
+    return str(value)
+
+
+# Compact encoder shared by every format
+dumps_compact = json.JSONEncoder(separators=(",", ":"), default=json_default).encode
+_dumps = dumps_compact
+
+
+def _render_json(proc_key, sp_name, cols, rows):
+    # Pre-encode '"col":' once; each row is then a join of key+value pieces
+    keys = [_dumps(c) + ":" for c in cols]
+    yield '{"proc":%s,"sp_name":%s,"rows":[' % (_dumps(proc_key), _dumps(sp_name))
+    row_count = 0
+    piece = []
+    for row in rows:
+        piece.append("{" + ",".join([k + _dumps(v) for k, v in zip(keys, row)]) + "}")
+        row_count += 1
+        if len(piece) >= _ROWS_PER_PIECE:
+            yield ("," if row_count > len(piece) else "") + ",".join(piece)
+            piece = []
+    if piece:
+        yield ("," if row_count > len(piece) else "") + ",".join(piece)
+    yield '],"row_count":%d}' % row_count
+
+
+def columnar_set(cols, rows):
+    """{"row_count", "columns", "values"} for one result set, column-major."""
+    rows = rows if isinstance(rows, list) else list(rows)
+    return {
+        "row_count": len(rows),
+        "columns": cols,
+        "values": [list(c) for c in zip(*rows)] if rows else [[] for _ in cols],
+    }
+
+
+def _render_columnar(proc_key, sp_name, cols, rows):
+    payload = {"proc": proc_key, "sp_name": sp_name}
+    payload.update(columnar_set(cols, rows))
+    yield _dumps(payload)
+
+
+def _render_ndjson(proc_key, sp_name, cols, rows):
+    yield _dumps(cols) + "\n"
+    piece = []
+    for row in rows:
+        piece.append(_dumps(row))
+        if len(piece) >= _ROWS_PER_PIECE:
+            yield "\n".join(piece) + "\n"
+            piece = []
+    if piece:
+        yield "\n".join(piece) + "\n"
+
+
+def _render_csv(proc_key, sp_name, cols, rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(cols)
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= _ROWS_PER_PIECE:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+            pending = 0
+    yield buf.getvalue()
+
+
+_RENDERERS = {
+    "json": _render_json,
+    "columnar": _render_columnar,
+    "ndjson": _render_ndjson,
+    "csv": _render_csv,
+}
+
+
+def render(fmt, proc_key, sp_name, cols, rows):
+    """Yield the encoded response for `fmt` as a sequence of text pieces."""
+    return _RENDERERS[fmt](proc_key, sp_name, cols, rows)
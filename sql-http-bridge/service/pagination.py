@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Row limits and continuation cursors for /api.
+
+`limit=N` returns at most N rows of the first result set plus, when more
+rows exist, an opaque `next_cursor`; passing it back as `cursor=` fetches
+the next page. The bridge reads only as many rows as the page needs and
+then stops the execution, so callers that want the top slice do not pay
+for transferring and parsing the rest.
+
+Two kinds of cursor:
+
+- offset: any proc. The next page re-executes the proc and skips the rows
+  already returned.
+- keyset: procs listed in `page_keys` (e.g. Inventory:ItemID>AfterItemID).
+  The cursor carries the last row's ItemID, which is bound to the proc's
+  declared AfterItemID parameter, so the proc itself seeks past it
+  (WHERE ItemID > @AfterItemID ORDER BY ItemID) and no rows are skipped.
+
+Cursors are bound to the proc key and the other parameter values, so a
+cursor cannot be replayed against a different query.
+"""
+
+import base64
+import binascii
+import datetime
+import decimal
+import hashlib
+import json
+
+from proc_params import params_key
+
+_CURSOR_VERSION = 1
+
+
+class CursorError(ValueError):
+    """A cursor is malformed or belongs to a different proc or parameters."""
+
+
+class PageKey:
+    """Keyset paging for one proc: key column and the proc parameter it feeds."""
+
+    def __init__(self, column, param):
+        self.column = column
+        self.param = param
+
+
+def parse_page_keys(raw_pairs):
+    """{proc_key: 'Column>Param'} config pairs -> {proc_key: PageKey}."""
+    keys = {}
+    for proc_key, spec in raw_pairs.items():
+        column, sep, param = spec.partition(">")
+        if not sep or not column.strip() or not param.strip():
+            raise ValueError("page_keys %s: expected Column>Param, got %r" % (proc_key, spec))
+        keys[proc_key] = PageKey(column.strip(), param.strip().lstrip("@"))
+    return keys
+
+
+def _fingerprint(proc_key, bound, exclude=None):
+    """Short digest of the proc key and bound values, minus the keyset param."""
+    items = [(name, value) for name, value in params_key(bound)
+             if exclude is None or name.lower() != exclude.lower()]
+    return hashlib.sha256(repr((proc_key, items)).encode("utf-8")).hexdigest()[:16]
+
+
+def _key_text(value):
+    """Key column value as the text a request parameter would carry."""
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float, decimal.Decimal, str)):
+        return str(value)
+    return None
+
+
+def encode_cursor(state):
+    raw = json.dumps(state, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        state = json.loads(raw.decode("utf-8"))
+    except (binascii.Error, ValueError, UnicodeDecodeError) as ex:
+        raise CursorError("invalid cursor") from ex
+    if not isinstance(state, dict) or state.get("v") != _CURSOR_VERSION:
+        raise CursorError("invalid cursor")
+    return state
+
+
+def apply_cursor(token, proc_key, page_key, request_params):
+    """
+    Validate `token` for this proc and return the rows to skip (offset
+    cursors). For keyset cursors the last key is written into
+    `request_params` so bind_params binds it to the proc parameter.
+    """
+    state = decode_cursor(token)
+    if state.get("p") != proc_key:
+        raise CursorError("cursor belongs to a different proc")
+    if page_key is not None:
+        if "k" not in state or not isinstance(state["k"], str):
+            raise CursorError("invalid cursor")
+        request_params[page_key.param] = state["k"]
+        return 0
+    offset = state.get("o")
+    if not isinstance(offset, int) or offset < 0:
+        raise CursorError("invalid cursor")
+    return offset
+
+
+def check_fingerprint(token, proc_key, bound, page_key):
+    """The cursor's query fingerprint must match the request's bound params."""
+    state = decode_cursor(token)
+    expected = _fingerprint(proc_key, bound, page_key.param if page_key else None)
+    if state.get("f") != expected:
+        raise CursorError("cursor does not match the request parameters")
+
+
+def next_cursor(proc_key, bound, page_key, cols, page_rows, offset):
+    """Continuation token for the page after `page_rows`, or None."""
+    state = {"v": _CURSOR_VERSION, "p": proc_key}
+    if page_key is None:
+        state["o"] = offset + len(page_rows)
+    else:
+        try:
+            idx = [c.lower() for c in cols].index(page_key.column.lower())
+        except ValueError:
+            raise CursorError("key column %s not in result" % page_key.column) from None
+        key = _key_text(page_rows[-1][idx])
+        if key is None:
+            raise CursorError("key column %s is NULL or not a scalar" % page_key.column)
+        state["k"] = key
+    state["f"] = _fingerprint(proc_key, bound, page_key.param if page_key else None)
+    return encode_cursor(state)
+
+
+def read_page(rows, offset, limit):
+    """
+    Skip `offset` rows of the iterator, then take up to `limit`. Returns
+    (page_rows, has_more); reads at most offset + limit + 1 rows.
+    """
+    page = []
+    has_more = False
+    for i, row in enumerate(rows):
+        if i < offset:
+            continue
+        if len(page) == limit:
+            has_more = True
+            break
+        page.append(tuple(row))
+    return page, has_more
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Declared, typed parameters for allowlisted stored procedures.
+
+Parameters are declared per proc key in the [proc_params] config section:
+
+    [proc_params]
+    Inventory = ServerID int, HoursBack int = 24
+    Search    = Term nvarchar(100), MinPrice decimal(10,2) = NULL
+
+Request values are validated against the declared type before anything is
+sent to SQL Server. Every call of a proc then uses the same statement text
+and parameter declarations, with values passed as parameters, so SQL Server
+compiles and caches one plan per proc instead of one per literal:
+
+- pyodbc:          EXEC dbo.Proc @ServerID=?, @HoursBack=?  (bound, fixed input sizes)
+- sqlcmd, pymssql: EXEC sp_executesql N'EXEC dbo.Proc @ServerID=@ServerID, ...',
+                   N'@ServerID int, ...', @ServerID=5, ...
+"""
+
+import datetime
+import decimal
+import math
+import re
+
+# Request parameters the bridge itself uses; a proc parameter may not shadow them
+RESERVED_NAMES = frozenset((
+    "proc", "procs", "user", "pass", "token", "format", "stream", "resultsets",
+    "limit", "cursor", "targets"
+))
+
+_INT_RANGES = {
+    "tinyint": (0, 255),
+    "smallint": (-2 ** 15, 2 ** 15 - 1),
+    "int": (-2 ** 31, 2 ** 31 - 1),
+    "bigint": (-2 ** 63, 2 ** 63 - 1),
+}
+
+# ODBC SQL type, column size and decimal digits for pyodbc's setinputsizes
+_ODBC_TYPES = {
+    "tinyint": ("SQL_TINYINT", 0, 0),
+    "smallint": ("SQL_SMALLINT", 0, 0),
+    "int": ("SQL_INTEGER", 0, 0),
+    "bigint": ("SQL_BIGINT", 0, 0),
+    "bit": ("SQL_BIT", 0, 0),
+    "float": ("SQL_DOUBLE", 0, 0),
+    "date": ("SQL_TYPE_DATE", 0, 0),
+    "datetime": ("SQL_TYPE_TIMESTAMP", 23, 3),
+    "datetime2": ("SQL_TYPE_TIMESTAMP", 27, 7),
+}
+
+_SPEC_RE = re.compile(
+    r"@?(?P<name>[A-Za-z_][A-Za-z0-9_]*)\s+"
+    r"(?P<type>[A-Za-z0-9]+)\s*(?:\(\s*(?P<size>[0-9]+|max)\s*(?:,\s*(?P<scale>[0-9]+)\s*)?\))?"
+    r"\s*(?:=\s*(?P<default>.*?))?\s*\Z",
+    re.IGNORECASE
+)
+# Split a declaration list on commas outside parentheses (decimal(10,2))
+_SPLIT_RE = re.compile(r",(?![^(]*\))")
+_INTEGER_TEXT_RE = re.compile(r"-?[0-9]+\Z")
+
+
+class ParamError(ValueError):
+    """A request parameter is missing or does not match its declared type."""
+
+
+class ProcParam:
+    """One declared parameter: name, SQL type and optional default."""
+
+    def __init__(self, name, base_type, size=None, scale=None, default_text=None):
+        self.name = name
+        self.base_type = base_type
+        self.size = size            # int, "max" or None
+        self.scale = scale
+
+        if base_type in ("nvarchar", "varchar"):
+            if size is None:
+                raise ValueError("%s: %s needs a length, e.g. %s(100)" % (name, base_type, base_type))
+            self.sql_type = "%s(%s)" % (base_type, size)
+            odbc_name = "SQL_WVARCHAR" if base_type == "nvarchar" else "SQL_VARCHAR"
+            self.odbc_type = (odbc_name, 0 if size == "max" else size, 0)
+        elif base_type in ("decimal", "numeric"):
+            if size is None or size == "max" or not 1 <= size <= 38:
+                raise ValueError("%s: %s needs a precision of 1-38" % (name, base_type))
+            self.scale = scale or 0
+            if self.scale > size:
+                raise ValueError("%s: scale is larger than precision" % name)
+            self.sql_type = "%s(%d,%d)" % (base_type, size, self.scale)
+            self.odbc_type = ("SQL_DECIMAL", size, self.scale)
+        elif base_type in _ODBC_TYPES:
+            if size is not None:
+                raise ValueError("%s: %s takes no length" % (name, base_type))
+            self.sql_type = base_type
+            self.odbc_type = _ODBC_TYPES[base_type]
+        else:
+            raise ValueError("%s: unsupported type %s" % (name, base_type))
+
+        self.required = default_text is None
+        self.default = None
+        if default_text is not None and default_text.upper() != "NULL":
+            try:
+                self.default = self.convert(default_text)
+            except ParamError as ex:
+                raise ValueError("%s: invalid default %r" % (name, default_text)) from ex
+
+    def convert(self, raw):
+        """Validate one request value and return it as a Python value."""
+        try:
+            value = self._convert(raw.strip() if self.base_type not in ("nvarchar", "varchar") else raw)
+        except (ValueError, decimal.InvalidOperation):
+            value = None
+        if value is None:
+            raise ParamError("invalid value for %s (%s)" % (self.name, self.sql_type))
+        return value
+
+    def _convert(self, raw):
+        t = self.base_type
+        if t in _INT_RANGES:
+            low, high = _INT_RANGES[t]
+            if _INTEGER_TEXT_RE.match(raw) and low <= int(raw) <= high:
+                return int(raw)
+            return None
+        if t == "bit":
+            return {"1": True, "0": False, "true": True, "false": False}.get(raw.lower())
+        if t in ("decimal", "numeric"):
+            value = decimal.Decimal(raw)
+            if not value.is_finite():
+                return None
+            sign, digits, exponent = value.normalize().as_tuple()
+            fraction_digits = max(0, -exponent)
+            integer_digits = len(digits) + exponent if len(digits) + exponent > 0 else 0
+            if fraction_digits > self.scale or integer_digits > self.size - self.scale:
+                return None
+            return value
+        if t == "float":
+            value = float(raw)
+            return value if math.isfinite(value) else None
+        if t in ("nvarchar", "varchar"):
+            if self.size != "max" and len(raw) > self.size:
+                return None
+            if "\x00" in raw:
+                return None     # sqlcmd gets the statement as an argv string
+
+            if t == "varchar" and not raw.isascii():
+                return None
+            return raw
+        if t == "date":
+            return datetime.date.fromisoformat(raw)
+        # datetime / datetime2: "2025-10-31", "2025-10-31 12:00" or "2025-10-31T12:00:00.123"
+        return datetime.datetime.fromisoformat(raw)
+
+    def literal(self, value):
+        """T-SQL literal for a converted value (sp_executesql arguments)."""
+        if value is None:
+            return "NULL"
+        t = self.base_type
+        if t == "bit":
+            return "1" if value else "0"
+        if t in _INT_RANGES:
+            return str(value)
+        if t in ("decimal", "numeric"):
+            return format(value, "f")
+        if t == "float":
+            return repr(value)
+        if t == "date":
+            return "'%s'" % value.isoformat()
+        if t == "datetime":
+            return "'%s'" % value.isoformat(timespec="milliseconds")
+        if t == "datetime2":
+            return "'%s'" % value.isoformat(timespec="microseconds")
+        prefix = "N" if t == "nvarchar" else ""
+        return "%s'%s'" % (prefix, value.replace("'", "''"))
+
+
+def parse_param_specs(text):
+    """Parse 'Name type [= default], ...' into a list of ProcParam."""
+    specs = []
+    seen = set()
+    for item in _SPLIT_RE.split(text):
+        item = item.strip()
+        if not item:
+            continue
+        m = _SPEC_RE.match(item)
+        if not m:
+            raise ValueError("cannot parse parameter declaration %r" % item)
+        name = m.group("name")
+        if name.lower() in RESERVED_NAMES:
+            raise ValueError("parameter name %r is reserved by the bridge" % name)
+        if name.lower() in seen:
+            raise ValueError("parameter %r declared twice" % name)
+        seen.add(name.lower())
+
+        size = m.group("size")
+        if size is not None:
+            size = "max" if size.lower() == "max" else int(size)
+        scale = int(m.group("scale")) if m.group("scale") is not None else None
+        specs.append(ProcParam(name, m.group("type").lower(), size, scale, m.group("default")))
+    return specs
+
+
+def bind_params(specs, request_params):
+    """
+    Validate request values against `specs`. Returns a tuple of
+    (ProcParam, value) in declared order; ParamError if a required
+    parameter is missing or a value does not match its type.
+    Names are matched case-insensitively, as SQL Server does.
+    """
+    if not specs:
+        return ()
+    lowered = {k.lower(): v for k, v in request_params.items()}
+    bound = []
+    for spec in specs:
+        raw = lowered.get(spec.name.lower())
+        if raw is None:
+            if spec.required:
+                raise ParamError("missing param: %s" % spec.name)
+            bound.append((spec, spec.default))
+        else:
+            bound.append((spec, spec.convert(raw)))
+    return tuple(bound)
+
+
+def params_key(bound):
+    """Hashable identity of bound values, for cache and coalescing keys."""
+    return tuple((spec.name, value) for spec, value in bound)
+
+
+def exec_statement(sp_name, bound, marker="?"):
+    """EXEC with named arguments: '@Name=?' per parameter (or '@Name=@Name')."""
+    if not bound:
+        return "EXEC %s" % sp_name
+    return "EXEC %s %s" % (sp_name, ", ".join(
+        "@%s=%s" % (spec.name, marker or "@" + spec.name) for spec, _ in bound
+    ))
+
+
+def executesql_statement(sp_name, bound):
+    """
+    sp_executesql call with the parameter values as typed literal arguments,
+    for backends without client-side parameter binding. The inner statement
+    text is the same for every call, so its plan is reused.
+    """
+    if not bound:
+        return "EXEC %s" % sp_name
+    inner = exec_statement(sp_name, bound, marker=None).replace("'", "''")
+    declarations = ", ".join("@%s %s" % (spec.name, spec.sql_type) for spec, _ in bound)
+    arguments = ", ".join("@%s=%s" % (spec.name, spec.literal(value)) for spec, value in bound)
+    return "EXEC sp_executesql N'%s', N'%s', %s" % (inner, declarations, arguments)
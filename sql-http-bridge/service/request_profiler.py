@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Slow-request log with sampled profiling for the SQL HTTP bridge.
+
+Every request slower than `threshold_ms` is logged with its phase timings.
+A random `sample_rate` fraction of requests is also profiled while it runs,
+so when a sampled request turns out to be slow its log entry carries where
+the time went:
+
+- mode "stack": a shared sampler thread records the request thread's stack
+  every `interval_ms`; the report lists the most frequent stacks. Cheap
+  enough to leave on, and it sees time spent blocked in I/O.
+- mode "cprofile": cProfile for the request thread; the report lists the
+  top functions by cumulative time. More overhead and only one request is
+  profiled at a time (the interpreter allows a single active profiler).
+
+Unsampled requests pay one random() call.
+"""
+
+import collections
+import cProfile
+import io
+import logging
+import pstats
+import random
+import sys
+import threading
+import time
+
+slow_log = logging.getLogger("sqlbridge.slow")
+
+
+class _StackSampler:
+    """One daemon thread sampling the stacks of registered threads."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._samples = {}          # thread id -> Counter of stacks
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sql-stack-sampler",
+                                        daemon=True)
+        self._thread.start()
+
+    def register(self, thread_id):
+        with self._lock:
+            self._samples[thread_id] = collections.Counter()
+        self._wakeup.set()
+
+    def unregister(self, thread_id):
+        with self._lock:
+            return self._samples.pop(thread_id, collections.Counter())
+
+    def _run(self):
+        while True:
+            with self._lock:
+                idle = not self._samples
+            if idle:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, counter in self._samples.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        counter[_stack_key(frame)] += 1
+            time.sleep(self.interval)
+
+
+def _stack_key(frame, depth=25):
+    stack = []
+    while frame is not None and len(stack) < depth:
+        code = frame.f_code
+        stack.append("%s:%d %s" % (code.co_filename.rsplit("/", 1)[-1].rsplit("\\", 1)[-1],
+                                   frame.f_lineno, code.co_name))
+        frame = frame.f_back
+    return tuple(reversed(stack))
+
+
+class _Session:
+    __slots__ = ("profile", "thread_id")
+
+    def __init__(self, profile=None, thread_id=None):
+        self.profile = profile
+        self.thread_id = thread_id
+
+
+class RequestProfiler:
+    """Decides which requests to profile and logs the slow ones."""
+
+    def __init__(self, threshold_ms=1000, sample_rate=0.0, mode="stack",
+                 interval_ms=10, top=15):
+        if mode not in ("stack", "cprofile"):
+            raise ValueError("profile mode must be stack or cprofile, got %r" % mode)
+        self.threshold = threshold_ms / 1000.0
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.top = top
+        self._cprofile_lock = threading.Lock()
+        self._sampler = None
+        if sample_rate > 0 and mode == "stack":
+            self._sampler = _StackSampler(interval_ms / 1000.0)
+
+    def start(self):
+        """Begin profiling the calling thread if this request is sampled; else None."""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        if self._sampler is not None:
+            thread_id = threading.get_ident()
+            self._sampler.register(thread_id)
+            return _Session(thread_id=thread_id)
+        if not self._cprofile_lock.acquire(blocking=False):
+            return None             # another request holds the profiler
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # another profiling tool is active in this interpreter
+            self._cprofile_lock.release()
+            return None
+        return _Session(profile=profile)
+
+    def finish(self, session, elapsed, description):
+        """Stop profiling; log the request (and its profile) if it was slow."""
+        report = None
+        if session is not None:
+            report = self._stop(session, elapsed >= self.threshold)
+        if elapsed < self.threshold:
+            return
+        if report:
+            slow_log.warning("Slow request %.1f ms: %s\n%s", elapsed * 1000, description, report)
+        else:
+            slow_log.warning("Slow request %.1f ms: %s", elapsed * 1000, description)
+
+    def _stop(self, session, want_report):
+        if session.profile is not None:
+            session.profile.disable()
+            self._cprofile_lock.release()
+            if not want_report:
+                return None
+            out = io.StringIO()
+            stats = pstats.Stats(session.profile, stream=out)
+            stats.sort_stats("cumulative").print_stats(self.top)
+            return out.getvalue().rstrip()
+
+        samples = self._sampler.unregister(session.thread_id)
+        if not want_report or not samples:
+            return None
+        total = sum(samples.values())
+        lines = ["%d stack samples, most frequent:" % total]
+        for stack, count in samples.most_common(5):
+            lines.append("  %5.1f%%  %s" % (100.0 * count / total, " > ".join(stack[-8:])))
+        return "\n".join(lines)
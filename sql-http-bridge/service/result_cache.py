@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+In-process result cache for the SQL HTTP bridge.
+
+Entries are LRU-ordered and bounded by an approximate byte budget. Each
+entry is fresh for its TTL, then servable as stale for a further
+`stale_secs` while a single background reload refreshes it.
+
+SingleFlight collapses concurrent identical loads into one execution.
+"""
+
+import hashlib
+import hmac
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Per-process key so cached entries can be bound to a password without
+# keeping the password itself in memory.
+_DIGEST_KEY = os.urandom(32)
+
+
+def credential_digest(password):
+    return hmac.new(_DIGEST_KEY, password.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def estimate_result_size(cols, rows):
+    """Cheap approximation of the memory held by a (cols, rows) result."""
+    size = 64 + sum(len(c) for c in cols)
+    for row in rows:
+        size += 56 + 8 * len(row)
+        for v in row:
+            if isinstance(v, str):
+                size += 49 + len(v)
+            else:
+                size += 32
+    return size
+
+
+class _Entry:
+    __slots__ = ("value", "size", "fresh_until", "stale_until", "refreshing")
+
+    def __init__(self, value, size, ttl, stale_secs):
+        now = time.monotonic()
+        self.value = value
+        self.size = size
+        self.fresh_until = now + ttl
+        self.stale_until = now + ttl + stale_secs
+        self.refreshing = False
+
+
+class ResultCache:
+    """
+    Thread-safe TTL + LRU cache.
+
+    get_or_load(key, ttl, loader) returns (value, status) where status is
+    "hit", "stale" or "miss". `loader()` must return (value, size_bytes);
+    exceptions from it propagate and nothing is cached.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, stale_secs=0.0):
+        self.max_bytes = max_bytes
+        self.stale_secs = stale_secs
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refresh_errors = 0
+
+    def get_or_load(self, key, ttl, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now < entry.fresh_until:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.value, "hit"
+                if now < entry.stale_until:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    if not entry.refreshing:
+                        entry.refreshing = True
+                        threading.Thread(
+                            target=self._refresh, args=(key, ttl, loader, entry),
+                            name="sql-cache-refresh", daemon=True
+                        ).start()
+                    return entry.value, "stale"
+            self.misses += 1
+
+        value, size = loader()
+        self._store(key, value, size, ttl)
+        return value, "miss"
+
+    def _refresh(self, key, ttl, loader, entry):
+        try:
+            value, size = loader()
+        except Exception as ex:
+            with self._lock:
+                self.refresh_errors += 1
+                entry.refreshing = False
+            logging.warning("Background cache refresh failed for %s: %s", key[0], ex)
+            return
+        self._store(key, value, size, ttl)
+
+    def _store(self, key, value, size, ttl):
+        if size > self.max_bytes:
+            return
+        entry = _Entry(value, size, ttl, self.stale_secs)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._entries[key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "refresh_errors": self.refresh_errors,
+            }
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Request coalescing: while a load for `key` is in flight, further
+    callers with the same key wait for it and share its result (or its
+    exception) instead of starting their own.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """Return (fn() result, shared) where shared is True for waiters."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value = fn()
+        except BaseException as ex:
+            call.error = ex
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+            }
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Short-lived session tokens for the SQL HTTP bridge.
+
+POST /auth validates user / pass with a real SQL login once and returns a
+random token. Later calls present the token instead of the password; the
+bridge keeps the credentials in process memory only, so every execution
+still runs as the caller's own least-privilege login (and, with a driver
+backend, on a pooled connection that login already opened).
+
+Tokens are stored as SHA-256 digests and expire `ttl` seconds after issue.
+"""
+
+import hashlib
+import secrets
+import threading
+import time
+
+
+class _Session:
+    __slots__ = ("login", "password", "expires")
+
+    def __init__(self, login, password, expires):
+        self.login = login
+        self.password = password
+        self.expires = expires
+
+
+class SessionStore:
+    """Thread-safe token -> (login, password) map with expiry and a size cap."""
+
+    def __init__(self, ttl=900.0, max_sessions=10000):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._issued = 0
+        self._expired = 0
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def _purge(self, now):
+        # caller holds the lock
+        expired = [k for k, s in self._sessions.items() if s.expires <= now]
+        for k in expired:
+            del self._sessions[k]
+        self._expired += len(expired)
+
+    def create(self, login, password):
+        """Issue a token for already-validated credentials. Returns (token, ttl)."""
+        token = secrets.token_urlsafe(32)
+        now = time.monotonic()
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                self._purge(now)
+                if len(self._sessions) >= self.max_sessions:
+                    # Drop the session closest to expiry to make room
+                    oldest = min(self._sessions, key=lambda k: self._sessions[k].expires)
+                    del self._sessions[oldest]
+            self._sessions[self._key(token)] = _Session(login, password, now + self.ttl)
+            self._issued += 1
+        return token, self.ttl
+
+    def resolve(self, token):
+        """(login, password) for a live token, or None if unknown or expired."""
+        key = self._key(token)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                return None
+            if session.expires <= time.monotonic():
+                del self._sessions[key]
+                self._expired += 1
+                return None
+            return session.login, session.password
+
+    def revoke(self, token):
+        """Forget a token. Returns True if it existed."""
+        with self._lock:
+            return self._sessions.pop(self._key(token), None) is not None
+
+    def stats(self):
+        with self._lock:
+            self._purge(time.monotonic())
+            return {
+                "active": len(self._sessions),
+                "issued": self._issued,
+                "expired": self._expired,
+            }
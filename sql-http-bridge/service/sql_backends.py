@@ -0,0 +1,876 @@
+#!/usr/bin/env python3
+"""
+Execution backends for the SQL HTTP bridge.
+
+- SqlcmdBackend: one sqlcmd process per call (the original behaviour).
+- DriverBackend: pooled native connections via pyodbc or pymssql, so the
+  process spawn and TDS login are paid once per pooled connection instead
+  of once per request.
+
+Both expose execute(sp_name, login, password) -> ResultSets, a list of
+(columns, rows) with one entry per result set, and stream(sp_name, login,
+password), a context manager yielding (columns, row_iterator) for the
+first result set so rows can be written out as they are read. Both take `params`, the
+validated (ProcParam, value) pairs from proc_params.bind_params, and offer
+authenticate(login, password) to check credentials without running a proc
+and insert_rows(table, specs, rows, login, password) for bulk inserts
+(the audit writer).
+
+execute and stream also take `timeout` (seconds, None = unlimited) and
+`client_gone`, a callable that returns True once the HTTP client has
+disconnected. An ExecutionWatchdog thread polls both and stops the batch
+(kills sqlcmd, or cancels the statement on the pooled connection), raising
+ExecutionTimeout / ClientDisconnected in the calling thread.
+"""
+
+import contextlib
+import hashlib
+import hmac
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+
+from proc_params import exec_statement, executesql_statement
+from sqlcmd_parser import iter_result_set, parse_result_sets
+
+try:
+    import pyodbc
+except ImportError:
+    pyodbc = None
+
+try:
+    import pymssql
+except ImportError:
+    pymssql = None
+
+
+class ExecutionError(Exception):
+    """Login failure or batch error reported by SQL Server."""
+
+
+class BackendUnavailable(Exception):
+    """The backend cannot run a batch right now (no sqlcmd, pool exhausted)."""
+
+
+class ResultSets(list):
+    """
+    [(columns, rows), ...] as returned by execute(), plus a content digest
+    (see result_digest) that a backend may fill in when it has a cheaper
+    source than the parsed values, such as sqlcmd's raw output.
+    """
+
+    __slots__ = ("digest",)
+
+    def __init__(self, result_sets=(), digest=None):
+        super().__init__(result_sets)
+        self.digest = digest
+
+
+def result_digest(result_sets):
+    """
+    Hex content hash of [(columns, rows), ...]; identical results give
+    identical digests within this process. Memoized on ResultSets, so a
+    cached result is only hashed once.
+    """
+    digest = getattr(result_sets, "digest", None)
+    if digest is None:
+        h = hashlib.blake2b(digest_size=16)
+        for cols, rows in result_sets:
+            h.update(repr((list(cols), rows)).encode("utf-8"))
+        digest = h.hexdigest()
+        if isinstance(result_sets, ResultSets):
+            result_sets.digest = digest
+    return digest
+
+
+class ExecutionTimeout(Exception):
+    """The batch ran past its execution timeout and was stopped."""
+
+
+class ClientDisconnected(Exception):
+    """The HTTP client went away while its batch ran; the batch was stopped."""
+
+
+class _Watch:
+    __slots__ = ("deadline", "client_gone", "stop", "fired", "done", "lock")
+
+    def __init__(self, deadline, client_gone):
+        self.deadline = deadline
+        self.client_gone = client_gone
+        self.stop = None        # set once there is something to stop
+        self.fired = None       # "timeout" / "disconnect" once stopped
+        # The watchdog decides and calls stop() holding `lock`; leaving the
+        # watch() block sets `done` under it, so a finished batch can never
+        # be stopped (its connection may already serve another request)
+        self.done = False
+        self.lock = threading.Lock()
+
+    def check(self):
+        """Raise the matching exception if the watchdog stopped this batch."""
+        if self.fired == "timeout":
+            raise ExecutionTimeout("execution timed out")
+        if self.fired == "disconnect":
+            raise ClientDisconnected("client disconnected")
+
+
+class ExecutionWatchdog:
+    """
+    Stops running batches that pass their deadline or whose client has
+    disconnected. One daemon thread polls every registered batch each
+    `interval` seconds; it is started on first use.
+    """
+
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self._watches = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @contextlib.contextmanager
+    def watch(self, timeout=None, client_gone=None):
+        """
+        Register a batch for the duration of the block. The caller assigns
+        `watch.stop` once the batch is running and calls `watch.check()`
+        when it fails or ends.
+        """
+        watch = _Watch(time.monotonic() + timeout if timeout else None, client_gone)
+        if watch.deadline is None and client_gone is None:
+            yield watch
+            return
+        with self._lock:
+            self._watches.add(watch)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._poll_loop, name="sql-exec-watchdog", daemon=True
+                )
+                self._thread.start()
+        try:
+            yield watch
+        finally:
+            # Waits for a stop() in progress; callers check watch.fired after
+            # the block to learn whether the batch was stopped
+            with watch.lock:
+                watch.done = True
+            with self._lock:
+                self._watches.discard(watch)
+
+    def _poll_loop(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                watches = [w for w in self._watches if w.fired is None and w.stop is not None]
+            now = time.monotonic()
+            for watch in watches:
+                with watch.lock:
+                    if watch.done or watch.fired is not None:
+                        continue
+                    if watch.deadline is not None and now >= watch.deadline:
+                        watch.fired = "timeout"
+                    elif watch.client_gone is not None and watch.client_gone():
+                        watch.fired = "disconnect"
+                    else:
+                        continue
+                    try:
+                        watch.stop()
+                    except Exception as ex:
+                        logging.debug("stopping batch failed: %s", ex)
+
+
+def insert_values_sql(table, specs, rows):
+    """
+    Multi-row INSERT ... VALUES batch with typed literals, in one transaction.
+    `specs` are ProcParams describing the columns in row order.
+    """
+    columns = ", ".join(spec.name for spec in specs)
+    statements = []
+    # SQL Server accepts at most 1000 rows per VALUES list
+    for start in range(0, len(rows), 1000):
+        values = ",\n".join(
+            "(%s)" % ", ".join(spec.literal(value) for spec, value in zip(specs, row))
+            for row in rows[start:start + 1000]
+        )
+        statements.append("INSERT INTO %s (%s) VALUES\n%s;" % (table, columns, values))
+    return ("SET NOCOUNT ON; SET XACT_ABORT ON;\nBEGIN TRANSACTION;\n%s\nCOMMIT;"
+            % "\n".join(statements))
+
+
+def find_sqlcmd():
+    """Locate sqlcmd / sqlcmd.exe on PATH. Returns None if not found."""
+    sqlcmd_candidates = ["sqlcmd"]
+    if platform.system().lower().startswith("win"):
+        sqlcmd_candidates.insert(0, "sqlcmd.exe")
+
+    for cand in sqlcmd_candidates:
+        for p in os.environ.get("PATH", "").split(os.pathsep):
+            full = os.path.join(p, cand)
+            if os.path.isfile(full):
+                return full
+    return None
+
+
+class SqlcmdBackend:
+    """Runs each batch in a fresh sqlcmd process."""
+
+    name = "sqlcmd"
+
+    def __init__(self, sql_server, database, typed=False, fixed_width=False):
+        self.sql_server = sql_server
+        self.database = database
+        self.typed = typed
+        self.fixed_width = fixed_width
+        self.watchdog = ExecutionWatchdog()
+        self._sqlcmd_path = None
+
+    def _resolve_sqlcmd(self):
+        # PATH is scanned once and the result reused for every call
+        if self._sqlcmd_path is None or not os.path.isfile(self._sqlcmd_path):
+            self._sqlcmd_path = find_sqlcmd()
+        return self._sqlcmd_path
+
+    def _command(self, sp_name, login, password, params=(), tsql=None, script_path=None):
+        sqlcmd_path = self._resolve_sqlcmd()
+        if sqlcmd_path is None:
+            logging.error("sqlcmd not found in PATH")
+            raise BackendUnavailable("sqlcmd not found in PATH")
+
+        # sqlcmd cannot bind parameters: values go to sp_executesql as typed
+        # literals so the inner EXEC keeps one cached plan
+        if tsql is None and script_path is None:
+            tsql = "SET NOCOUNT ON; " + executesql_statement(sp_name, params)
+        cmd = [
+            sqlcmd_path,
+            "-S", self.sql_server,
+            "-d", self.database,
+            "-U", login,
+            "-P", password,
+        ]
+        if script_path is not None:
+            # UTF-8 batch file; -b sets the exit code when a statement fails
+            cmd += ["-i", script_path, "-f", "65001", "-b", "-x"]
+            return cmd
+        cmd += [
+            "-Q", tsql,
+            "-s", "|"  # pipe delimiter
+        ]
+        if not self.fixed_width:
+            cmd.append("-W")  # trim trailing spaces
+        if params:
+            cmd.append("-x")  # no $(var) substitution inside string values
+        return cmd
+
+    @contextlib.contextmanager
+    def stream(self, sp_name, login, password, params=(), timeout=None, client_gone=None,
+               typed=None):
+        """
+        Rows of the first result set, read while sqlcmd runs. typed=False
+        overrides typed_values for callers that type the rows they keep.
+        """
+        typed = self.typed if typed is None else typed
+        cmd = self._command(sp_name, login, password, params)
+
+        # stderr goes to a temp file so a chatty sqlcmd can never block on a
+        # full pipe while we are still reading stdout
+        with tempfile.TemporaryFile() as err_file, \
+                self.watchdog.watch(timeout, client_gone) as watch:
+            proc = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=err_file,
+                text=True
+            )
+            watch.stop = proc.kill
+            try:
+                cols, rows = iter_result_set(proc.stdout, typed=typed,
+                                             fixed_width=self.fixed_width)
+                if not cols:
+                    # Nothing parseable: either an empty result or a failure
+                    proc.stdout.read()
+                    self._check_exit(proc, err_file, watch)
+
+                state = {"drained": not cols}
+
+                def tracked_rows():
+                    yield from rows
+                    state["drained"] = True
+
+                yield cols, tracked_rows()
+
+                if state["drained"]:
+                    # Drain any later result sets, then check rc
+                    proc.stdout.read()
+                    self._check_exit(proc, err_file, watch)
+                # else the caller stopped early (row limit): sqlcmd is killed
+                # below rather than left to produce rows nobody reads
+            finally:
+                if proc.poll() is None:
+                    proc.kill()
+                proc.stdout.close()
+                proc.wait()
+
+    @staticmethod
+    def _check_exit(proc, err_file, watch):
+        returncode = proc.wait()
+        watch.check()
+        if returncode != 0:
+            err_file.seek(0)
+            logging.warning(
+                "sqlcmd error rc=%s stderr=%s",
+                returncode,
+                err_file.read().decode("utf-8", "replace").strip()
+            )
+            raise ExecutionError("sqlcmd exited with rc=%s" % returncode)
+
+    def execute(self, sp_name, login, password, timings=None, params=(), timeout=None,
+                client_gone=None):
+        """
+        Run to completion, then parse. `timings`, if given, receives the
+        "lookup" (sqlcmd path and command line), "spawn" (process start),
+        "exec" and "parse" phase durations in seconds.
+        """
+        lookup_started = time.perf_counter()
+        cmd = self._command(sp_name, login, password, params)
+        spawn_started = time.perf_counter()
+        with self.watchdog.watch(timeout, client_gone) as watch:
+            with subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True
+            ) as proc:
+                started = time.perf_counter()
+                watch.stop = proc.kill
+                stdout, stderr = proc.communicate()
+        exec_done = time.perf_counter()
+
+        # Killed by the watchdog: report why rather than the bare exit code
+        watch.check()
+        if proc.returncode != 0:
+            logging.warning(
+                "sqlcmd error rc=%s stderr=%s",
+                proc.returncode,
+                stderr.strip()
+            )
+            raise ExecutionError("sqlcmd exited with rc=%s" % proc.returncode)
+
+        # The raw output (and the parse options) identify the result; hashing
+        # it costs far less than hashing the parsed values
+        output_digest = hashlib.blake2b(
+            ("%d%d\n%s" % (self.typed, self.fixed_width, stdout)).encode("utf-8"),
+            digest_size=16).hexdigest()
+        result_sets = ResultSets(parse_result_sets(stdout, typed=self.typed,
+                                                   fixed_width=self.fixed_width),
+                                 output_digest)
+        if timings is not None:
+            timings["lookup"] = spawn_started - lookup_started
+            timings["spawn"] = started - spawn_started
+            timings["exec"] = exec_done - started
+            timings["parse"] = time.perf_counter() - exec_done
+        return result_sets
+
+    def authenticate(self, login, password):
+        """Log in once with a trivial batch; ExecutionError if rejected."""
+        completed = subprocess.run(
+            self._command(None, login, password, tsql="SELECT 1"),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+        if completed.returncode != 0:
+            logging.warning("sqlcmd login failed for '%s' rc=%s", login, completed.returncode)
+            raise ExecutionError("login failed")
+
+    def insert_rows(self, table, specs, rows, login, password, timeout=120):
+        """
+        Insert `rows` in one sqlcmd call. The batch is passed as an input
+        file since it can exceed the command-line length limit.
+        """
+        fd, script_path = tempfile.mkstemp(suffix=".sql")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(insert_values_sql(table, specs, rows))
+            completed = subprocess.run(
+                self._command(None, login, password, script_path=script_path),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                timeout=timeout
+            )
+        finally:
+            os.remove(script_path)
+        if completed.returncode != 0:
+            raise ExecutionError("insert into %s failed rc=%s: %s"
+                                 % (table, completed.returncode, completed.stdout.strip()))
+
+    def close(self):
+        pass
+
+
+class _Pool:
+    """Idle connections for one (server, database, login)."""
+
+    def __init__(self, secret_digest):
+        self.secret_digest = secret_digest
+        self.idle = []          # LIFO: most recently used connection first
+        self.in_use = 0
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "pool", "last_used")
+
+    def __init__(self, conn, pool):
+        self.conn = conn
+        self.pool = pool
+        self.last_used = time.monotonic()
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections keyed by (server, database, login).
+
+    A pool only hands out connections to callers presenting the same
+    password that opened them (compared as a keyed digest); a different
+    password always goes through a real login first. Connections idle
+    longer than `health_check_secs` are pinged before reuse, and a reaper
+    thread closes connections idle longer than `idle_timeout`.
+    """
+
+    def __init__(self, connect_fn, max_size=4, acquire_timeout=10.0,
+                 idle_timeout=300.0, health_check_secs=30.0):
+        self._connect_fn = connect_fn
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_secs = health_check_secs
+
+        self._pools = {}
+        self._lock = threading.Condition()
+        self._digest_key = os.urandom(32)
+        self._closed = False
+
+        self._reaper = threading.Thread(
+            target=self._reap_loop, name="sql-pool-reaper", daemon=True
+        )
+        self._reaper.start()
+
+    def _digest(self, password):
+        return hmac.new(self._digest_key, password.encode("utf-8"),
+                        hashlib.sha256).digest()
+
+    def acquire(self, server, database, login, password):
+        """Return (key, pooled) for the caller's login; pass both to release()."""
+        key = (server, database, login)
+        digest = self._digest(password)
+        deadline = time.monotonic() + self.acquire_timeout
+        pooled = None
+
+        with self._lock:
+            pool = self._pools.get(key)
+            while pool is not None and hmac.compare_digest(pool.secret_digest, digest):
+                if pool.idle:
+                    pooled = pool.idle.pop()
+                    break
+                if pool.in_use < self.max_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise BackendUnavailable("connection pool exhausted for %s" % login)
+                self._lock.wait(remaining)
+                pool = self._pools.get(key)
+            else:
+                # Unknown login or a different password: needs a real login
+                pool = None
+            if pool is not None:
+                pool.in_use += 1
+
+        if pool is None:
+            return key, self._login_new_pool(key, digest, password)
+
+        if pooled is not None:
+            if (time.monotonic() - pooled.last_used <= self.health_check_secs
+                    or self._is_alive(pooled.conn)):
+                return key, pooled
+            self._close_quietly(pooled.conn)
+
+        try:
+            conn = self._connect_fn(server, database, key[2], password)
+        except Exception:
+            self._release_slot(pool)
+            raise
+        return key, _PooledConnection(conn, pool)
+
+    def _login_new_pool(self, key, digest, password):
+        # Authenticate before any pool state is created for these credentials
+        conn = self._connect_fn(key[0], key[1], key[2], password)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None or not hmac.compare_digest(pool.secret_digest, digest):
+                if pool is not None:
+                    # Password changed: drop connections opened with the old one
+                    self._close_all(pool.idle)
+                    pool.idle = []
+                pool = _Pool(digest)
+                self._pools[key] = pool
+            pool.in_use += 1
+        return _PooledConnection(conn, pool)
+
+    def release(self, key, pooled, discard=False):
+        pool = pooled.pool
+        with self._lock:
+            pool.in_use = max(0, pool.in_use - 1)
+            if discard or self._closed or self._pools.get(key) is not pool:
+                self._close_quietly(pooled.conn)
+            else:
+                pooled.last_used = time.monotonic()
+                pool.idle.append(pooled)
+            self._lock.notify()
+
+    def _release_slot(self, pool):
+        with self._lock:
+            pool.in_use = max(0, pool.in_use - 1)
+            self._lock.notify()
+
+    @staticmethod
+    def _is_alive(conn):
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchall()
+            cur.close()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _close_all(self, pooled_list):
+        for pooled in pooled_list:
+            self._close_quietly(pooled.conn)
+
+    def _reap_loop(self):
+        interval = max(1.0, min(self.idle_timeout, 30.0))
+        while not self._closed:
+            time.sleep(interval)
+            self.evict_idle()
+
+    def evict_idle(self):
+        """Close connections idle longer than idle_timeout; drop empty pools."""
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            for key in list(self._pools):
+                pool = self._pools[key]
+                stale = [p for p in pool.idle if p.last_used < cutoff]
+                if stale:
+                    pool.idle = [p for p in pool.idle if p.last_used >= cutoff]
+                    self._close_all(stale)
+                if not pool.idle and pool.in_use == 0:
+                    del self._pools[key]
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            for pool in self._pools.values():
+                self._close_all(pool.idle)
+            self._pools.clear()
+            self._lock.notify_all()
+
+
+def _odbc_quote(value):
+    """Brace-quote an ODBC attribute value: ';', '=' and '{' lose their meaning."""
+    return "{%s}" % value.replace("}", "}}")
+
+
+def odbc_connection_string(odbc_driver, server, database, login, password,
+                           encrypt="yes", trust_server_certificate=False):
+    """
+    Connection string for one SQL login. Login and password come from the
+    request and are brace-quoted, so they cannot add attributes such as
+    Trusted_Connection=yes.
+    """
+    return (
+        f'DRIVER={_odbc_quote(odbc_driver)};'
+        f'SERVER={server};'
+        f'DATABASE={database};'
+        f'UID={_odbc_quote(login)};'
+        f'PWD={_odbc_quote(password)};'
+        f'Encrypt={encrypt};'
+        f'TrustServerCertificate={"yes" if trust_server_certificate else "no"}'
+    )
+
+
+class DriverBackend:
+    """Runs batches over pooled pyodbc / pymssql connections."""
+
+    def __init__(self, sql_server, database, driver="pyodbc",
+                 odbc_driver="ODBC Driver 18 for SQL Server",
+                 odbc_encrypt="yes", odbc_trust_server_certificate=False,
+                 login_timeout=15, pool_max_size=4, pool_acquire_timeout=10.0,
+                 pool_idle_timeout=300.0, pool_health_check_secs=30.0):
+        if driver == "pyodbc" and pyodbc is None:
+            raise BackendUnavailable("pyodbc is not installed")
+        if driver == "pymssql" and pymssql is None:
+            raise BackendUnavailable("pymssql is not installed")
+        if driver not in ("pyodbc", "pymssql"):
+            raise ValueError("unknown driver %r" % driver)
+
+        self.name = driver
+        self.sql_server = sql_server
+        self.database = database
+        self.driver = driver
+        self.odbc_driver = odbc_driver
+        self.odbc_encrypt = odbc_encrypt
+        self.odbc_trust_server_certificate = odbc_trust_server_certificate
+        self.login_timeout = login_timeout
+        self.fetch_size = 500
+        self.watchdog = ExecutionWatchdog()
+        self.pool = ConnectionPool(
+            self._connect,
+            max_size=pool_max_size,
+            acquire_timeout=pool_acquire_timeout,
+            idle_timeout=pool_idle_timeout,
+            health_check_secs=pool_health_check_secs
+        )
+
+    def _connect(self, server, database, login, password):
+        try:
+            if self.driver == "pyodbc":
+                conn_str = odbc_connection_string(
+                    self.odbc_driver, server, database, login, password,
+                    self.odbc_encrypt, self.odbc_trust_server_certificate)
+                return pyodbc.connect(conn_str, timeout=self.login_timeout,
+                                      autocommit=True)
+
+            # pymssql wants host:port rather than host,port
+            return pymssql.connect(
+                server=server.replace(",", ":"),
+                user=login,
+                password=password,
+                database=database,
+                login_timeout=self.login_timeout,
+                autocommit=True
+            )
+        except Exception as ex:
+            logging.warning("%s login failed for '%s': %s", self.driver, login, ex)
+            raise ExecutionError("login failed") from ex
+
+    @staticmethod
+    def _cancel(cur, conn):
+        """Ask SQL Server to abandon the running batch (TDS attention)."""
+        try:
+            if hasattr(cur, "cancel"):
+                cur.cancel()            # pyodbc: SQLCancel
+            elif hasattr(conn, "_conn"):
+                conn._conn.cancel()     # pymssql: dbcancel on the _mssql connection
+        except Exception as ex:
+            logging.debug("cancel failed: %s", ex)
+
+    def _execute_proc(self, cur, sp_name, params):
+        if not params:
+            cur.execute(f"SET NOCOUNT ON; EXEC {sp_name}")
+        elif self.driver == "pyodbc":
+            # Bound parameters with fixed declared sizes: the statement text
+            # and parameter declarations are identical on every call
+            cur.setinputsizes([
+                (getattr(pyodbc, sql_type), size, digits)
+                for sql_type, size, digits in (spec.odbc_type for spec, _ in params)
+            ])
+            cur.execute("SET NOCOUNT ON; " + exec_statement(sp_name, params),
+                        [value for _, value in params])
+        else:
+            # pymssql only interpolates parameters client-side; sp_executesql
+            # keeps the inner statement parameterized instead
+            cur.execute("SET NOCOUNT ON; " + executesql_statement(sp_name, params))
+
+    @contextlib.contextmanager
+    def stream(self, sp_name, login, password, params=(), timeout=None, client_gone=None,
+               typed=None):
+        # the driver returns native values; typed does not apply
+        key, pooled = self.pool.acquire(self.sql_server, self.database, login, password)
+        # Only a fully drained cursor leaves the connection clean for reuse
+        discard = True
+        try:
+            with self.watchdog.watch(timeout, client_gone) as watch:
+                try:
+                    cur = pooled.conn.cursor()
+                    watch.stop = lambda: self._cancel(cur, pooled.conn)
+                    self._execute_proc(cur, sp_name, params)
+
+                    # Skip anything before the first result set that returns rows
+                    while cur.description is None:
+                        if not cur.nextset():
+                            break
+                    cols = [d[0] for d in cur.description] if cur.description else []
+                except Exception as ex:
+                    watch.check()
+                    logging.warning("%s exec error for '%s': %s", self.driver, sp_name, ex)
+                    raise ExecutionError("exec failed") from ex
+
+                state = {"drained": not cols}
+
+                def rows():
+                    try:
+                        while True:
+                            batch = cur.fetchmany(self.fetch_size)
+                            if not batch:
+                                break
+                            for r in batch:
+                                yield list(r)
+                    except Exception as ex:
+                        watch.check()
+                        logging.warning("%s fetch error for '%s': %s", self.driver, sp_name, ex)
+                        raise ExecutionError("exec failed") from ex
+                    state["drained"] = True
+
+                yield cols, rows() if cols else iter(())
+                discard = not state["drained"]
+                if discard:
+                    # Stopped early (row limit): stop the batch on the server
+                    self._cancel(cur, pooled.conn)
+                cur.close()
+            if watch.fired:
+                # Cancelled just as it finished: the attention may still be pending
+                discard = True
+        finally:
+            self.pool.release(key, pooled, discard=discard)
+
+    def execute(self, sp_name, login, password, timings=None, params=(), timeout=None,
+                client_gone=None):
+        """
+        Execute and fetch everything, then convert rows. `timings`, if given,
+        receives the "acquire" (pooled connection or login), "exec"
+        (execute + fetch) and "parse" durations.
+        """
+        acquire_started = time.perf_counter()
+        key, pooled = self.pool.acquire(self.sql_server, self.database, login, password)
+        acquired = time.perf_counter()
+        discard = False
+        try:
+            with self.watchdog.watch(timeout, client_gone) as watch:
+                try:
+                    started = time.perf_counter()
+                    cur = pooled.conn.cursor()
+                    watch.stop = lambda: self._cancel(cur, pooled.conn)
+                    self._execute_proc(cur, sp_name, params)
+
+                    raw_sets = []
+                    while True:
+                        # statements without a result (description None) are skipped
+                        if cur.description is not None:
+                            cols = [d[0] for d in cur.description]
+                            raw_sets.append((cols, cur.fetchall()))
+                        if not cur.nextset():
+                            break
+                    cur.close()
+                    exec_done = time.perf_counter()
+                except Exception as ex:
+                    # The connection state is unknown after an error; never reuse it
+                    discard = True
+                    watch.check()
+                    logging.warning("%s exec error for '%s': %s", self.driver, sp_name, ex)
+                    raise ExecutionError("exec failed") from ex
+            if watch.fired:
+                # Cancelled just as it finished: the attention may still be pending
+                discard = True
+
+            result_sets = ResultSets((cols, [tuple(r) for r in raw]) for cols, raw in raw_sets)
+            if timings is not None:
+                timings["acquire"] = acquired - acquire_started
+                timings["exec"] = exec_done - started
+                timings["parse"] = time.perf_counter() - exec_done
+            return result_sets
+        finally:
+            self.pool.release(key, pooled, discard=discard)
+
+    def authenticate(self, login, password):
+        """
+        Check credentials through the pool. A successful login leaves its
+        connection idle in the pool, ready for the session's first call.
+        """
+        key, pooled = self.pool.acquire(self.sql_server, self.database, login, password)
+        self.pool.release(key, pooled)
+
+    def insert_rows(self, table, specs, rows, login, password):
+        """Insert `rows` over a pooled connection in one round trip."""
+        key, pooled = self.pool.acquire(self.sql_server, self.database, login, password)
+        discard = False
+        try:
+            cur = pooled.conn.cursor()
+            if self.driver == "pyodbc":
+                # Parameter arrays: one execution for the whole batch
+                cur.fast_executemany = True
+                cur.setinputsizes([
+                    (getattr(pyodbc, sql_type), size, digits)
+                    for sql_type, size, digits in (spec.odbc_type for spec in specs)
+                ])
+                cur.executemany(
+                    "INSERT INTO %s (%s) VALUES (%s)" % (
+                        table, ", ".join(spec.name for spec in specs),
+                        ", ".join("?" * len(specs))),
+                    rows
+                )
+            else:
+                # pymssql executemany is one round trip per row
+                cur.execute(insert_values_sql(table, specs, rows))
+            cur.close()
+        except Exception as ex:
+            discard = True
+            raise ExecutionError("insert into %s failed: %s" % (table, ex)) from ex
+        finally:
+            self.pool.release(key, pooled, discard=discard)
+
+    def close(self):
+        self.pool.close()
+
+
+def create_backend(settings):
+    """
+    Build the configured backend. `backend=auto` prefers pyodbc, then
+    pymssql, and falls back to sqlcmd when neither driver is installed.
+    """
+    choice = settings.get("backend", "sqlcmd")
+    sql_server = settings["sql_server"]
+    database = settings["database"]
+
+    def sqlcmd_backend():
+        return SqlcmdBackend(
+            sql_server, database,
+            typed=settings.get("typed_values", False),
+            fixed_width=settings.get("sqlcmd_fixed_width", False)
+        )
+
+    if choice == "sqlcmd":
+        return sqlcmd_backend()
+
+    if choice == "auto":
+        drivers = [d for d, mod in (("pyodbc", pyodbc), ("pymssql", pymssql))
+                   if mod is not None]
+    else:
+        drivers = [choice]
+
+    for driver in drivers:
+        try:
+            return DriverBackend(
+                sql_server, database,
+                driver=driver,
+                odbc_driver=settings.get("odbc_driver", "ODBC Driver 18 for SQL Server"),
+                odbc_encrypt=settings.get("odbc_encrypt", "yes"),
+                odbc_trust_server_certificate=settings.get("odbc_trust_server_certificate", False),
+                login_timeout=settings.get("login_timeout", 15),
+                pool_max_size=settings.get("pool_max_size", 4),
+                pool_acquire_timeout=settings.get("pool_acquire_timeout", 10.0),
+                pool_idle_timeout=settings.get("pool_idle_timeout", 300.0),
+                pool_health_check_secs=settings.get("pool_health_check_secs", 30.0)
+            )
+        except BackendUnavailable as ex:
+            logging.warning("Backend %s unavailable (%s)", driver, ex)
+
+    logging.warning("Falling back to sqlcmd backend")
+    return sqlcmd_backend()
@@ -2,34 +2,437 @@
 
 import http.server
 import socketserver
+import threading
 import urllib.parse
-import subprocess
 import json
 import configparser
+import contextlib
+import hashlib
 import logging
-import sys
 import os
-import platform
+import re
+import select
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from admission import AdmissionController, Overloaded
+from audit_log import AuditWriter
+from bridge_metrics import MetricsRegistry
+from output_formats import (
+    CONTENT_TYPES, STREAMABLE, columnar_set, dumps_compact, json_default, render
+)
+from pagination import (
+    CursorError, apply_cursor, check_fingerprint, next_cursor, parse_page_keys, read_page
+)
+from proc_params import ParamError, bind_params, params_key, parse_param_specs
+from request_profiler import RequestProfiler, slow_log
+from result_cache import ResultCache, SingleFlight, credential_digest, estimate_result_size
+from session_store import SessionStore
+from sql_backends import (
+    BackendUnavailable, ClientDisconnected, ExecutionError, ExecutionTimeout, create_backend,
+    result_digest
+)
+from sqlcmd_parser import convert_rows
 
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(message)s"
 )
 
+class _ChunkedWriter:
+    """
+    Buffers small writes and emits them as HTTP/1.1 chunks, or as a plain
+    close-delimited body for HTTP/1.0 clients.
+    """
+
+    def __init__(self, wfile, chunked, buffer_size=64 * 1024):
+        self.wfile = wfile
+        self.chunked = chunked
+        self.buffer_size = buffer_size
+        self.bytes_written = 0
+        self._buf = []
+        self._buffered = 0
+
+    def write(self, text):
+        data = text.encode("utf-8")
+        self._buf.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffered:
+            return
+        data = b"".join(self._buf)
+        self._buf = []
+        self._buffered = 0
+        if self.chunked:
+            self.wfile.write(b"%X\r\n%s\r\n" % (len(data), data))
+        else:
+            self.wfile.write(data)
+        self.wfile.flush()
+        self.bytes_written += len(data)
+
+    def finish(self):
+        self.flush()
+        if self.chunked:
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+# Credentials in query strings are masked in the access log
+_SECRET_PARAM_RE = re.compile(r"(?<=[?&])(pass|token)=[^&\s]*")
+
+# Bounded label values for the metrics "route" label
+_ROUTES = {
+    "/api": "api",
+    "/api/batch": "batch",
+    "/auth": "auth",
+    "/auth/logout": "auth",
+    "/stats": "stats",
+    "/metrics": "metrics",
+}
+
 class SQLHttpHandler(http.server.BaseHTTPRequestHandler):
+    # Persistent connections and chunked responses
+    protocol_version = "HTTP/1.1"
+    # Headers, body and chunks are separate writes; without TCP_NODELAY a
+    # kept-alive connection stalls on delayed ACKs (~40 ms per response)
+    disable_nagle_algorithm = True
+
     # populated at runtime from config
     allowed_map = {}
+    proc_params = {}
+    page_keys = {}
+    max_page_size = 10000
     sql_server = "localhost"
     database = "YourAppDB"
+    backend = None
+    targets = {}
+    target_timeout = 30
+    fleet_max_parallel = 16
+    cache = None
+    cache_ttls = {}
+    exec_timeout = 0
+    exec_timeouts = {}
+    stream_default = False
+    single_flight = None
+    admission = None
+    sessions = None
+    audit = None
+    profiler = None
+    server_timing = True
+    batch_max_procs = 20
+    batch_max_parallel = 4
+    metrics = MetricsRegistry()
+
+    # Keep-alive: idle seconds before an open connection is closed (also the
+    # socket timeout while reading a request) and requests per connection
+    timeout = 5
+    keepalive_max_requests = 100
+
+    # per-request state, reset by handle_request
+    _status = None
+    _bytes_sent = 0
+    _timings = None
+    _request_started = 0.0
+    _body_read = False
+    _content_length = 0
+    _audit_procs = ()
+    _audit_login = None
+
+    def setup(self):
+        super().setup()
+        self._requests_handled = 0
+        self.metrics.inc("sqlbridge_connections_total")
+
+    def handle(self):
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection and self._await_next_request():
+            self.handle_one_request()
+
+    def _await_next_request(self):
+        """
+        Wait up to `timeout` for the next request on a kept-alive connection.
+        Returns False (close) on idle timeout, when the client hung up, or as
+        soon as other connections are waiting for a worker thread.
+        """
+        deadline = time.monotonic() + self.timeout
+        saw_readable = False
+        while True:
+            # Non-blocking peek: also sees a pipelined request already buffered
+            self.connection.setblocking(False)
+            try:
+                if self.rfile.peek(1):
+                    return True
+            except OSError:
+                return False
+            finally:
+                self.connection.settimeout(self.timeout)
+            if saw_readable:
+                return False        # readable but empty: client closed
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self.server.waiting_connections() > 0:
+                return False
+            ready, _, _ = select.select([self.connection], [], [], min(remaining, 0.25))
+            saw_readable = bool(ready)
+
+    def _send_connection_headers(self, reusable=True):
+        """
+        Keep the connection open for the next request unless the client asked
+        to close, the body was left unread, the per-connection limit is
+        reached, or other connections are waiting for a worker thread.
+        """
+        # Whatever follows an unread (or unframeable) body on the socket
+        # must never be parsed as the next request
+        unread_body = not self._body_read
+        if (not reusable or self.close_connection or unread_body
+                or self._requests_handled >= self.keepalive_max_requests
+                or self.server.waiting_connections() > 0):
+            self.close_connection = True
+            self.send_header("Connection", "close")
+            return
+        self.send_header("Connection", "keep-alive")
+        self.send_header("Keep-Alive", "timeout=%d, max=%d" % (
+            self.timeout, self.keepalive_max_requests - self._requests_handled))
+
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
 
-    def _send_json(self, status_code, payload_obj):
+    def log_request(self, code="-", size="-"):
+        if isinstance(code, http.HTTPStatus):
+            code = code.value
+        self.log_message('"%s" %s %s', _SECRET_PARAM_RE.sub(r"\1=***", self.requestline),
+                         str(code), str(size))
+
+    def _send_json(self, status_code, payload_obj, headers=None):
         """Send back JSON HTTP response."""
-        body = json.dumps(payload_obj, indent=2)
+        started = time.perf_counter()
+        body = json.dumps(payload_obj, indent=2, default=json_default).encode("utf-8")
+        self._timings["serialize"] = time.perf_counter() - started
+        self._send_body(status_code, "application/json", body, headers)
+
+    def _send_server_timing(self):
+        """Server-Timing header with the phases measured so far, in ms."""
+        if not self.server_timing:
+            return
+        phases = ["%s;dur=%.1f" % (phase, seconds * 1000)
+                  for phase, seconds in self._timings.items()]
+        phases.append("total;dur=%.1f" % ((time.perf_counter() - self._request_started) * 1000))
+        self.send_header("Server-Timing", ", ".join(phases))
+
+    def _send_body(self, status_code, content_type, body, headers=None):
+        """Send back an already-encoded response body."""
         self.send_response(status_code)
-        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Type", content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self._send_server_timing()
         self.send_header("Content-Length", str(len(body)))
+        self._send_connection_headers()
+        self.end_headers()
+        self.wfile.write(body)
+        self._bytes_sent += len(body)
+
+    def _etag_matches(self, etag):
+        """True if If-None-Match lists `etag` (weak comparison) or is *."""
+        header = self.headers.get("If-None-Match")
+        if not header:
+            return False
+        for candidate in header.split(","):
+            candidate = candidate.strip()
+            if candidate == "*" or candidate.replace("W/", "", 1) == etag:
+                return True
+        return False
+
+    def _send_not_modified(self, headers):
+        """304 for an unchanged result: validators only, no body."""
+        self.send_response(304)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self._send_server_timing()
+        self._send_connection_headers()
         self.end_headers()
-        self.wfile.write(body.encode("utf-8"))
+
+    def _admit(self, proc_key, login):
+        """Admission slot for one execution, or a no-op without limits."""
+        if self.admission is None:
+            return contextlib.nullcontext()
+        return self.admission.admit(proc_key, login)
+
+    def _exec_limits(self, proc_key, shared=False):
+        """timeout / client_gone arguments for one backend execution."""
+        timeout = self.exec_timeouts.get(proc_key, self.exec_timeout) or None
+        # A cached or coalesced execution also serves other callers, so it is
+        # not stopped when this one disconnects
+        return {"timeout": timeout, "client_gone": None if shared else self._client_gone}
+
+    def _client_gone(self):
+        """True once the client closed or reset the connection (polled by the watchdog)."""
+        try:
+            ready, _, _ = select.select([self.connection], [], [], 0)
+            if not ready:
+                return False
+            # Readable with nothing to read is EOF; a pipelined request is not
+            return not self.connection.recv(1, socket.MSG_PEEK)
+        except (OSError, ValueError):
+            return True
+
+    def _send_aborted(self, ex, proc_key):
+        """Response for a batch the watchdog stopped."""
+        if isinstance(ex, ExecutionTimeout):
+            self.metrics.inc("sqlbridge_exec_aborted_total", (("reason", "timeout"),))
+            logging.warning("Execution of '%s' timed out", proc_key)
+            self._send_json(504, {"error": "execution timed out"})
+            return
+        self.metrics.inc("sqlbridge_exec_aborted_total", (("reason", "disconnect"),))
+        logging.info("Client disconnected, stopped execution of '%s'", proc_key)
+        # Nobody to answer: record 499 (client closed request) and drop the connection
+        self._status = 499
+        self.close_connection = True
+
+    def _session_token(self, params):
+        auth = self.headers.get("Authorization", "")
+        if auth[:7].lower() == "bearer ":
+            return auth[7:].strip()
+        return params.get("token")
+
+    def _apply_session(self, params):
+        """
+        Replace a session token (Authorization: Bearer or token=) with the
+        login and password it was issued for. Sends 401 and returns False
+        if the token is unknown or expired.
+        """
+        token = self._session_token(params)
+        if not token:
+            return True
+        creds = self.sessions.resolve(token) if self.sessions is not None else None
+        if creds is None:
+            self._send_json(401, {"error": "invalid or expired token"})
+            return False
+        params["user"], params["pass"] = creds
+        return True
+
+    def _handle_auth(self, path_only):
+        """
+        POST /auth (user, pass): validate the login once, return a token.
+        POST /auth/logout (token): revoke it.
+        """
+        if self.sessions is None:
+            self._send_json(404, {"error": "not found"})
+            return
+        if self.command != "POST":
+            self._send_json(405, {"error": "method not allowed"}, headers={"Allow": "POST"})
+            return
+
+        params = self._parse_params()
+        if path_only == "/auth/logout":
+            token = self._session_token(params)
+            self._send_json(200, {"revoked": bool(token) and self.sessions.revoke(token)})
+            return
+
+        req_user = params.get("user")
+        req_pass = params.get("pass")
+        if not req_user or not req_pass:
+            self._send_json(400, {"error": "missing required params: user, pass"})
+            return
+        self._audit_login = req_user
+        self._audit_procs.append("/auth")
+
+        try:
+            with self._admit("/auth", req_user):
+                self.backend.authenticate(req_user, req_pass)
+        except ExecutionError:
+            self._send_json(401, {"error": "auth or exec failed"})
+            return
+        except Overloaded as ex:
+            self._send_overloaded(ex)
+            return
+        except BackendUnavailable as ex:
+            logging.error("Backend %s unavailable: %s", self.backend.name, ex)
+            self._send_json(503, {"error": "service unavailable"})
+            return
+
+        token, ttl = self.sessions.create(req_user, req_pass)
+        logging.info("Issued session token for login '%s'", req_user)
+        self._send_json(200, {
+            "token": token,
+            "token_type": "Bearer",
+            "expires_in": int(ttl),
+            "login": req_user
+        }, headers={"Cache-Control": "no-store"})
+
+    def _send_overloaded(self, ex):
+        logging.warning("Shedding request: %s", ex)
+        self.metrics.inc("sqlbridge_shed_total", (("reason", ex.reason),))
+        self._send_json(503, {"error": "overloaded"},
+                        headers={"Retry-After": str(ex.retry_after)})
+
+    def _stream_result(self, fmt, req_proc_key, sp_name, req_user, req_pass, bound=()):
+        """
+        Execute and write rows as they are parsed, using chunked transfer
+        encoding and compact separators. For json, row_count follows the
+        rows since it is only known at the end. Errors raised before the
+        first row is read propagate to the caller; later failures truncate
+        the response.
+        """
+        logging.info("Streaming stored proc '%s' as login '%s'", sp_name, req_user)
+        started = time.perf_counter()
+        writer = None
+
+        try:
+            with self._admit(req_proc_key, req_user), \
+                    self.backend.stream(sp_name, req_user, req_pass, params=bound,
+                                        **self._exec_limits(req_proc_key)) as (cols, rows):
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPES[fmt])
+                # only the phases before the first row; the rest is in /metrics
+                self._timings["first_row"] = time.perf_counter() - started
+                self._send_server_timing()
+                chunked = self.request_version != "HTTP/1.0"
+                if chunked:
+                    self.send_header("Transfer-Encoding", "chunked")
+                # HTTP/1.0 bodies are delimited by closing the connection
+                self._send_connection_headers(reusable=chunked)
+                self.end_headers()
+
+                writer = _ChunkedWriter(self.wfile, chunked)
+                for piece in render(fmt, req_proc_key, sp_name, cols, rows):
+                    writer.write(piece)
+        except (ExecutionError, ExecutionTimeout, ClientDisconnected, BackendUnavailable):
+            if writer is None:
+                raise
+            # Status already sent: end without the terminating chunk so the
+            # client sees an incomplete response rather than partial data
+            logging.warning("Stream for '%s' failed after %d bytes",
+                            sp_name, writer.bytes_written)
+            self._bytes_sent += writer.bytes_written
+            self.close_connection = True
+            return
+
+        writer.finish()
+        self._bytes_sent += writer.bytes_written
+        # exec, parse and serialize are interleaved when streaming
+        self._timings["stream"] = time.perf_counter() - started
+
+    def _parse_content_length(self):
+        """
+        Content-Length as a non-negative int, 0 if absent, None if malformed
+        or sent more than once with different values.
+        """
+        values = set(self.headers.get_all("Content-Length") or ())
+        if not values:
+            return 0
+        if len(values) > 1:
+            return None
+        try:
+            length = int(values.pop())
+        except ValueError:
+            return None
+        return length if length >= 0 else None
 
     def _parse_params(self):
         """Parse GET query string and POST form body (application/x-www-form-urlencoded)."""
@@ -45,8 +448,12 @@ class SQLHttpHandler(http.server.BaseHTTPRequestHandler):
 
         # POST
         if self.command == "POST":
-            length = int(self.headers.get("Content-Length", "0"))
-            raw = self.rfile.read(length).decode("utf-8")
+            if self._content_length is None:
+                raise ParamError("invalid Content-Length header")
+            body = self.rfile.read(self._content_length)
+            # a short read (client hung up mid-body) leaves the framing unknown
+            self._body_read = len(body) == self._content_length
+            raw = body.decode("utf-8")
             post_qs = urllib.parse.parse_qs(raw)
             for k, v in post_qs.items():
                 if v:
@@ -60,14 +467,445 @@ class SQLHttpHandler(http.server.BaseHTTPRequestHandler):
     def do_POST(self):
         self.handle_request()
 
+    def _send_result_sets(self, fmt, req_proc_key, sp_name, result_sets, extra_headers):
+        """Response for resultsets=all: one entry per result set, in order."""
+        if fmt == "columnar":
+            render_started = time.perf_counter()
+            body = dumps_compact({
+                "proc": req_proc_key,
+                "sp_name": sp_name,
+                "result_sets": [columnar_set(cols, rows) for cols, rows in result_sets]
+            }).encode("utf-8")
+            self._timings["serialize"] = time.perf_counter() - render_started
+            self._send_body(200, CONTENT_TYPES[fmt], body, headers=extra_headers)
+            return
+
+        self._send_json(200, {
+            "proc": req_proc_key,
+            "sp_name": sp_name,
+            "result_sets": [
+                {"row_count": len(rows), "rows": [dict(zip(cols, row)) for row in rows]}
+                for cols, rows in result_sets
+            ]
+        }, headers=extra_headers)
+
+    def _fetch_result(self, proc_key, sp_name, req_user, req_pass, extra_headers,
+                      timings=None, bound=(), target=None):
+        """
+        Buffered execution through the result cache and single-flight layers.
+        Returns [(cols, rows), ...], one entry per result set;
+        ExecutionError / BackendUnavailable propagate.
+        X-Cache / X-Coalesced response headers are added to extra_headers and
+        backend phase durations to `timings` when this call executed the proc.
+        `target` runs the proc on a named [targets] server instead.
+        """
+        # Bound to the password too, so a wrong password never shares a result
+        result_key = (proc_key, params_key(bound), req_user, credential_digest(req_pass), target)
+        ttl = self.cache_ttls.get(proc_key, 0)
+        limits = self._exec_limits(proc_key, shared=self.cache is not None and ttl > 0)
+        backend = self.backend
+        admit_key = proc_key
+        where = ""
+        if target is not None:
+            backend = self.targets[target]
+            # Each target is its own server: limits apply per proc and target
+            admit_key = "%s@%s" % (proc_key, target)
+            where = " on %s" % target
+            if self.target_timeout:
+                limits["timeout"] = min(limits["timeout"] or self.target_timeout,
+                                        self.target_timeout)
+
+        def execute():
+            admit_started = time.perf_counter()
+            with self._admit(admit_key, req_user):
+                if timings is not None:
+                    timings["admission"] = time.perf_counter() - admit_started
+                logging.info("Executing stored proc '%s' as login '%s'%s",
+                             sp_name, req_user, where)
+                return backend.execute(sp_name, req_user, req_pass, timings, params=bound,
+                                       **limits)
+
+        def load():
+            if self.single_flight is None:
+                return execute()
+            try:
+                result, shared = self.single_flight.do(result_key, execute)
+            except ClientDisconnected:
+                # The leader's client went away; if ours is still here, run again
+                if self._client_gone():
+                    raise
+                result, shared = self.single_flight.do(result_key, execute)
+            if shared:
+                extra_headers["X-Coalesced"] = "true"
+            return result
+
+        def load_for_cache():
+            result_sets = load()
+            return result_sets, sum(estimate_result_size(c, r) for c, r in result_sets)
+
+        if self.cache is not None and ttl > 0:
+            result_sets, cache_status = self.cache.get_or_load(result_key, ttl, load_for_cache)
+            extra_headers["X-Cache"] = cache_status.upper()
+            return result_sets
+        return load()
+
+    def _fetch_page(self, proc_key, sp_name, req_user, req_pass, bound, offset, limit,
+                    extra_headers):
+        """
+        One page of the first result set: (cols, page_rows, has_more).
+
+        Cached procs are paged from the cached full result. Otherwise the
+        proc is streamed and execution stops once limit + 1 rows were read;
+        with typed_values the page is then typed column by column like a
+        buffered result (convert_rows), not value by value.
+        """
+        if (self.cache is not None and self.cache_ttls.get(proc_key, 0) > 0
+                and proc_key not in self.page_keys):
+            result_sets = self._fetch_result(proc_key, sp_name, req_user, req_pass,
+                                             extra_headers, self._timings, bound)
+            cols, rows = result_sets[0] if result_sets else ([], [])
+            page, has_more = read_page(iter(rows), offset, limit)
+            return cols, page, has_more
+
+        logging.info("Executing stored proc '%s' as login '%s' (rows %d-%d)",
+                     sp_name, req_user, offset, offset + limit)
+        started = time.perf_counter()
+        typed = getattr(self.backend, "typed", False)
+        with self._admit(proc_key, req_user), \
+                self.backend.stream(sp_name, req_user, req_pass, params=bound, typed=False,
+                                    **self._exec_limits(proc_key)) as (cols, rows):
+            page, has_more = read_page(rows, offset, limit)
+        if typed:
+            page = convert_rows(page)
+        # execution and parsing are interleaved when reading a page
+        self._timings["exec"] = time.perf_counter() - started
+        return cols, page, has_more
+
+    def _parse_targets(self, raw):
+        """targets= value -> configured target names (all = every target), or None."""
+        if raw.strip().lower() == "all":
+            return list(self.targets)
+        # names are case-insensitive, like all config keys
+        names = list(dict.fromkeys(t.strip().lower() for t in raw.split(",") if t.strip()))
+        unknown = [t for t in names if t not in self.targets]
+        if unknown or not names:
+            self._send_json(400, {"error": "unknown target: %s" % ", ".join(unknown)
+                                  if unknown else "missing targets"})
+            return None
+        return names
+
+    def _run_fleet(self, proc_key, sp_name, req_user, req_pass, bound, target_names):
+        """
+        Run one proc on every named target concurrently (at most
+        fleet_max_parallel at a time). Returns (cols, rows, statuses): the
+        rows of every target that answered, each prefixed with the target
+        name, and one status entry per target in request order. A target
+        that fails or passes target_timeout only affects its own entry.
+        """
+        def run_one(name):
+            started = time.perf_counter()
+            entry = {"target": name}
+            result = None
+            try:
+                result_sets = self._fetch_result(proc_key, sp_name, req_user, req_pass, {},
+                                                 bound=bound, target=name)
+                result = result_sets[0] if result_sets else ([], [])
+                entry.update(status=200, row_count=len(result[1]))
+            except ExecutionError:
+                entry.update(status=401, error="auth or exec failed")
+            except ExecutionTimeout:
+                self.metrics.inc("sqlbridge_exec_aborted_total", (("reason", "timeout"),))
+                entry.update(status=504, error="target timed out")
+            except ClientDisconnected:
+                entry.update(status=499, error="client disconnected")
+            except Overloaded as ex:
+                self.metrics.inc("sqlbridge_shed_total", (("reason", ex.reason),))
+                entry.update(status=503, error="overloaded")
+            except BackendUnavailable as ex:
+                logging.error("Target %s unavailable: %s", name, ex)
+                entry.update(status=503, error="target unavailable")
+            except Exception as ex:
+                logging.exception("Unhandled error for '%s' on target %s: %s", proc_key, name, ex)
+                entry.update(status=500, error="internal server error")
+            entry["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            return entry, result
+
+        fanout = min(self.fleet_max_parallel, len(target_names))
+        with ThreadPoolExecutor(max_workers=fanout, thread_name_prefix="sql-http-fleet") as pool:
+            results = list(pool.map(run_one, target_names))
+
+        # Rows are merged under the first answering target's columns; a
+        # target returning a different shape is reported, not merged
+        merged_cols = None
+        merged_rows = []
+        for entry, result in results:
+            if result is None:
+                continue
+            cols, rows = result
+            # The leading column carries the target name; a proc column of
+            # the same name would overwrite it in json rows
+            if any(c.lower() == "target" for c in cols):
+                entry.update(status=500, error="result has a 'target' column")
+                del entry["row_count"]
+                continue
+            if merged_cols is None:
+                merged_cols = list(cols)
+            elif list(cols) != merged_cols:
+                entry.update(status=500, error="result columns differ from other targets")
+                del entry["row_count"]
+                continue
+            merged_rows.extend((entry["target"],) + tuple(row) for row in rows)
+        cols = ["target"] + (merged_cols or [])
+        return cols, merged_rows, [entry for entry, _ in results]
+
+    def _send_fleet_result(self, fmt, proc_key, sp_name, req_user, req_pass, bound,
+                           target_names):
+        cols, rows, statuses = self._run_fleet(proc_key, sp_name, req_user, req_pass, bound,
+                                               target_names)
+        if any(entry["status"] == 499 for entry in statuses):
+            self._send_aborted(ClientDisconnected(), proc_key)
+            return
+
+        # 200 unless every target failed the same way (as /api/batch)
+        codes = {entry["status"] for entry in statuses}
+        status = codes.pop() if len(codes) == 1 else 200
+        headers = {
+            "X-Fleet-Status": ",".join("%s=%d" % (e["target"], e["status"]) for e in statuses)
+        }
+        if status == 503 and self.admission is not None:
+            headers["Retry-After"] = str(self.admission.retry_after)
+
+        if fmt == "json":
+            self._send_json(status, {
+                "proc": proc_key,
+                "sp_name": sp_name,
+                "targets": statuses,
+                "row_count": len(rows),
+                "rows": [dict(zip(cols, row)) for row in rows]
+            }, headers=headers)
+            return
+
+        render_started = time.perf_counter()
+        body = "".join(render(fmt, proc_key, sp_name, cols, rows)).encode("utf-8")
+        self._timings["serialize"] = time.perf_counter() - render_started
+        self._send_body(status, CONTENT_TYPES[fmt], body, headers=headers)
+
+    def _handle_batch(self):
+        """
+        /api/batch?procs=Inventory,Balance&user=...&pass=...
+
+        Runs the listed allowlisted procs concurrently (at most
+        batch_max_parallel at a time) and returns one response with a status,
+        timing and rows per proc. Other request parameters are bound to each
+        proc that declares them.
+        """
+        params = self._parse_params()
+        if not self._apply_session(params):
+            return
+        raw_procs = params.get("procs")
+        req_user  = params.get("user")
+        req_pass  = params.get("pass")
+
+        if not raw_procs or not req_user or not req_pass:
+            self._send_json(400, {"error": "missing required params: procs, user, pass"})
+            return
+        self._audit_login = req_user
+
+        # de-duplicate, keep request order
+        proc_keys = list(dict.fromkeys(k.strip() for k in raw_procs.split(",") if k.strip()))
+        if not proc_keys:
+            self._send_json(400, {"error": "missing required params: procs, user, pass"})
+            return
+        if len(proc_keys) > self.batch_max_procs:
+            self._send_json(400, {"error": "too many procs (max %d)" % self.batch_max_procs})
+            return
+
+        def run_one(proc_key):
+            started = time.perf_counter()
+            item = {"proc": proc_key}
+            sp_name = self.allowed_map.get(proc_key)
+            if not sp_name:
+                item.update(status=400, error="invalid proc")
+                return item
+
+            item["sp_name"] = sp_name
+            self._audit_procs.append(sp_name)
+            try:
+                bound = bind_params(self.proc_params.get(proc_key), params)
+                result_sets = self._fetch_result(proc_key, sp_name, req_user, req_pass, {},
+                                                 bound=bound)
+                cols, rows = result_sets[0] if result_sets else ([], [])
+                item.update(
+                    status=200,
+                    row_count=len(rows),
+                    rows=[dict(zip(cols, row)) for row in rows]
+                )
+            except ParamError as ex:
+                item.update(status=400, error=str(ex))
+            except ExecutionError:
+                item.update(status=401, error="auth or exec failed")
+            except ExecutionTimeout:
+                self.metrics.inc("sqlbridge_exec_aborted_total", (("reason", "timeout"),))
+                item.update(status=504, error="execution timed out")
+            except ClientDisconnected:
+                item.update(status=499, error="client disconnected")
+            except Overloaded as ex:
+                self.metrics.inc("sqlbridge_shed_total", (("reason", ex.reason),))
+                item.update(status=503, error="overloaded")
+            except BackendUnavailable as ex:
+                logging.error("Backend %s unavailable: %s", self.backend.name, ex)
+                item.update(status=503, error="service unavailable")
+            except Exception as ex:
+                logging.exception("Unhandled error in batch proc '%s': %s", proc_key, str(ex))
+                item.update(status=500, error="internal server error")
+            item["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            return item
+
+        started = time.perf_counter()
+        fanout = min(self.batch_max_parallel, len(proc_keys))
+        with ThreadPoolExecutor(max_workers=fanout, thread_name_prefix="sql-http-batch") as pool:
+            results = list(pool.map(run_one, proc_keys))
+
+        if any(r["status"] == 499 for r in results):
+            self._send_aborted(ClientDisconnected(), "batch")
+            return
+
+        # 200 with per-proc statuses, unless every proc failed the same way
+        statuses = {r["status"] for r in results}
+        status = statuses.pop() if len(statuses) == 1 else 200
+        headers = None
+        if status == 503 and self.admission is not None:
+            headers = {"Retry-After": str(self.admission.retry_after)}
+
+        self._send_json(status, {
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            "results": results
+        }, headers=headers)
+
+    def _send_metrics(self):
+        extra = []
+        if self.cache is not None:
+            stats = self.cache.stats()
+            for name in ("hits", "stale_hits", "misses", "evictions", "refresh_errors"):
+                extra.append(("sqlbridge_cache_%s_total" % name, (), stats[name]))
+            extra.append(("sqlbridge_cache_bytes", (), stats["bytes"]))
+            extra.append(("sqlbridge_cache_entries", (), stats["entries"]))
+        if self.single_flight is not None:
+            stats = self.single_flight.stats()
+            extra.append(("sqlbridge_coalesced_total", (), stats["coalesced"]))
+        if self.audit is not None:
+            stats = self.audit.stats()
+            for name in ("written", "spilled", "replayed", "dropped"):
+                extra.append(("sqlbridge_audit_%s_total" % name, (), stats[name]))
+            extra.append(("sqlbridge_audit_queued", (), stats["queued"]))
+        body = self.metrics.render(extra).encode("utf-8")
+        self._send_body(200, "text/plain; version=0.0.4; charset=utf-8", body)
+
     def handle_request(self):
+        started = time.perf_counter()
+        self._request_started = started
+        self._status = None
+        self._bytes_sent = 0
+        self._timings = {}
+        self._proc_label = "-"
+        self._audit_procs = []
+        self._audit_login = None
+        self._content_length = self._parse_content_length()
+        # Only a request without a body is fully read up front; a POST body
+        # is read by _parse_params, any other body is never read, so the
+        # connection is closed after the response
+        self._body_read = (self._content_length == 0
+                           and "Transfer-Encoding" not in self.headers)
+        self._requests_handled += 1
+        if self._requests_handled == 1:
+            # time this connection waited for a worker thread
+            self._timings["queue"] = self.server.queued_seconds()
+
+        path_only = self.path.split("?")[0].rstrip("/")
+        route = _ROUTES.get(path_only, "other")
+        in_flight = (("route", route),)
+        self.metrics.inc("sqlbridge_in_flight_requests", in_flight)
+        profile = self.profiler.start() if self.profiler is not None else None
+        try:
+            if "Transfer-Encoding" in self.headers:
+                # Chunked bodies are not supported; reading them by
+                # Content-Length would let a body smuggle a second request
+                self.close_connection = True
+                self._send_json(501, {"error": "Transfer-Encoding is not supported, send Content-Length"})
+            else:
+                self._dispatch(path_only)
+        finally:
+            self.metrics.inc("sqlbridge_in_flight_requests", in_flight, -1)
+            elapsed = time.perf_counter() - started
+            self._record_metrics(route, elapsed)
+            self._write_audit(elapsed)
+            if self.profiler is not None:
+                self.profiler.finish(profile, elapsed, "%s %s [%s]" % (
+                    _SECRET_PARAM_RE.sub(r"\1=***", self.requestline), self._status,
+                    " ".join("%s=%.1fms" % (k, v * 1000) for k, v in self._timings.items())))
+
+    def _write_audit(self, elapsed):
+        """Queue one Api_AccessLog record per proc this request ran (or was refused)."""
+        if self.audit is None or not self._audit_procs:
+            return
+        client_info = "sql-http-bridge client=%s status=%s ms=%.1f" % (
+            self.client_address[0], self._status or 0, elapsed * 1000)
+        for proc_name in self._audit_procs:
+            self.audit.record(proc_name, self._audit_login, client_info)
+
+    def _record_metrics(self, route, elapsed):
+        status = str(self._status or 0)
+        proc = self._proc_label
+        m = self.metrics
+        m.inc("sqlbridge_requests_total", (("route", route), ("proc", proc), ("status", status)))
+        m.observe("sqlbridge_request_seconds", (("route", route), ("proc", proc)), elapsed)
+        m.inc("sqlbridge_response_bytes_total", (("route", route), ("proc", proc)), self._bytes_sent)
+        if self._status is None or self._status >= 400:
+            m.inc("sqlbridge_errors_total", (("route", route), ("status", status)))
+        for phase, seconds in self._timings.items():
+            m.observe("sqlbridge_phase_seconds", (("proc", proc), ("phase", phase)), seconds)
+
+    def _dispatch(self, path_only):
         try:
-            path_only = self.path.split("?")[0]
-            if path_only not in ["/api", "/api/"]:
+            if path_only == "/metrics":
+                self._send_metrics()
+                return
+            if path_only == "/stats":
+                self._send_json(200, {
+                    "backend": self.backend.name,
+                    "cache": self.cache.stats() if self.cache else None,
+                    "single_flight": self.single_flight.stats() if self.single_flight else None,
+                    "admission": self.admission.stats() if self.admission else None,
+                    "sessions": self.sessions.stats() if self.sessions else None,
+                    "targets": list(self.targets),
+                    "audit": self.audit.stats() if self.audit else None
+                })
+                return
+            if path_only in ("/api", "/api/batch", "/auth") and self.admission is not None:
+                # Connections that already waited out the queue timeout for a
+                # worker are shed before doing any work
+                try:
+                    # only the first request on a connection waited in the queue
+                    if self._requests_handled == 1:
+                        self.admission.check_queue_wait(self.server.queued_seconds())
+                except Overloaded as ex:
+                    self._send_overloaded(ex)
+                    return
+            if path_only in ("/auth", "/auth/logout"):
+                self._handle_auth(path_only)
+                return
+            if path_only == "/api/batch":
+                self._handle_batch()
+                return
+            if path_only != "/api":
                 self._send_json(404, {"error": "not found"})
                 return
 
+            params_started = time.perf_counter()
             params = self._parse_params()
+            self._timings["params"] = time.perf_counter() - params_started
+            if not self._apply_session(params):
+                return
             req_proc_key = params.get("proc")
             req_user     = params.get("user")
             req_pass     = params.get("pass")
@@ -81,93 +919,246 @@ class SQLHttpHandler(http.server.BaseHTTPRequestHandler):
             if not sp_name:
                 self._send_json(400, {"error": "invalid proc"})
                 return
+            self._proc_label = req_proc_key
+            self._audit_login = req_user
+            self._audit_procs.append(sp_name)
 
-            tsql = f"SET NOCOUNT ON; EXEC {sp_name}"
-
-            # Resolve sqlcmd path for Linux or Windows
-            sqlcmd_candidates = ["sqlcmd"]
-            if platform.system().lower().startswith("win"):
-                sqlcmd_candidates.insert(0, "sqlcmd.exe")
-
-            sqlcmd_path = None
-            for cand in sqlcmd_candidates:
-                for p in os.environ.get("PATH", "").split(os.pathsep):
-                    full = os.path.join(p, cand)
-                    if os.path.isfile(full):
-                        sqlcmd_path = full
-                        break
-                if sqlcmd_path:
-                    break
-
-            if sqlcmd_path is None:
-                logging.error("sqlcmd not found in PATH")
-                self._send_json(500, {"error": "internal server error"})
-                return
-
-            cmd = [
-                sqlcmd_path,
-                "-S", self.sql_server,
-                "-d", self.database,
-                "-U", req_user,
-                "-P", req_pass,
-                "-Q", tsql,
-                "-W",      # trim trailing spaces
-                "-s", "|"  # pipe delimiter
-            ]
+            # limit / cursor: one page of the first result set
+            cursor = params.get("cursor")
+            paging = cursor is not None or params.get("limit") is not None
+            page_key = self.page_keys.get(req_proc_key)
+            offset = 0
+            if paging:
+                try:
+                    limit = int(params.get("limit") or self.max_page_size)
+                except ValueError:
+                    limit = 0
+                if not 1 <= limit <= self.max_page_size:
+                    self._send_json(400, {"error": "limit must be 1-%d" % self.max_page_size})
+                    return
+                if params.get("resultsets", "first").lower() == "all":
+                    self._send_json(400, {"error": "limit / cursor apply to the first result set only"})
+                    return
+
+            # Declared proc parameters, validated before anything is executed
+            try:
+                if cursor:
+                    offset = apply_cursor(cursor, req_proc_key, page_key, params)
+                bound = bind_params(self.proc_params.get(req_proc_key), params)
+                if cursor:
+                    check_fingerprint(cursor, req_proc_key, bound, page_key)
+            except (ParamError, CursorError) as ex:
+                self._send_json(400, {"error": str(ex)})
+                return
 
-            logging.info("Executing stored proc '%s' as login '%s'", sp_name, req_user)
+            fmt = params.get("format", "json").lower()
+            if fmt not in CONTENT_TYPES:
+                self._send_json(400, {"error": "invalid format"})
+                return
 
-            completed = subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
+            # resultsets=all returns every result set of the EXEC (json / columnar)
+            all_sets = params.get("resultsets", "first").lower() == "all"
+            if all_sets and fmt not in ("json", "columnar"):
+                self._send_json(400, {"error": "resultsets=all requires format=json or columnar"})
+                return
 
-            if completed.returncode != 0:
-                logging.warning(
-                    "sqlcmd error rc=%s stderr=%s",
-                    completed.returncode,
-                    completed.stderr.strip()
-                )
+            stream = params.get("stream", "").lower() in ("1", "true", "yes") or self.stream_default
+
+            # targets=a,b (or all): same proc on several configured servers, merged
+            if params.get("targets") is not None:
+                if paging or all_sets:
+                    self._send_json(400, {"error": "targets cannot be combined with "
+                                                   "limit, cursor or resultsets=all"})
+                    return
+                target_names = self._parse_targets(params["targets"])
+                if target_names is None:
+                    return
+                self._send_fleet_result(fmt, req_proc_key, sp_name, req_user, req_pass, bound,
+                                        target_names)
+                return
+
+            extra_headers = {}
+            page_cursor = None
+            try:
+                if paging:
+                    cols, rows, has_more = self._fetch_page(
+                        req_proc_key, sp_name, req_user, req_pass, bound, offset, limit,
+                        extra_headers)
+                    if has_more:
+                        page_cursor = next_cursor(req_proc_key, bound, page_key, cols, rows, offset)
+                        extra_headers["X-Next-Cursor"] = page_cursor
+                    result_sets = [(cols, rows)]
+                elif (stream and not all_sets and fmt in STREAMABLE
+                        and not self.cache_ttls.get(req_proc_key)):
+                    self._stream_result(fmt, req_proc_key, sp_name, req_user, req_pass, bound)
+                    return
+                else:
+                    result_sets = self._fetch_result(req_proc_key, sp_name, req_user, req_pass,
+                                                     extra_headers, self._timings, bound)
+            except ExecutionError:
                 self._send_json(401, {"error": "auth or exec failed"})
                 return
+            except (ExecutionTimeout, ClientDisconnected) as ex:
+                self._send_aborted(ex, req_proc_key)
+                return
+            except CursorError as ex:
+                # page_keys column missing or NULL in the result: a proc / config mismatch
+                logging.error("Cannot page %s: %s", req_proc_key, ex)
+                self._send_json(500, {"error": str(ex)})
+                return
+            except Overloaded as ex:
+                self._send_overloaded(ex)
+                return
+            except BackendUnavailable as ex:
+                logging.error("Backend %s unavailable: %s", self.backend.name, ex)
+                self._send_json(503, {"error": "service unavailable"})
+                return
 
-            lines = completed.stdout.strip().splitlines()
+            # Same data in the same shape: answer a matching If-None-Match with
+            # 304 before anything is serialized
+            etag = '"%s"' % hashlib.blake2b(repr((
+                result_digest(result_sets), req_proc_key, sp_name, fmt, all_sets, paging,
+                page_cursor)).encode("utf-8"), digest_size=16).hexdigest()
+            extra_headers["ETag"] = etag
+            if self._etag_matches(etag):
+                self._send_not_modified(extra_headers)
+                return
 
-            if len(lines) < 3:
-                rows_json = []
-            else:
-                header_line = lines[0]
-                data_lines = []
-                for line in lines[2:]:
-                    if "rows affected" in line:
-                        break
-                    if line.strip() == "":
-                        continue
-                    data_lines.append(line)
-
-                cols = [h.strip() for h in header_line.split("|")]
-
-                rows_json = []
-                for dl in data_lines:
-                    vals = [v.strip() for v in dl.split("|")]
-                    row_obj = {}
-                    for idx, col_name in enumerate(cols):
-                        row_obj[col_name] = vals[idx] if idx < len(vals) else None
-                    rows_json.append(row_obj)
-
-            self._send_json(200, {
+            if all_sets:
+                self._send_result_sets(fmt, req_proc_key, sp_name, result_sets, extra_headers)
+                return
+
+            cols, rows = result_sets[0] if result_sets else ([], [])
+
+            if paging and fmt == "columnar":
+                render_started = time.perf_counter()
+                payload = {"proc": req_proc_key, "sp_name": sp_name}
+                payload.update(columnar_set(cols, rows))
+                payload["next_cursor"] = page_cursor
+                body = dumps_compact(payload).encode("utf-8")
+                self._timings["serialize"] = time.perf_counter() - render_started
+                self._send_body(200, CONTENT_TYPES[fmt], body, headers=extra_headers)
+                return
+
+            if fmt != "json":
+                render_started = time.perf_counter()
+                body = "".join(render(fmt, req_proc_key, sp_name, cols, rows)).encode("utf-8")
+                self._timings["serialize"] = time.perf_counter() - render_started
+                self._send_body(200, CONTENT_TYPES[fmt], body, headers=extra_headers)
+                return
+
+            rows_json = [dict(zip(cols, row)) for row in rows]
+
+            payload = {
                 "proc": req_proc_key,
                 "sp_name": sp_name,
                 "row_count": len(rows_json),
                 "rows": rows_json
-            })
+            }
+            if paging:
+                payload["next_cursor"] = page_cursor
+            self._send_json(200, payload, headers=extra_headers)
 
+        except ParamError as ex:
+            # malformed request framing (e.g. Content-Length); the body
+            # cannot be skipped, so _send_connection_headers closes
+            self._send_json(400, {"error": str(ex)})
         except Exception as ex:
             logging.exception("Unhandled server error: %s", str(ex))
             self._send_json(500, {"error": "internal server error"})
 
+class BoundedThreadPoolServer(socketserver.TCPServer):
+    """
+    TCP server that hands each accepted connection to a fixed pool of worker
+    threads instead of serving it inline on the accept loop.
+
+    At most `workers` requests execute at once and at most `queue_size`
+    accepted connections wait for a free worker. Once both are full the
+    accept loop stops pulling connections, so further clients queue in the
+    kernel listen backlog (`accept_backlog`) rather than in process memory.
+
+    A worker serves one connection for as long as it is kept alive; the
+    handler closes persistent connections while others are waiting.
+    """
+
+    allow_reuse_address = True
+
+    def __init__(self, server_address, handler_class, workers=8,
+                 queue_size=32, accept_backlog=64):
+        self.request_queue_size = accept_backlog
+        self.workers = workers
+        self.queue_size = queue_size
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._worker_state = threading.local()
+        self._waiting = 0
+        self._waiting_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="sql-http-worker"
+        )
+        super().__init__(server_address, handler_class)
+
+    def process_request(self, request, client_address):
+        # Blocks the accept loop while every worker and queue slot is taken.
+        self._slots.acquire()
+        with self._waiting_lock:
+            self._waiting += 1
+        try:
+            self._executor.submit(self._process_in_worker, request, client_address,
+                                  time.monotonic())
+        except RuntimeError:
+            # executor already shut down
+            with self._waiting_lock:
+                self._waiting -= 1
+            self._slots.release()
+            self.shutdown_request(request)
+
+    def _process_in_worker(self, request, client_address, accepted_at):
+        with self._waiting_lock:
+            self._waiting -= 1
+        self._worker_state.queued = time.monotonic() - accepted_at
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def waiting_connections(self):
+        """Accepted connections not yet picked up by a worker thread."""
+        return self._waiting
+
+    def queued_seconds(self):
+        """How long the connection being handled on this thread waited for a worker."""
+        return getattr(self._worker_state, "queued", 0.0)
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=True)
+
+def _parse_pairs(raw):
+    """Parse 'key:value,key:value' config values into a dict."""
+    result = {}
+    if raw.strip():
+        pairs = [p.strip() for p in raw.split(",")]
+        for pair in pairs:
+            if ":" in pair:
+                k, v = pair.split(":", 1)
+                result[k.strip()] = v.strip()
+    return result
+
+def default_audit_spill_path(conf_path):
+    """
+    Spill file when audit_spill_path is not set: the systemd StateDirectory
+    on Linux (the config directory, /etc, is not writable for the service),
+    next to the config file on Windows.
+    """
+    if os.name == "nt":
+        return os.path.join(os.path.dirname(os.path.abspath(conf_path)), "audit-spill.jsonl")
+    return "/var/lib/sql-http-service/audit-spill.jsonl"
+
+
 def load_config(conf_path):
     cfg = configparser.ConfigParser()
     with open(conf_path, "r") as f:
@@ -177,32 +1168,317 @@ def load_config(conf_path):
     database   = cfg.get("service", "database", fallback="master")
     port       = cfg.getint("service", "port", fallback=8080)
 
-    raw_map    = cfg.get("service", "allowed_procs", fallback="")
-    allowed_map = {}
-    if raw_map.strip():
-        pairs = [p.strip() for p in raw_map.split(",")]
-        for pair in pairs:
-            if ":" in pair:
-                k, v = pair.split(":", 1)
-                allowed_map[k.strip()] = v.strip()
+    allowed_map = _parse_pairs(cfg.get("service", "allowed_procs", fallback=""))
+
+    # Typed parameters per proc key: [proc_params] Inventory = ServerID int, HoursBack int = 24
+    proc_params = {}
+    if cfg.has_section("proc_params"):
+        known = {k.lower(): k for k in allowed_map}
+        for option, raw in cfg.items("proc_params"):
+            if option not in known:
+                raise ValueError("proc_params: %r is not in allowed_procs" % option)
+            try:
+                proc_params[known[option]] = parse_param_specs(raw)
+            except ValueError as ex:
+                raise ValueError("proc_params %s: %s" % (known[option], ex)) from ex
 
-    return sql_server, database, port, allowed_map
+    # Keyset paging: proc key -> key column and the proc parameter it feeds,
+    # e.g. Inventory:ItemID>AfterItemID; other procs page by offset
+    page_keys = parse_page_keys(_parse_pairs(cfg.get("service", "page_keys", fallback="")))
+    for proc_key, page_key in page_keys.items():
+        declared = [p.name.lower() for p in proc_params.get(proc_key, [])]
+        if page_key.param.lower() not in declared:
+            raise ValueError("page_keys %s: parameter %s is not declared in [proc_params]"
+                             % (proc_key, page_key.param))
+    max_page_size = cfg.getint("service", "max_page_size", fallback=10000)
+    if max_page_size < 1:
+        raise ValueError("max_page_size must be >= 1")
+
+    # Fleet fan-out: [targets] name = server[/database], each with its own
+    # backend and pool; per-target timeout and parallelism for targets=
+    targets = {}
+    if cfg.has_section("targets"):
+        for name, raw in cfg.items("targets"):
+            server, _, target_db = raw.strip().partition("/")
+            if not server.strip():
+                raise ValueError("targets %s: missing server" % name)
+            targets[name] = (server.strip(), target_db.strip() or database)
+    target_timeout = cfg.getfloat("service", "target_timeout", fallback=30)
+    fleet_max_parallel = cfg.getint("service", "fleet_max_parallel", fallback=16)
+    if fleet_max_parallel < 1:
+        raise ValueError("fleet_max_parallel must be >= 1")
+
+    # Execution timeout in seconds (0 = none), per proc key overrides,
+    # e.g. Inventory:120
+    exec_timeout = cfg.getfloat("service", "exec_timeout", fallback=0)
+    exec_timeouts = {
+        k: float(v) for k, v in
+        _parse_pairs(cfg.get("service", "proc_timeouts", fallback="")).items()
+    }
+
+    # Result cache: per proc key TTL in seconds, e.g. Inventory:30,Balance:10
+    cache_ttls = {
+        k: float(v) for k, v in
+        _parse_pairs(cfg.get("service", "cache_ttl", fallback="")).items()
+    }
+    cache_max_mb     = cfg.getfloat("service", "cache_max_mb", fallback=64)
+    cache_stale_secs = cfg.getfloat("service", "cache_stale_secs", fallback=0)
+
+    # sqlcmd output parsing: native int / float / datetime values instead of
+    # text, and fixed-width layout (no -W) so values may contain the delimiter
+    typed_values       = cfg.getboolean("service", "typed_values", fallback=False)
+    sqlcmd_fixed_width = cfg.getboolean("service", "sqlcmd_fixed_width", fallback=False)
+
+    # Share one in-flight execution between identical concurrent requests
+    coalesce_requests = cfg.getboolean("service", "coalesce_requests", fallback=True)
+
+    # /api/batch: max procs per call and how many run at once per call
+    batch_max_procs    = cfg.getint("service", "batch_max_procs", fallback=20)
+    batch_max_parallel = cfg.getint("service", "batch_max_parallel", fallback=4)
+    if batch_max_procs < 1 or batch_max_parallel < 1:
+        raise ValueError("batch_max_procs and batch_max_parallel must be >= 1")
+
+    # Admission control: concurrent executions per proc key / per login
+    # (0 = unlimited), waiters per limit, max wait, Retry-After on 503
+    admission = {
+        "per_proc": cfg.getint("service", "max_concurrent_per_proc", fallback=4),
+        "per_login": cfg.getint("service", "max_concurrent_per_login", fallback=0),
+        "proc_limits": {
+            k: int(v) for k, v in
+            _parse_pairs(cfg.get("service", "proc_concurrency", fallback="")).items()
+        },
+        "max_waiting": cfg.getint("service", "admission_queue_size", fallback=16),
+        "queue_timeout": cfg.getfloat("service", "admission_queue_timeout", fallback=10.0),
+        "retry_after": cfg.getint("service", "retry_after_secs", fallback=2),
+    }
+    if admission["max_waiting"] < 0 or admission["queue_timeout"] < 0:
+        raise ValueError("admission_queue_size and admission_queue_timeout must be >= 0")
+
+    # Session tokens from POST /auth: lifetime in seconds (0 disables /auth)
+    session_ttl  = cfg.getfloat("service", "session_ttl", fallback=900)
+    session_max  = cfg.getint("service", "session_max", fallback=10000)
+
+    # Audit records for Api_AccessLog, bulk-inserted in the background by a
+    # dedicated login (audit_login empty = off); failed batches spill to a file
+    audit = None
+    audit_login = cfg.get("service", "audit_login", fallback="").strip()
+    if audit_login:
+        spill_path = cfg.get("service", "audit_spill_path",
+                             fallback=default_audit_spill_path(conf_path)).strip()
+        audit = {
+            "table": cfg.get("service", "audit_table", fallback="DBATools.dbo.Api_AccessLog"),
+            "login": audit_login,
+            "password": cfg.get("service", "audit_password", fallback=""),
+            "batch_size": cfg.getint("service", "audit_batch_size", fallback=200),
+            "flush_interval": cfg.getfloat("service", "audit_flush_secs", fallback=2.0),
+            "queue_size": cfg.getint("service", "audit_queue_size", fallback=10000),
+            "spill_path": spill_path or None,
+            "spill_max_bytes": int(cfg.getfloat("service", "audit_spill_max_mb",
+                                                fallback=100) * 1024 * 1024),
+        }
+        if audit["batch_size"] < 1 or audit["queue_size"] < 1:
+            raise ValueError("audit_batch_size and audit_queue_size must be >= 1")
+
+    # Server-Timing response header, and the slow-request log: requests over
+    # slow_request_ms are logged; a profile_sample_rate fraction is profiled
+    server_timing = cfg.getboolean("service", "server_timing", fallback=True)
+    profiler = None
+    slow_request_ms = cfg.getfloat("service", "slow_request_ms", fallback=0)
+    if slow_request_ms > 0:
+        profiler = {
+            "threshold_ms": slow_request_ms,
+            "sample_rate": cfg.getfloat("service", "profile_sample_rate", fallback=0.0),
+            "mode": cfg.get("service", "profile_mode", fallback="stack").strip().lower(),
+            "interval_ms": cfg.getfloat("service", "profile_interval_ms", fallback=10),
+        }
+        if not 0 <= profiler["sample_rate"] <= 1:
+            raise ValueError("profile_sample_rate must be between 0 and 1")
+    slow_request_log = cfg.get("service", "slow_request_log", fallback="").strip()
+
+    # Stream rows with chunked encoding even when the caller omits stream=1
+    stream_default = cfg.getboolean("service", "stream_responses", fallback=False)
+
+    # HTTP/1.1 persistent connections: idle timeout and requests per connection
+    keepalive_timeout      = cfg.getfloat("service", "keepalive_timeout", fallback=5)
+    keepalive_max_requests = cfg.getint("service", "keepalive_max_requests", fallback=100)
+    if keepalive_timeout <= 0 or keepalive_max_requests < 1:
+        raise ValueError("keepalive_timeout must be > 0 and keepalive_max_requests >= 1")
+
+    # Concurrency: worker threads, waiting connections, kernel listen backlog
+    workers        = cfg.getint("service", "workers", fallback=8)
+    queue_size     = cfg.getint("service", "queue_size", fallback=32)
+    accept_backlog = cfg.getint("service", "accept_backlog", fallback=64)
+
+    # Execution backend: sqlcmd (process per call) or a pooled native driver
+    backend = cfg.get("service", "backend", fallback="sqlcmd").strip().lower()
+    if backend not in ("sqlcmd", "pyodbc", "pymssql", "auto"):
+        raise ValueError("backend must be one of sqlcmd, pyodbc, pymssql, auto")
+
+    # pyodbc transport security; the Driver 18 defaults (encrypted, verified)
+    odbc_encrypt = cfg.get("service", "odbc_encrypt", fallback="yes").strip().lower()
+    if odbc_encrypt not in ("yes", "no", "optional", "mandatory", "strict"):
+        raise ValueError("odbc_encrypt must be one of yes, no, optional, mandatory, strict")
+    odbc_trust_server_certificate = cfg.getboolean(
+        "service", "odbc_trust_server_certificate", fallback=False)
+
+    if workers < 1:
+        raise ValueError("workers must be >= 1")
+    if queue_size < 0 or accept_backlog < 1:
+        raise ValueError("queue_size must be >= 0 and accept_backlog >= 1")
+
+    return {
+        "sql_server": sql_server,
+        "database": database,
+        "port": port,
+        "allowed_map": allowed_map,
+        "proc_params": proc_params,
+        "page_keys": page_keys,
+        "max_page_size": max_page_size,
+        "workers": workers,
+        "queue_size": queue_size,
+        "accept_backlog": accept_backlog,
+        "backend": backend,
+        "odbc_driver": cfg.get("service", "odbc_driver",
+                               fallback="ODBC Driver 18 for SQL Server"),
+        "odbc_encrypt": odbc_encrypt,
+        "odbc_trust_server_certificate": odbc_trust_server_certificate,
+        "login_timeout": cfg.getint("service", "login_timeout", fallback=15),
+        "pool_max_size": cfg.getint("service", "pool_max_size", fallback=4),
+        "pool_acquire_timeout": cfg.getfloat("service", "pool_acquire_timeout", fallback=10.0),
+        "pool_idle_timeout": cfg.getfloat("service", "pool_idle_timeout", fallback=300.0),
+        "pool_health_check_secs": cfg.getfloat("service", "pool_health_check_secs", fallback=30.0),
+        "cache_ttls": cache_ttls,
+        "exec_timeout": exec_timeout,
+        "targets": targets,
+        "target_timeout": target_timeout,
+        "fleet_max_parallel": fleet_max_parallel,
+        "exec_timeouts": exec_timeouts,
+        "cache_max_mb": cache_max_mb,
+        "cache_stale_secs": cache_stale_secs,
+        "stream_default": stream_default,
+        "coalesce_requests": coalesce_requests,
+        "typed_values": typed_values,
+        "sqlcmd_fixed_width": sqlcmd_fixed_width,
+        "batch_max_procs": batch_max_procs,
+        "batch_max_parallel": batch_max_parallel,
+        "admission": admission,
+        "session_ttl": session_ttl,
+        "session_max": session_max,
+        "audit": audit,
+        "server_timing": server_timing,
+        "profiler": profiler,
+        "slow_request_log": slow_request_log,
+        "keepalive_timeout": keepalive_timeout,
+        "keepalive_max_requests": keepalive_max_requests,
+    }
 
 def run_server(conf_path):
-    sql_server, database, port, allowed_map = load_config(conf_path)
+    settings = load_config(conf_path)
 
-    SQLHttpHandler.sql_server  = sql_server
-    SQLHttpHandler.database    = database
-    SQLHttpHandler.allowed_map = allowed_map
+    SQLHttpHandler.sql_server  = settings["sql_server"]
+    SQLHttpHandler.database    = settings["database"]
+    SQLHttpHandler.allowed_map = settings["allowed_map"]
+    SQLHttpHandler.proc_params = settings["proc_params"]
+    SQLHttpHandler.page_keys   = settings["page_keys"]
+    SQLHttpHandler.max_page_size = settings["max_page_size"]
+    SQLHttpHandler.backend     = create_backend(settings)
+    SQLHttpHandler.targets = {
+        name: create_backend(dict(settings, sql_server=server, database=target_db))
+        for name, (server, target_db) in settings["targets"].items()
+    }
+    SQLHttpHandler.target_timeout = settings["target_timeout"]
+    SQLHttpHandler.fleet_max_parallel = settings["fleet_max_parallel"]
+    SQLHttpHandler.cache_ttls  = settings["cache_ttls"]
+    SQLHttpHandler.exec_timeout  = settings["exec_timeout"]
+    SQLHttpHandler.exec_timeouts = settings["exec_timeouts"]
+    SQLHttpHandler.stream_default = settings["stream_default"]
+    SQLHttpHandler.timeout = settings["keepalive_timeout"]
+    SQLHttpHandler.keepalive_max_requests = settings["keepalive_max_requests"]
+    SQLHttpHandler.metrics.describe("sqlbridge_requests_total", "counter",
+                                    "HTTP requests by route, proc key and status")
+    SQLHttpHandler.metrics.describe("sqlbridge_request_seconds", "histogram",
+                                    "End-to-end request latency")
+    SQLHttpHandler.metrics.describe("sqlbridge_phase_seconds", "histogram",
+                                    "Time per request phase (params, exec, parse, serialize, stream)")
+    SQLHttpHandler.metrics.describe("sqlbridge_response_bytes_total", "counter",
+                                    "Response body bytes sent")
+    SQLHttpHandler.metrics.describe("sqlbridge_errors_total", "counter",
+                                    "Responses with status >= 400 by route and status")
+    SQLHttpHandler.metrics.describe("sqlbridge_in_flight_requests", "gauge",
+                                    "Requests currently being handled")
+    SQLHttpHandler.metrics.describe("sqlbridge_connections_total", "counter",
+                                    "TCP connections served (requests / connections = reuse)")
+    for name in ("hits", "stale_hits", "misses", "evictions", "refresh_errors"):
+        SQLHttpHandler.metrics.describe("sqlbridge_cache_%s_total" % name, "counter",
+                                        "Result cache %s" % name.replace("_", " "))
+    SQLHttpHandler.metrics.describe("sqlbridge_cache_bytes", "gauge", "Result cache size estimate")
+    SQLHttpHandler.metrics.describe("sqlbridge_cache_entries", "gauge", "Result cache entries")
+    SQLHttpHandler.metrics.describe("sqlbridge_coalesced_total", "counter",
+                                    "Requests that shared another request's execution")
+    SQLHttpHandler.metrics.describe("sqlbridge_shed_total", "counter",
+                                    "Requests rejected with 503 by admission control, by reason")
+    SQLHttpHandler.metrics.describe("sqlbridge_exec_aborted_total", "counter",
+                                    "Executions stopped on timeout or client disconnect, by reason")
+    SQLHttpHandler.metrics.describe("sqlbridge_audit_written_total", "counter",
+                                    "Audit rows inserted into Api_AccessLog")
+    SQLHttpHandler.metrics.describe("sqlbridge_audit_spilled_total", "counter",
+                                    "Audit rows written to the spill file")
+    SQLHttpHandler.metrics.describe("sqlbridge_audit_replayed_total", "counter",
+                                    "Spilled audit rows inserted after recovery")
+    SQLHttpHandler.metrics.describe("sqlbridge_audit_dropped_total", "counter",
+                                    "Audit rows lost to a full queue or spill file")
+    SQLHttpHandler.metrics.describe("sqlbridge_audit_queued", "gauge",
+                                    "Audit rows waiting for the writer")
+    SQLHttpHandler.batch_max_procs    = settings["batch_max_procs"]
+    SQLHttpHandler.batch_max_parallel = settings["batch_max_parallel"]
+    if settings["coalesce_requests"]:
+        SQLHttpHandler.single_flight = SingleFlight()
+    SQLHttpHandler.admission = AdmissionController(**settings["admission"])
+    if settings["session_ttl"] > 0:
+        SQLHttpHandler.sessions = SessionStore(
+            ttl=settings["session_ttl"],
+            max_sessions=settings["session_max"]
+        )
+    SQLHttpHandler.server_timing = settings["server_timing"]
+    if settings["profiler"]:
+        SQLHttpHandler.profiler = RequestProfiler(**settings["profiler"])
+        if settings["slow_request_log"]:
+            handler = logging.FileHandler(settings["slow_request_log"], encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            slow_log.addHandler(handler)
+            slow_log.propagate = False
+    if settings["audit"]:
+        SQLHttpHandler.audit = AuditWriter(SQLHttpHandler.backend, **settings["audit"])
+    if settings["cache_ttls"]:
+        SQLHttpHandler.cache = ResultCache(
+            max_bytes=int(settings["cache_max_mb"] * 1024 * 1024),
+            stale_secs=settings["cache_stale_secs"]
+        )
 
-    bind_addr = ("127.0.0.1", port)
+    bind_addr = ("127.0.0.1", settings["port"])
 
-    with socketserver.TCPServer(bind_addr, SQLHttpHandler) as httpd:
+    with BoundedThreadPoolServer(
+        bind_addr,
+        SQLHttpHandler,
+        workers=settings["workers"],
+        queue_size=settings["queue_size"],
+        accept_backlog=settings["accept_backlog"]
+    ) as httpd:
         logging.info(
-            "Starting SQL HTTP service on %s:%d for DB %s (server %s)",
-            bind_addr[0], bind_addr[1], database, sql_server
+            "Starting SQL HTTP service on %s:%d for DB %s (server %s), "
+            "%d workers, queue %d, backlog %d, backend %s",
+            bind_addr[0], bind_addr[1], settings["database"], settings["sql_server"],
+            settings["workers"], settings["queue_size"], settings["accept_backlog"],
+            SQLHttpHandler.backend.name
         )
-        httpd.serve_forever()
+        try:
+            httpd.serve_forever()
+        finally:
+            if SQLHttpHandler.audit is not None:
+                SQLHttpHandler.audit.close()
+            SQLHttpHandler.backend.close()
+            for target_backend in SQLHttpHandler.targets.values():
+                target_backend.close()
 
 if __name__ == "__main__":
     if len(sys.argv) != 2:
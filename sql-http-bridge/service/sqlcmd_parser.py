@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Single-pass parser for sqlcmd text output.
+
+Handles every result set produced by one batch. A result set is a header
+line immediately followed by a dashed separator line; its rows run until
+the next blank line or "(N rows affected)" line. Anything else (PRINT
+output, messages) between result sets is skipped.
+
+In a single-column delimited result an empty string value prints as an
+empty line, so there a run of empty lines only ends the set when the
+footer, the next header / separator pair or the end of the output follows
+it (the last empty line of the run is sqlcmd's separator); otherwise the
+empty lines are rows.
+
+Two layouts are supported:
+
+- delimited (`sqlcmd -W -s "|"`, the bridge default): values are split on
+  the delimiter. Rows of a result set are split in one bulk operation when
+  every line holds exactly ncols - 1 delimiters, falling back to per-line
+  splitting otherwise.
+- fixed width (`sqlcmd -s "|"` without -W): the runs of dashes in the
+  separator line give each column's offsets, so values containing the
+  delimiter are read correctly.
+
+With typed=True, columns whose non-NULL values are all integers, decimals
+or dates / datetimes are converted to int, float, date or datetime, and
+"NULL" becomes None. Without it values are returned as sqlcmd printed them.
+Typing is always decided per column over the rows being returned, whether
+they were parsed in one piece, streamed or read as a page (convert_rows).
+"""
+
+import datetime
+import itertools
+import re
+
+NULL = "NULL"
+
+_DATETIME_RE = re.compile(
+    r"[0-9]{4}-[0-9]{2}-[0-9]{2}(?: [0-9]{2}:[0-9]{2}:[0-9]{2}(?:\.[0-9]{1,7})?)?\Z")
+
+# Whole-column checks work on "shapes": each value with its ASCII digits
+# removed. The shape set classifies the column in a few C-level passes;
+# the conversion itself then rejects malformed values ("-", ".", "1-2").
+_DROP_DIGITS = str.maketrans("", "", "0123456789")
+_INT_SHAPES = frozenset(("", "-"))
+_FLOAT_SHAPES = frozenset(
+    sign + point + exp
+    for sign in ("", "-")
+    for point in ("", ".")
+    for exp in ("", "e", "e-", "e+", "E", "E-", "E+")
+)
+_DATETIME_SHAPES = frozenset(("--", "-- ::", "-- ::."))
+# Digit layouts int() / float() accept but that stay text, as they appear
+# in the newline-framed column: zero padding ("007", "-01.5") and a decimal
+# point without digits on both sides (".5", "5.", "5.e3").
+_LEADING_ZERO_RE = re.compile(r"\n0[0-9]|\n-0[0-9]")
+_BARE_POINTS = ("\n.", "-.", ".\n", ".e", ".E")
+_DASH_RUN_RE = re.compile(r"-+")
+
+
+def _to_datetime(value):
+    if len(value) == 10:
+        return datetime.date.fromisoformat(value)
+    whole, _, frac = value.partition(".")
+    parsed = datetime.datetime.fromisoformat(whole)
+    if frac:
+        # datetime2 prints 7 fractional digits; Python keeps microseconds
+        parsed = parsed.replace(microsecond=int((frac + "00000")[:6]))
+    return parsed
+
+
+def _to_datetimes(values):
+    # Fast path: all dates, or datetimes fromisoformat accepts as printed
+    # (3 or 6 fractional digits, or any count on Python 3.11+)
+    try:
+        if all(len(v) == 10 for v in values):
+            return list(map(datetime.date.fromisoformat, values))
+        return list(map(datetime.datetime.fromisoformat, values))
+    except ValueError:
+        return list(map(_to_datetime, values))
+
+
+def _is_dash_line(line, delimiter):
+    stripped = line.strip()
+    return bool(stripped) and "-" in stripped and not stripped.replace("-", "").replace(delimiter, "").strip()
+
+
+def _is_rows_affected(line):
+    return line.startswith("(") and line.rstrip().endswith("affected)")
+
+
+def _not_numeric(framed):
+    """
+    True if a newline-framed column ("\\n" + values + "\\n") of float-shaped
+    values holds one that is not plain decimal notation, e.g. a zero-padded
+    code that must stay text.
+    """
+    if _LEADING_ZERO_RE.search(framed):
+        return True
+    return "." in framed and any(bad in framed for bad in _BARE_POINTS)
+
+
+def _convert_non_null(values, joined=None):
+    """Convert non-NULL strings if they all share one native type, else None."""
+    if joined is None:
+        joined = "\n".join(values)
+    shapes = set(joined.translate(_DROP_DIGITS).split("\n"))
+    try:
+        if shapes <= _FLOAT_SHAPES:
+            framed = "\n" + joined + "\n"
+            if _not_numeric(framed):
+                return None         # "007": keep zero-padded codes as text
+            if shapes <= _INT_SHAPES:
+                return list(map(int, values))
+            if "\n\n" in framed:
+                return None         # an empty string among the numbers
+            return list(map(float, values))
+        if shapes <= _DATETIME_SHAPES and _DATETIME_RE.match(values[0]):
+            return _to_datetimes(values)
+    except ValueError:
+        pass
+    return None
+
+
+def convert_column(values):
+    """
+    Convert one column of sqlcmd strings to a single native type if every
+    non-NULL value fits it; NULL (and missing values) always become None.
+    """
+    try:
+        joined = "\n".join(values)
+    except TypeError:
+        joined = None               # a short line was padded with None
+    if joined is not None and NULL not in joined:
+        converted = _convert_non_null(values, joined)
+        return values if converted is None else converted
+
+    non_null = [v for v in values if v is not None and v != NULL]
+    if not non_null:
+        return [None] * len(values)
+
+    converted = _convert_non_null(non_null)
+    if converted is None:
+        return [None if v == NULL else v for v in values]
+    it = iter(converted)
+    return [None if v is None or v == NULL else next(it) for v in values]
+
+
+def convert_rows(rows):
+    """
+    Typed copy of untyped rows (lists or tuples of one result set), each
+    column converted with convert_column. Streamed results and pages use
+    this so they are typed exactly like a result parsed in one piece.
+    """
+    if not rows:
+        return []
+    return list(zip(*[convert_column(list(col)) for col in zip(*rows)]))
+
+
+class _Layout:
+    """Column names and row splitter for one result set."""
+
+    def __init__(self, header, dash, delimiter, fixed_width):
+        self.delimiter = delimiter
+        self.fixed_width = fixed_width
+        if fixed_width:
+            self.slices = [(m.start(), m.end()) for m in _DASH_RUN_RE.finditer(dash)]
+            self.columns = [header[a:b].strip() for a, b in self.slices]
+        else:
+            self.columns = [h.strip() for h in header.split(delimiter)]
+        self.ncols = len(self.columns)
+        # Fixed-width rows are padded and delimited rows of several columns
+        # hold delimiters, so only here can an empty line be a row ("")
+        self.blank_is_row = not fixed_width and self.ncols == 1
+
+    def split(self, line):
+        if self.fixed_width:
+            return [line[a:b].strip() for a, b in self.slices]
+        vals = line.split(self.delimiter)
+        if len(vals) != self.ncols:
+            # A value contained the delimiter, or the line is short: pad / cut
+            vals = (vals + [None] * self.ncols)[:self.ncols]
+        return vals
+
+    def _split_flat(self, lines):
+        """
+        All values of `lines` in one list, row after row, or None unless
+        every line holds exactly ncols - 1 delimiters (a per-line check: a
+        total count can balance a long line against a short one).
+        """
+        if self.fixed_width:
+            return None
+        d = self.delimiter
+        if set(map(str.count, lines, itertools.repeat(d))) != {self.ncols - 1}:
+            return None
+        return d.join(lines).split(d)
+
+    def split_columns(self, lines):
+        """Split many data lines at once; returns one value list per column."""
+        flat = self._split_flat(lines)
+        if flat is not None:
+            return [flat[c::self.ncols] for c in range(self.ncols)]
+        return [list(col) for col in zip(*[self.split(line) for line in lines])]
+
+    def split_rows(self, lines):
+        """Split many data lines at once; returns one tuple per line."""
+        flat = self._split_flat(lines)
+        if flat is not None:
+            return list(zip(*[iter(flat)] * self.ncols))
+        return [tuple(self.split(line)) for line in lines]
+
+
+def _ends_set_at(text, pos, delimiter):
+    """True if the line at `pos` ends a result set: the end of the output,
+    a rows-affected footer, or the header of the next result set."""
+    n = len(text)
+    if pos >= n:
+        return True
+    line_end = text.find("\n", pos)
+    if line_end == -1:
+        return _is_rows_affected(text[pos:])
+    if _is_rows_affected(text[pos:line_end]):
+        return True
+    next_end = text.find("\n", line_end + 1)
+    return _is_dash_line(text[line_end + 1:n if next_end == -1 else next_end], delimiter)
+
+
+def _find_single_column_end(text, pos, delimiter):
+    """
+    End of the rows that follow the newline at text[pos] in a result set
+    whose empty lines may be rows. Returns (end, blank_lines): `end` is the
+    index just past the last row before the empty-line run that ends the
+    set, `blank_lines` the length of that run.
+    """
+    n = len(text)
+    while True:
+        i = text.find("\n\n", pos)
+        if i == -1:
+            return (n - 1 if text.endswith("\n") else n), 0
+        j = i + 1
+        while j < n and text[j] == "\n":
+            j += 1
+        if _ends_set_at(text, j, delimiter):
+            return i, j - i - 1
+        pos = j
+
+
+def parse_result_sets(text, typed=False, fixed_width=False, delimiter="|"):
+    """
+    Parse complete sqlcmd output into a list of (columns, rows), one per
+    result set, in order. Rows are tuples.
+
+    The text is scanned once: each result set's rows are located with
+    str.find on the blank line that ends it and split as one block.
+    """
+    if "\r" in text:
+        text = text.replace("\r\n", "\n")
+    n = len(text)
+    results = []
+    pos = 0
+    while pos < n:
+        header_end = text.find("\n", pos)
+        if header_end == -1:
+            break
+        dash_end = text.find("\n", header_end + 1)
+        if dash_end == -1:
+            dash_end = n
+        header = text[pos:header_end]
+        dash = text[header_end + 1:dash_end]
+        if not header.strip() or not _is_dash_line(dash, delimiter):
+            pos = header_end + 1
+            continue
+
+        layout = _Layout(header, dash, delimiter, fixed_width)
+        start = dash_end + 1
+        if layout.blank_is_row:
+            end, blank_lines = _find_single_column_end(text, start - 1, delimiter)
+            data = text[start:end].split("\n") if end > start else []
+            # all but the last empty line (sqlcmd's separator) are "" rows
+            data += [""] * max(0, blank_lines - 1)
+        else:
+            end = text.find("\n\n", start - 1)
+            if end == -1:
+                end = n
+            block = text[start:end].rstrip("\n")
+            data = block.split("\n") if block else []
+        # only present when NOCOUNT is off and no blank line preceded it
+        if data and _is_rows_affected(data[-1]):
+            data.pop()
+        if not data:
+            rows = []
+        elif typed:
+            columns = [convert_column(col) for col in layout.split_columns(data)]
+            rows = list(zip(*columns))
+        else:
+            rows = layout.split_rows(data)
+        results.append((layout.columns, rows))
+        pos = end + 1
+    return results
+
+
+def iter_result_set(lines, typed=False, fixed_width=False, delimiter="|"):
+    """
+    Incrementally parse the first result set from an iterable of lines.
+
+    Returns (columns, row_iterator); rows are pulled from `lines` only as
+    the iterator is consumed. With typed=True a column's type depends on all
+    of its values, so the first row is only returned once the whole result
+    set has been read (convert_rows).
+    """
+    lines = iter(lines)
+    prev = None
+    layout = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if prev is not None and prev.strip() and _is_dash_line(line, delimiter):
+            layout = _Layout(prev, line, delimiter, fixed_width)
+            break
+        prev = line
+    if layout is None:
+        return [], iter(())
+
+    lookahead = []
+
+    def read():
+        if lookahead:
+            return lookahead.pop(0)
+        line = next(lines, None)
+        return None if line is None else line.rstrip("\r\n")
+
+    def rows():
+        while True:
+            line = read()
+            if line is None or _is_rows_affected(line):
+                return
+            if line:
+                yield layout.split(line)
+                continue
+            if not layout.blank_is_row:
+                return
+            # A run of empty lines: "" rows, unless it ends the set
+            blank_lines = 1
+            line = read()
+            while line == "":
+                blank_lines += 1
+                line = read()
+            if line is None or _is_rows_affected(line):
+                ends = True
+            else:
+                following = read()
+                ends = following is not None and _is_dash_line(following, delimiter)
+                lookahead.extend([line] if following is None else [line, following])
+            for _ in range(blank_lines - 1 if ends else blank_lines):
+                yield [""]
+            if ends:
+                return
+
+    if typed:
+        def typed_rows():
+            yield from convert_rows(list(rows()))
+        return layout.columns, typed_rows()
+    return layout.columns, rows()
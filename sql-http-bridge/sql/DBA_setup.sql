@@ -106,6 +106,37 @@ GO
 GRANT EXECUTE ON dbo.Api_GetInventory TO svc_api_readonly
 GO
 
+------------------------------------------------------------
+-- 4. Optional: login for the bridge's audit writer (audit_login)
+--    INSERT only, on Api_AccessLog only. EXAMPLE password again.
+------------------------------------------------------------
+USE master
+IF NOT EXISTS (SELECT 1 FROM sys.sql_logins WHERE name = 'svc_api_audit')
+BEGIN
+    CREATE LOGIN svc_api_audit
+    WITH PASSWORD = 'Qm7#vT2pL9x!Rk4^wZ8dN1sH6@yBc3Fj',
+         CHECK_POLICY = ON,
+         CHECK_EXPIRATION = ON
+END
+GO
+
+USE YourAppDB
+IF NOT EXISTS (SELECT 1 FROM sys.database_principals WHERE name = 'svc_api_audit')
+BEGIN
+    CREATE USER svc_api_audit FOR LOGIN svc_api_audit
+END
+GO
+
+USE DBATools
+IF NOT EXISTS (SELECT 1 FROM sys.database_principals WHERE name = 'svc_api_audit')
+BEGIN
+    CREATE USER svc_api_audit FOR LOGIN svc_api_audit
+END
+GO
+
+GRANT INSERT ON dbo.Api_AccessLog TO svc_api_audit
+GO
+
 ------------------------------------------------------------
 -- SECURITY MODEL:
 -- * svc_api_readonly:
@@ -117,6 +148,9 @@ GO
 -- * Each dbo.Api_* proc logs use in DBATools.dbo.Api_AccessLog
 --   (who called, when, HOST_NAME()).
 --
+-- * svc_api_audit (optional): INSERT on Api_AccessLog only, used by
+--   the bridge to add its own per-request rows in batches.
+--
 -- * Python HTTP bridge:
 --   - Listens on 127.0.0.1 only
 --   - Requires valid SQL login/pass each call
@@ -0,0 +1,91 @@
+"""
+Pytest configuration for the bridge's unit tests
+
+The service modules are plain scripts in service/, imported the same way
+the service and bench/ import them.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "service"))
+
+import contextlib
+import socket
+import threading
+
+import pytest
+
+import sql_http_service
+from sql_backends import ExecutionError
+
+
+class StaticBackend:
+    """Driver-like backend returning fixed result sets; password "bad" fails the login."""
+
+    name = "static"
+
+    def __init__(self, result_sets=()):
+        self.result_sets = list(result_sets)
+        self.calls = 0
+
+    def _login(self, password):
+        self.calls += 1
+        if password == "bad":
+            raise ExecutionError("login failed")
+
+    def execute(self, sp_name, login, password, timings=None, params=(), timeout=None,
+                client_gone=None):
+        self._login(password)
+        return self.result_sets
+
+    @contextlib.contextmanager
+    def stream(self, sp_name, login, password, params=(), timeout=None, client_gone=None,
+               typed=None):
+        self._login(password)
+        cols, rows = self.result_sets[0] if self.result_sets else ([], [])
+        yield cols, iter(rows)
+
+    def authenticate(self, login, password):
+        self._login(password)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def bridge(monkeypatch):
+    """
+    Start the service in-process on an ephemeral port. Call the returned
+    function with SQLHttpHandler attributes (backend=..., allowed_map=...)
+    to configure it; it returns the port. The server stops after the test.
+    """
+    servers = []
+
+    def start(**attributes):
+        handler = sql_http_service.SQLHttpHandler
+        attributes.setdefault("backend", StaticBackend())
+        attributes.setdefault("timeout", 1)
+        for name, value in attributes.items():
+            monkeypatch.setattr(handler, name, value)
+        server = sql_http_service.BoundedThreadPoolServer(("127.0.0.1", 0), handler, workers=2)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server.server_address[1]
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def exchange(port, raw):
+    """Send raw request bytes, return everything the server wrote until it closed."""
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+        sock.sendall(raw)
+        received = b""
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                return received
+            received += chunk
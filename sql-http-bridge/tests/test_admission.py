@@ -0,0 +1,174 @@
+"""
+Tests for admission: per-proc and per-login limits, load shedding with
+503 + Retry-After, and slot release when an execution fails
+"""
+
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from admission import AdmissionController, Overloaded
+from conftest import StaticBackend
+
+
+def hold(controller, proc_key, login):
+    """Take a slot in a background thread; returns the event that releases it"""
+    admitted = threading.Event()
+    release = threading.Event()
+
+    def run():
+        with controller.admit(proc_key, login):
+            admitted.set()
+            release.wait(5)
+
+    threading.Thread(target=run, daemon=True).start()
+    assert admitted.wait(5)
+    return release
+
+
+def wait_until(predicate):
+    for _ in range(500):
+        if predicate():
+            return
+        time.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+class TestLimits:
+    """Per-proc and per-login slots"""
+
+    def test_per_proc_limit(self):
+        controller = AdmissionController(per_proc=1, max_waiting=0)
+        release = hold(controller, "Inventory", "u1")
+        with pytest.raises(Overloaded) as ex:
+            with controller.admit("Inventory", "u2"):
+                pass
+        assert ex.value.reason == "queue_full"
+        with controller.admit("Balance", "u2"):
+            pass
+        release.set()
+
+    def test_proc_limit_override(self):
+        controller = AdmissionController(per_proc=1, proc_limits={"Inventory": 2}, max_waiting=0)
+        releases = [hold(controller, "Inventory", "u1"), hold(controller, "Inventory", "u2")]
+        assert controller.stats()["active"] == {"Inventory": 2}
+        with pytest.raises(Overloaded):
+            with controller.admit("Inventory", "u3"):
+                pass
+        for release in releases:
+            release.set()
+
+    def test_per_login_limit(self):
+        controller = AdmissionController(per_proc=0, per_login=1, max_waiting=0)
+        release = hold(controller, "Inventory", "u1")
+        with pytest.raises(Overloaded):
+            with controller.admit("Balance", "u1"):
+                pass
+        with controller.admit("Balance", "u2"):
+            pass
+        release.set()
+
+    def test_login_rejection_releases_the_proc_slot(self):
+        controller = AdmissionController(per_proc=1, per_login=1, max_waiting=0)
+        release = hold(controller, "Inventory", "u1")
+        with pytest.raises(Overloaded):
+            with controller.admit("Balance", "u1"):
+                pass
+        assert controller.stats()["active"] == {"Inventory": 1}
+        release.set()
+
+
+class TestQueue:
+    """Waiting for a slot, queue-full and queue-timeout"""
+
+    def test_waiter_is_admitted_when_a_slot_frees(self):
+        controller = AdmissionController(per_proc=1, max_waiting=1, queue_timeout=5)
+        release = hold(controller, "Inventory", "u1")
+        admitted = threading.Event()
+
+        def wait_for_slot():
+            with controller.admit("Inventory", "u2"):
+                admitted.set()
+
+        threading.Thread(target=wait_for_slot, daemon=True).start()
+        wait_until(lambda: controller.stats()["waited"] == 1)
+        assert not admitted.is_set()
+        release.set()
+        assert admitted.wait(5)
+
+    def test_queue_timeout(self):
+        controller = AdmissionController(per_proc=1, max_waiting=1, queue_timeout=0.05,
+                                         retry_after=3)
+        release = hold(controller, "Inventory", "u1")
+        with pytest.raises(Overloaded) as ex:
+            with controller.admit("Inventory", "u2"):
+                pass
+        assert (ex.value.reason, ex.value.retry_after) == ("queue_timeout", 3)
+        assert controller.stats()["rejected"]["queue_timeout"] == 1
+        release.set()
+
+    def test_queue_wait(self):
+        controller = AdmissionController(queue_timeout=1)
+        controller.check_queue_wait(0.5)
+        with pytest.raises(Overloaded):
+            controller.check_queue_wait(2)
+
+    def test_slot_is_released_when_execution_raises(self):
+        controller = AdmissionController(per_proc=1, max_waiting=0)
+        with pytest.raises(RuntimeError):
+            with controller.admit("Inventory", "u1"):
+                raise RuntimeError("sqlcmd crashed")
+        assert controller.stats()["active"] == {}
+        with controller.admit("Inventory", "u2"):
+            pass
+
+
+class BlockingBackend(StaticBackend):
+    """Holds every execution until `release` is set"""
+
+    def __init__(self):
+        super().__init__([(["Id"], [("1",)])])
+        self.release = threading.Event()
+
+    def execute(self, *args, **kwargs):
+        result_sets = super().execute(*args, **kwargs)
+        self.release.wait(5)
+        return result_sets
+
+
+class TestService:
+    """Overloaded surfaces as 503 with Retry-After"""
+
+    def get(self, port, password="p"):
+        url = "http://127.0.0.1:%d/api?proc=Inventory&user=u&pass=%s" % (port, password)
+        try:
+            with urllib.request.urlopen(url, timeout=10) as response:
+                return response.status, response.headers
+        except urllib.error.HTTPError as ex:
+            return ex.code, ex.headers
+
+    def test_queue_full_is_503_with_retry_after(self, bridge):
+        backend = BlockingBackend()
+        controller = AdmissionController(per_proc=1, max_waiting=0, retry_after=7)
+        port = bridge(backend=backend, admission=controller,
+                      allowed_map={"Inventory": "dbo.Api_GetInventory"})
+        first = threading.Thread(target=self.get, args=(port,), daemon=True)
+        first.start()
+        wait_until(lambda: controller.stats()["active"] == {"Inventory": 1})
+
+        status, headers = self.get(port)
+        assert (status, headers["Retry-After"]) == (503, "7")
+        backend.release.set()
+        first.join(5)
+        assert controller.stats()["active"] == {}
+
+    def test_failed_execution_releases_its_slot(self, bridge):
+        controller = AdmissionController(per_proc=1, max_waiting=0)
+        port = bridge(backend=StaticBackend([(["Id"], [("1",)])]), admission=controller,
+                      allowed_map={"Inventory": "dbo.Api_GetInventory"})
+        assert self.get(port, password="bad")[0] == 401
+        assert controller.stats()["active"] == {}
+        assert self.get(port)[0] == 200
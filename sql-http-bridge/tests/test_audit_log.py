@@ -0,0 +1,72 @@
+"""
+Tests for audit_log: spill file location and the startup check
+"""
+
+import logging
+import os
+
+import pytest
+
+import sql_http_service
+from audit_log import AuditWriter, spill_path_problem
+
+
+class FailingBackend:
+    """Rejects every audit insert, so each batch goes to the spill file"""
+
+    def insert_rows(self, table, specs, rows, login, password):
+        raise OSError("database down")
+
+
+class TestSpillPath:
+    """spill_path_problem and where the spill file goes by default"""
+
+    def test_writable_path(self, tmp_path):
+        assert spill_path_problem(str(tmp_path / "spill.jsonl")) is None
+
+    def test_missing_directory(self, tmp_path):
+        assert "does not exist" in spill_path_problem(str(tmp_path / "nope" / "spill.jsonl"))
+
+    @pytest.mark.skipif(os.name == "nt" or os.geteuid() == 0,
+                        reason="root and Windows ignore POSIX modes")
+    def test_read_only_directory(self, tmp_path):
+        tmp_path.chmod(0o500)
+        try:
+            assert "not writable" in spill_path_problem(str(tmp_path / "spill.jsonl"))
+        finally:
+            tmp_path.chmod(0o700)
+
+    def test_default_is_not_next_to_the_config(self, tmp_path):
+        conf = tmp_path / "sql-http-service.conf"
+        conf.write_text("[service]\naudit_login=svc_api_audit\n")
+        spill_path = sql_http_service.load_config(str(conf))["audit"]["spill_path"]
+        if os.name == "nt":
+            assert spill_path == str(tmp_path / "audit-spill.jsonl")
+        else:
+            assert spill_path == "/var/lib/sql-http-service/audit-spill.jsonl"
+
+    def test_configured_path(self, tmp_path):
+        conf = tmp_path / "sql-http-service.conf"
+        conf.write_text("[service]\naudit_login=svc_api_audit\naudit_spill_path=/srv/spill.jsonl\n")
+        assert sql_http_service.load_config(str(conf))["audit"]["spill_path"] == "/srv/spill.jsonl"
+
+
+class TestAuditWriter:
+    """Startup check and spilling of rejected batches"""
+
+    def test_unusable_spill_path_is_logged_at_startup(self, tmp_path, caplog):
+        with caplog.at_level(logging.ERROR):
+            writer = AuditWriter(FailingBackend(), "t", "svc", "pw",
+                                 spill_path=str(tmp_path / "nope" / "spill.jsonl"))
+            writer.close()
+        assert "Audit spill file unusable" in caplog.text
+
+    def test_rejected_batch_is_spilled(self, tmp_path, caplog):
+        spill = tmp_path / "spill.jsonl"
+        with caplog.at_level(logging.ERROR):
+            writer = AuditWriter(FailingBackend(), "t", "svc", "pw", spill_path=str(spill))
+            writer.record("dbo.Api_GetInventory", "svc_api_readonly", "127.0.0.1")
+            writer.close()
+        assert "unusable" not in caplog.text
+        assert writer.stats()["spilled"] == 1
+        assert len(spill.read_text().splitlines()) == 1
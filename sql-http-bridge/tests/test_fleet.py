@@ -0,0 +1,68 @@
+"""
+Tests for targets= fan-out: merged rows, per-target failures and the
+target tag column
+"""
+
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from conftest import StaticBackend
+from sql_backends import BackendUnavailable
+
+INVENTORY = [(["ItemID", "Name"], [("1", "disk"), ("2", "tape")])]
+
+
+class DownBackend(StaticBackend):
+    """A target server that cannot be reached"""
+
+    def execute(self, *args, **kwargs):
+        raise BackendUnavailable("connection refused")
+
+
+def fan_out(bridge, targets, names="all"):
+    port = bridge(targets=targets, allowed_map={"Inventory": "dbo.Api_GetInventory"})
+    url = "http://127.0.0.1:%d/api?proc=Inventory&user=u&pass=p&targets=%s" % (port, names)
+    try:
+        with urllib.request.urlopen(url, timeout=10) as response:
+            return response.status, response.headers, json.load(response)
+    except urllib.error.HTTPError as ex:
+        return ex.code, ex.headers, json.load(ex)
+
+
+def statuses(body):
+    return {entry["target"]: entry["status"] for entry in body["targets"]}
+
+
+class TestFanOut:
+    """Each target only affects its own entry"""
+
+    def test_one_failing_target(self, bridge):
+        status, headers, body = fan_out(bridge, {
+            "sqltest": StaticBackend(INVENTORY),
+            "down": DownBackend(),
+            "svweb": StaticBackend(INVENTORY),
+        }, "sqltest,down,svweb")
+        assert status == 200
+        assert headers["X-Fleet-Status"] == "sqltest=200,down=503,svweb=200"
+        assert statuses(body) == {"sqltest": 200, "down": 503, "svweb": 200}
+        assert [(r["target"], r["ItemID"]) for r in body["rows"]] == [
+            ("sqltest", "1"), ("sqltest", "2"), ("svweb", "1"), ("svweb", "2")]
+
+    def test_every_target_failing(self, bridge):
+        status, _, body = fan_out(bridge, {"a": DownBackend(), "b": DownBackend()})
+        assert status == 503
+        assert body["rows"] == []
+
+    @pytest.mark.parametrize("column", ["target", "Target"])
+    def test_target_column_is_not_overwritten(self, bridge, column):
+        clash = [([column, "Name"], [("prod", "disk")])]
+        _, _, body = fan_out(bridge, {
+            "svweb": StaticBackend(clash),
+            "sqltest": StaticBackend(INVENTORY),
+        }, "svweb,sqltest")
+        assert statuses(body) == {"svweb": 500, "sqltest": 200}
+        assert "'target' column" in body["targets"][0]["error"]
+        assert {r["target"] for r in body["rows"]} == {"sqltest"}
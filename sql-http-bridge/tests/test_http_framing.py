@@ -0,0 +1,68 @@
+"""
+Request framing on kept-alive connections: a body that was not read must
+never be parsed as the next request
+"""
+
+import re
+
+from conftest import exchange
+
+SMUGGLED = b"GET /stats HTTP/1.1\r\nHost: x\r\n\r\n"
+
+
+def statuses(response):
+    """Status codes of every response in a raw byte stream"""
+    return [int(code) for code in re.findall(rb"HTTP/1\.[01] (\d{3}) ", response)]
+
+
+def test_pipelined_requests_are_all_answered(bridge):
+    port = bridge()
+    raw = (b"GET /stats HTTP/1.1\r\nHost: x\r\n\r\n"
+           b"GET /stats HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n")
+    assert statuses(exchange(port, raw)) == [200, 200]
+
+
+def test_post_body_read_in_full_keeps_the_connection(bridge):
+    port = bridge(allowed_map={})
+    body = b"proc=Missing&user=u&pass=p"
+    raw = (b"POST /api HTTP/1.1\r\nHost: x\r\nContent-Length: %d\r\n"
+           b"Content-Type: application/x-www-form-urlencoded\r\n\r\n%s" % (len(body), body)
+           + b"GET /stats HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n")
+    first, second = statuses(exchange(port, raw))
+    assert first >= 400 and second == 200
+
+
+def test_get_with_body_closes_the_connection(bridge):
+    port = bridge()
+    raw = (b"GET /stats HTTP/1.1\r\nHost: x\r\nContent-Length: %d\r\n\r\n" % len(SMUGGLED)
+           + SMUGGLED)
+    response = exchange(port, raw)
+    assert statuses(response) == [200]
+    assert b"Connection: close" in response
+
+
+def test_chunked_post_is_refused_and_closed(bridge):
+    port = bridge()
+    body = b"proc=x"
+    raw = (b"POST /api HTTP/1.1\r\nHost: x\r\nTransfer-Encoding: chunked\r\n"
+           b"Content-Length: %d\r\n\r\n" % len(body)
+           + body + b"\r\n0\r\n\r\n" + SMUGGLED)
+    response = exchange(port, raw)
+    assert statuses(response) == [501]
+    assert b"Connection: close" in response
+
+
+def test_conflicting_content_lengths_are_refused(bridge):
+    port = bridge()
+    raw = (b"POST /api HTTP/1.1\r\nHost: x\r\nContent-Length: 6\r\nContent-Length: 40\r\n\r\n"
+           b"proc=x" + SMUGGLED)
+    response = exchange(port, raw)
+    assert statuses(response) == [400]
+    assert b"Connection: close" in response
+
+
+def test_unread_body_on_unknown_route_closes_the_connection(bridge):
+    port = bridge()
+    raw = (b"POST /nowhere HTTP/1.1\r\nHost: x\r\nContent-Length: %d\r\n\r\n" % len(SMUGGLED)
+           + SMUGGLED)
+    assert statuses(exchange(port, raw)) == [404]
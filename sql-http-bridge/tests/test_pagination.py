@@ -0,0 +1,180 @@
+"""
+Tests for pagination: cursor round trips and rejection of tampered or
+foreign cursors
+"""
+
+import json
+import os
+import sys
+import urllib.request
+
+import pytest
+
+from pagination import (CursorError, PageKey, apply_cursor, check_fingerprint, decode_cursor,
+                        encode_cursor, next_cursor, parse_page_keys, read_page)
+from proc_params import ParamError, bind_params, parse_param_specs
+from sql_backends import SqlcmdBackend
+
+SPECS = parse_param_specs("ServerID int, AfterItemID int = NULL")
+KEYSET = PageKey("ItemID", "AfterItemID")
+COLS = ["ItemID", "Name"]
+
+
+def bound(**params):
+    return bind_params(SPECS, {k: str(v) for k, v in params.items()})
+
+
+def resume(token, proc_key="Inventory", page_key=None, **params):
+    """apply_cursor + check_fingerprint, as the service does for a request"""
+    request_params = {k: str(v) for k, v in params.items()}
+    offset = apply_cursor(token, proc_key, page_key, request_params)
+    check_fingerprint(token, proc_key, bind_params(SPECS, request_params), page_key)
+    return offset, request_params
+
+
+def tamper(token, **changes):
+    state = decode_cursor(token)
+    state.update(changes)
+    return encode_cursor(state)
+
+
+class TestRoundTrip:
+    """Cursors issued by next_cursor resume the same query"""
+
+    def test_offset_cursor(self):
+        token = next_cursor("Inventory", bound(ServerID=3), None, COLS, [(1, "a"), (2, "b")], 10)
+        assert resume(token, ServerID=3)[0] == 12
+
+    def test_keyset_cursor_binds_last_key(self):
+        token = next_cursor("Inventory", bound(ServerID=3), KEYSET, COLS, [(7, "a"), (9, "b")], 0)
+        offset, request_params = resume(token, page_key=KEYSET, ServerID=3)
+        assert offset == 0
+        assert request_params["AfterItemID"] == "9"
+
+    def test_keyset_cursor_ignores_previous_key(self):
+        # The key parameter changes from page to page; it is not fingerprinted
+        first = next_cursor("Inventory", bound(ServerID=3), KEYSET, COLS, [(5, "a")], 0)
+        second = next_cursor("Inventory", bound(ServerID=3, AfterItemID=5), KEYSET, COLS, [(9, "b")], 0)
+        resume(first, page_key=KEYSET, ServerID=3)
+        resume(second, page_key=KEYSET, ServerID=3)
+
+
+class TestRejected:
+    """Malformed, tampered and foreign cursors raise CursorError"""
+
+    TOKEN = next_cursor("Inventory", bound(ServerID=3), None, COLS, [(1, "a")], 0)
+    KEY_TOKEN = next_cursor("Inventory", bound(ServerID=3), KEYSET, COLS, [(1, "a")], 0)
+
+    @pytest.mark.parametrize("token", ["", "not base64!", "bm90IGpzb24", encode_cursor([1, 2])])
+    def test_malformed(self, token):
+        with pytest.raises(CursorError):
+            resume(token, ServerID=3)
+
+    def test_unknown_version(self):
+        with pytest.raises(CursorError):
+            resume(tamper(self.TOKEN, v=99), ServerID=3)
+
+    def test_cursor_of_another_proc(self):
+        with pytest.raises(CursorError, match="different proc"):
+            resume(self.TOKEN, proc_key="Balance", ServerID=3)
+
+    def test_cursor_of_other_parameters(self):
+        with pytest.raises(CursorError, match="request parameters"):
+            resume(self.TOKEN, ServerID=4)
+
+    def test_rewritten_proc_keeps_old_fingerprint(self):
+        with pytest.raises(CursorError):
+            resume(tamper(self.TOKEN, p="Balance"), proc_key="Balance", ServerID=3)
+
+    def test_rewritten_fingerprint(self):
+        with pytest.raises(CursorError):
+            resume(tamper(self.TOKEN, f="0" * 16), ServerID=3)
+
+    @pytest.mark.parametrize("offset", [-1, "5", 1.5, None])
+    def test_invalid_offset(self, offset):
+        with pytest.raises(CursorError):
+            resume(tamper(self.TOKEN, o=offset), ServerID=3)
+
+    def test_offset_cursor_used_as_keyset(self):
+        with pytest.raises(CursorError):
+            resume(self.TOKEN, page_key=KEYSET, ServerID=3)
+
+    def test_keyset_cursor_with_non_text_key(self):
+        with pytest.raises(CursorError):
+            resume(tamper(self.KEY_TOKEN, k=5), page_key=KEYSET, ServerID=3)
+
+    def test_keyset_key_still_validated_as_parameter(self):
+        # The key ends up in the request parameters and is bound like any value
+        with pytest.raises(ParamError):
+            resume(tamper(self.KEY_TOKEN, k="1; DROP TABLE x"), page_key=KEYSET, ServerID=3)
+
+    def test_missing_key_column(self):
+        with pytest.raises(CursorError):
+            next_cursor("Inventory", bound(ServerID=3), KEYSET, ["Name"], [("a",)], 0)
+
+    def test_null_key(self):
+        with pytest.raises(CursorError):
+            next_cursor("Inventory", bound(ServerID=3), KEYSET, COLS, [(None, "a")], 0)
+
+
+class TestHelpers:
+    """parse_page_keys and read_page"""
+
+    def test_parse_page_keys(self):
+        keys = parse_page_keys({"Inventory": "ItemID > @AfterItemID"})
+        assert (keys["Inventory"].column, keys["Inventory"].param) == ("ItemID", "AfterItemID")
+        with pytest.raises(ValueError):
+            parse_page_keys({"Inventory": "ItemID"})
+
+    def test_read_page_stops_after_one_extra_row(self):
+        consumed = []
+
+        def rows():
+            for i in range(100):
+                consumed.append(i)
+                yield [i]
+
+        page, has_more = read_page(rows(), 2, 3)
+        assert page == [(2,), (3,), (4,)]
+        assert has_more
+        assert consumed == list(range(6))
+
+    def test_read_page_last_page(self):
+        assert read_page(iter([[1], [2]]), 1, 5) == ([(2,)], False)
+
+
+class TestTypedPages:
+    """With typed_values a page is typed per column, like the unpaged result"""
+
+    # Code mixes numbers and text, so the whole column stays strings
+    OUTPUT = "Id|Code\n--|----\n1|123\n2|PROD\n3|7\n"
+
+    def fetch(self, port, query):
+        url = "http://127.0.0.1:%d/api?proc=Codes&user=u&pass=p%s" % (port, query)
+        with urllib.request.urlopen(url, timeout=10) as response:
+            return json.load(response)
+
+    def start(self, bridge, tmp_path, tail=""):
+        """Service on a SqlcmdBackend whose sqlcmd prints OUTPUT, then runs `tail`"""
+        sqlcmd = tmp_path / "sqlcmd"
+        sqlcmd.write_text("#!%s\nimport sys, time\nsys.stdout.write(%r)\nsys.stdout.flush()\n%s\n"
+                          % (sys.executable, self.OUTPUT, tail))
+        os.chmod(sqlcmd, 0o755)
+        backend = SqlcmdBackend("localhost", "db", typed=True)
+        backend._sqlcmd_path = str(sqlcmd)
+        return bridge(backend=backend, allowed_map={"Codes": "dbo.Api_Codes"})
+
+    def test_page_matches_unpaged_rows(self, bridge, tmp_path):
+        port = self.start(bridge, tmp_path)
+
+        unpaged = self.fetch(port, "")["rows"]
+        assert unpaged == [{"Id": 1, "Code": "123"}, {"Id": 2, "Code": "PROD"},
+                           {"Id": 3, "Code": "7"}]
+        assert self.fetch(port, "&limit=3")["rows"] == unpaged
+
+    def test_typed_page_still_stops_early(self, bridge, tmp_path):
+        # The rest of the result never arrives; only limit + 1 rows are read
+        port = self.start(bridge, tmp_path, tail="time.sleep(60)")
+        page = self.fetch(port, "&limit=2")
+        assert page["rows"] == [{"Id": 1, "Code": "123"}, {"Id": 2, "Code": "PROD"}]
+        assert page["next_cursor"]
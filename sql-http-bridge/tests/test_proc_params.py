@@ -0,0 +1,135 @@
+"""
+Tests for proc_params: declarations, validation and sp_executesql literals
+"""
+
+import datetime
+import decimal
+
+import pytest
+
+from proc_params import ParamError, bind_params, executesql_statement, parse_param_specs
+
+
+def spec(declaration):
+    (param,) = parse_param_specs(declaration)
+    return param
+
+
+def literal(declaration, raw):
+    param = spec(declaration)
+    return param.literal(param.convert(raw))
+
+
+class TestDeclarations:
+    """parse_param_specs"""
+
+    def test_declaration_list(self):
+        specs = parse_param_specs("ServerID int, @MinPrice decimal(10,2) = NULL, Term nvarchar(max) = x")
+        assert [(s.name, s.sql_type, s.required, s.default) for s in specs] == [
+            ("ServerID", "int", True, None),
+            ("MinPrice", "decimal(10,2)", False, None),
+            ("Term", "nvarchar(max)", False, "x"),
+        ]
+
+    @pytest.mark.parametrize("declaration", [
+        "Term nvarchar",            # no length
+        "Amount decimal(40,2)",     # precision > 38
+        "Amount decimal(4,5)",      # scale > precision
+        "Count int(4)",             # int takes no length
+        "Blob image",               # unsupported type
+        "Limit int",                # reserved by the bridge
+        "A int, a int",             # declared twice
+        "Count int = abc",          # invalid default
+    ])
+    def test_invalid_declarations(self, declaration):
+        with pytest.raises(ValueError):
+            parse_param_specs(declaration)
+
+
+class TestValidation:
+    """ProcParam.convert and bind_params"""
+
+    @pytest.mark.parametrize("declaration, raw", [
+        ("V tinyint", "256"),
+        ("V tinyint", "-1"),
+        ("V smallint", "32768"),
+        ("V int", "2147483648"),
+        ("V int", "-2147483649"),
+        ("V bigint", "9223372036854775808"),
+        ("V int", "1.0"),
+        ("V int", "1e3"),
+        ("V decimal(5,2)", "1000.00"),
+        ("V decimal(5,2)", "1.005"),
+        ("V decimal(5,2)", "NaN"),
+        ("V float", "inf"),
+        ("V float", "nan"),
+        ("V bit", "2"),
+        ("V nvarchar(3)", "abcd"),
+        ("V varchar(10)", "café"),
+        ("V nvarchar(10)", "a\x00b"),
+        ("V date", "2025-02-30"),
+        ("V datetime", "yesterday"),
+    ])
+    def test_out_of_range_or_malformed_values_are_rejected(self, declaration, raw):
+        with pytest.raises(ParamError):
+            spec(declaration).convert(raw)
+
+    def test_range_limits_are_accepted(self):
+        assert spec("V tinyint").convert("255") == 255
+        assert spec("V int").convert("-2147483648") == -2 ** 31
+        assert spec("V bigint").convert("9223372036854775807") == 2 ** 63 - 1
+        assert spec("V decimal(5,2)").convert("999.99") == decimal.Decimal("999.99")
+
+    def test_bind_params(self):
+        specs = parse_param_specs("ServerID int, HoursBack int = 24, Note nvarchar(10) = NULL")
+        bound = bind_params(specs, {"serverid": "5"})
+        assert [(s.name, v) for s, v in bound] == [("ServerID", 5), ("HoursBack", 24), ("Note", None)]
+
+    def test_missing_required_param(self):
+        with pytest.raises(ParamError, match="missing param: ServerID"):
+            bind_params(parse_param_specs("ServerID int"), {})
+
+
+class TestLiterals:
+    """ProcParam.literal and executesql_statement"""
+
+    def test_quotes_are_doubled(self):
+        assert literal("V nvarchar(20)", "O'Brien''s") == "N'O''Brien''''s'"
+        assert literal("V varchar(20)", "it's") == "'it''s'"
+
+    def test_string_values_are_not_stripped(self):
+        assert literal("V nvarchar(10)", " a ") == "N' a '"
+
+    def test_decimal_is_plain_notation(self):
+        assert literal("V decimal(10,2)", "1E+2") == "100"
+        assert literal("V decimal(10,2)", "-0.10") == "-0.10"
+
+    def test_float_round_trips(self):
+        assert literal("V float", "0.1") == "0.1"
+        assert literal("V float", "1e-7") == "1e-07"
+        assert float(literal("V float", "123456789.123456789")) == 123456789.123456789
+
+    def test_date_and_time_literals(self):
+        assert literal("V date", "2025-10-31") == "'2025-10-31'"
+        assert literal("V datetime", "2025-10-31 12:00") == "'2025-10-31T12:00:00.000'"
+        assert literal("V datetime2", "2025-10-31T12:00:00.123456") == "'2025-10-31T12:00:00.123456'"
+
+    def test_bit_and_null_literals(self):
+        assert literal("V bit", "true") == "1"
+        assert literal("V bit", "0") == "0"
+        assert spec("V int = NULL").literal(None) == "NULL"
+
+    def test_executesql_statement(self):
+        specs = parse_param_specs("Term nvarchar(20), Since date")
+        bound = bind_params(specs, {"Term": "O'Brien", "Since": "2025-01-02"})
+        assert executesql_statement("dbo.Api_Search", bound) == (
+            "EXEC sp_executesql N'EXEC dbo.Api_Search @Term=@Term, @Since=@Since', "
+            "N'@Term nvarchar(20), @Since date', @Term=N'O''Brien', @Since='2025-01-02'"
+        )
+
+    def test_executesql_without_params(self):
+        assert executesql_statement("dbo.Api_Ping", ()) == "EXEC dbo.Api_Ping"
+
+    def test_converted_types(self):
+        assert spec("V datetime2").convert("2025-10-31T12:00:00") == datetime.datetime(2025, 10, 31, 12)
+        assert spec("V date").convert(" 2025-10-31 ") == datetime.date(2025, 10, 31)
@@ -0,0 +1,207 @@
+"""
+Tests for result_cache: TTL, LRU eviction, stale-while-revalidate and
+request coalescing, and that failed logins are never cached
+"""
+
+import threading
+import time
+
+import pytest
+
+import result_cache
+from result_cache import ResultCache, SingleFlight, credential_digest
+from sql_backends import ExecutionError
+
+
+class Clock:
+    """Stands in for the time module so TTLs can be stepped through"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_cache, "time", clock)
+    return clock
+
+
+def loader(value, size=10, calls=None):
+    def load():
+        if calls is not None:
+            calls.append(value)
+        return value, size
+    return load
+
+
+def failed_login():
+    raise ExecutionError("login failed")
+
+
+def key(password="secret"):
+    """Result keys carry a digest of the password, as in the service"""
+    return ("Inventory", (), "svc", credential_digest(password), None)
+
+
+class TestResultCache:
+    """TTL, LRU and stale-while-revalidate"""
+
+    def test_hit_until_ttl_expires(self, clock):
+        cache = ResultCache()
+        assert cache.get_or_load(key(), 10, loader("a")) == ("a", "miss")
+        clock.now += 9
+        assert cache.get_or_load(key(), 10, loader("b")) == ("a", "hit")
+        clock.now += 2
+        assert cache.get_or_load(key(), 10, loader("b")) == ("b", "miss")
+
+    def test_least_recently_used_is_evicted(self, clock):
+        cache = ResultCache(max_bytes=100)
+        cache.get_or_load("a", 60, loader("a", 40))
+        cache.get_or_load("b", 60, loader("b", 40))
+        cache.get_or_load("a", 60, loader("a", 40))      # a is now the most recent
+        cache.get_or_load("c", 60, loader("c", 40))
+        calls = []
+        assert cache.get_or_load("a", 60, loader("a2", 40, calls)) == ("a", "hit")
+        assert cache.get_or_load("b", 60, loader("b2", 40, calls)) == ("b2", "miss")
+        assert calls == ["b2"]
+        assert cache.stats()["evictions"] == 2
+        assert cache.stats()["bytes"] <= 100
+
+    def test_oversized_result_is_not_cached(self, clock):
+        cache = ResultCache(max_bytes=100)
+        cache.get_or_load("big", 60, loader("big", 101))
+        assert cache.stats()["entries"] == 0
+
+    def test_stale_entry_is_served_while_one_refresh_runs(self, clock):
+        cache = ResultCache(stale_secs=30)
+        cache.get_or_load(key(), 10, loader("old"))
+        clock.now += 15
+
+        release = threading.Event()
+        refreshes = []
+
+        def refresh():
+            refreshes.append(1)
+            release.wait(5)
+            return "new", 10
+
+        assert cache.get_or_load(key(), 10, refresh) == ("old", "stale")
+        assert cache.get_or_load(key(), 10, refresh) == ("old", "stale")
+        release.set()
+        for thread in threading.enumerate():
+            if thread.name == "sql-cache-refresh":
+                thread.join(5)
+        assert refreshes == [1]
+        assert cache.get_or_load(key(), 10, loader("unused")) == ("new", "hit")
+
+    def test_failed_refresh_keeps_the_stale_entry(self, clock):
+        cache = ResultCache(stale_secs=30)
+        cache.get_or_load(key(), 10, loader("old"))
+        clock.now += 15
+        assert cache.get_or_load(key(), 10, failed_login) == ("old", "stale")
+        for thread in threading.enumerate():
+            if thread.name == "sql-cache-refresh":
+                thread.join(5)
+        assert cache.stats()["refresh_errors"] == 1
+        clock.now += 30
+        with pytest.raises(ExecutionError):
+            cache.get_or_load(key(), 10, failed_login)
+
+    def test_failed_login_is_not_cached(self, clock):
+        cache = ResultCache()
+        with pytest.raises(ExecutionError):
+            cache.get_or_load(key(), 60, failed_login)
+        assert cache.stats()["entries"] == 0
+        assert cache.get_or_load(key(), 60, loader("rows")) == ("rows", "miss")
+
+    def test_other_password_does_not_hit(self, clock):
+        cache = ResultCache()
+        cache.get_or_load(key("secret"), 60, loader("rows"))
+        with pytest.raises(ExecutionError):
+            cache.get_or_load(key("wrong"), 60, failed_login)
+
+
+class TestSingleFlight:
+    """Concurrent identical loads run once"""
+
+    def run_concurrently(self, flight, keys, fn):
+        """Call flight.do for every key at once; returns results (or exceptions) in order"""
+        results = [None] * len(keys)
+
+        def call(i):
+            try:
+                results[i] = flight.do(keys[i], fn)
+            except Exception as ex:
+                results[i] = ex
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(len(keys))]
+        for thread in threads:
+            thread.start()
+        return threads, results
+
+    def blocking(self, outcome):
+        """fn that waits for `release`, then returns or raises `outcome`"""
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        return fn, started, release, calls
+
+    def wait_for_waiters(self, flight, count):
+        for _ in range(500):
+            if flight.stats()["coalesced"] >= count:
+                return
+            time.sleep(0.01)
+
+    def test_identical_calls_share_one_execution(self):
+        flight = SingleFlight()
+        fn, started, release, calls = self.blocking("rows")
+        threads, results = self.run_concurrently(flight, [key()] * 4, fn)
+        started.wait(5)
+        self.wait_for_waiters(flight, 3)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        assert calls == [1]
+        assert sorted(shared for _, shared in results) == [False, True, True, True]
+        assert {value for value, _ in results} == {"rows"}
+        assert flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 3}
+
+    def test_failed_login_is_not_kept(self):
+        flight = SingleFlight()
+        fn, started, release, calls = self.blocking(ExecutionError("login failed"))
+        threads, results = self.run_concurrently(flight, [key()] * 3, fn)
+        started.wait(5)
+        self.wait_for_waiters(flight, 2)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        # Callers that waited with the same credentials see the failure...
+        assert all(isinstance(r, ExecutionError) for r in results)
+        # ...and the next call executes again instead of reusing it
+        assert flight.do(key(), lambda: "rows") == ("rows", False)
+
+    def test_other_password_is_never_coalesced(self):
+        flight = SingleFlight()
+        fn, started, release, calls = self.blocking("rows")
+        threads, results = self.run_concurrently(flight, [key("secret")], fn)
+        started.wait(5)
+        # A caller with another password runs (and fails) on its own
+        with pytest.raises(ExecutionError):
+            flight.do(key("wrong"), failed_login)
+        release.set()
+        threads[0].join(5)
+        assert results == [("rows", False)]
+        assert flight.stats()["coalesced"] == 0
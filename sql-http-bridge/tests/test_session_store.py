@@ -0,0 +1,118 @@
+"""
+Tests for session_store: token issue, expiry, logout, hashed storage, and
+the /auth endpoints
+"""
+
+import hashlib
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+import session_store
+from conftest import StaticBackend
+from session_store import SessionStore
+
+
+class Clock:
+    """Stands in for the time module so expiry can be stepped through"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session_store, "time", clock)
+    return clock
+
+
+class TestSessionStore:
+    """Issue, resolve, expire and revoke tokens"""
+
+    def test_issued_token_resolves_to_its_login(self, clock):
+        store = SessionStore(ttl=60)
+        token, ttl = store.create("svc", "secret")
+        assert ttl == 60
+        assert store.resolve(token) == ("svc", "secret")
+        assert store.resolve(token + "x") is None
+
+    def test_tokens_are_unique(self, clock):
+        store = SessionStore()
+        assert store.create("svc", "secret")[0] != store.create("svc", "secret")[0]
+
+    def test_token_expires(self, clock):
+        store = SessionStore(ttl=60)
+        token, _ = store.create("svc", "secret")
+        clock.now += 59
+        assert store.resolve(token) is not None
+        clock.now += 1
+        assert store.resolve(token) is None
+        assert store.stats() == {"active": 0, "issued": 1, "expired": 1}
+
+    def test_revoke(self, clock):
+        store = SessionStore()
+        token, _ = store.create("svc", "secret")
+        assert store.revoke(token)
+        assert store.resolve(token) is None
+        assert not store.revoke(token)
+
+    def test_tokens_are_stored_hashed(self, clock):
+        store = SessionStore()
+        token, _ = store.create("svc", "secret")
+        assert list(store._sessions) == [hashlib.sha256(token.encode("utf-8")).digest()]
+        assert token not in repr(store._sessions)
+
+    def test_full_store_drops_the_session_closest_to_expiry(self, clock):
+        store = SessionStore(ttl=60, max_sessions=2)
+        first, _ = store.create("a", "pa")
+        clock.now += 1
+        second, _ = store.create("b", "pb")
+        third, _ = store.create("c", "pc")
+        assert store.resolve(first) is None
+        assert store.resolve(second) == ("b", "pb")
+        assert store.resolve(third) == ("c", "pc")
+
+
+class TestEndpoints:
+    """POST /auth, Bearer tokens on /api and POST /auth/logout"""
+
+    def request(self, port, path, data=None, token=None):
+        headers = {"Authorization": "Bearer %s" % token} if token else {}
+        request = urllib.request.Request("http://127.0.0.1:%d%s" % (port, path),
+                                         data=data and data.encode("utf-8"), headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return response.status, json.load(response)
+        except urllib.error.HTTPError as ex:
+            return ex.code, json.load(ex)
+
+    @pytest.fixture
+    def port(self, bridge):
+        return bridge(backend=StaticBackend([(["Id"], [("1",)])]),
+                      sessions=SessionStore(ttl=60),
+                      allowed_map={"Inventory": "dbo.Api_GetInventory"})
+
+    def test_login_call_logout(self, port):
+        status, body = self.request(port, "/auth", "user=svc&pass=secret")
+        assert status == 200
+        assert (body["token_type"], body["expires_in"], body["login"]) == ("Bearer", 60, "svc")
+        token = body["token"]
+
+        assert self.request(port, "/api?proc=Inventory", token=token)[0] == 200
+        assert self.request(port, "/auth/logout", "token=%s" % token) == (200, {"revoked": True})
+        assert self.request(port, "/api?proc=Inventory", token=token)[0] == 401
+
+    def test_unknown_token_is_401(self, port):
+        status, body = self.request(port, "/api?proc=Inventory&token=made-up")
+        assert (status, body["error"]) == (401, "invalid or expired token")
+
+    def test_rejected_login_gets_no_token(self, port):
+        status, body = self.request(port, "/auth", "user=svc&pass=bad")
+        assert status == 401
+        assert "token" not in body
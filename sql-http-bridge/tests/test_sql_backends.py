@@ -0,0 +1,60 @@
+"""
+Tests for sql_backends helpers that do not need a database driver
+"""
+
+from sql_backends import odbc_connection_string
+
+
+def attributes(conn_str):
+    """Split a connection string the way the ODBC driver manager does"""
+    attrs = {}
+    i = 0
+    while i < len(conn_str):
+        key, _, rest = conn_str[i:].partition("=")
+        i += len(key) + 1
+        if rest.startswith("{"):
+            j = 1
+            value = ""
+            while True:
+                if rest[j] == "}":
+                    if rest[j + 1:j + 2] == "}":
+                        value += "}"
+                        j += 2
+                        continue
+                    break
+                value += rest[j]
+                j += 1
+            i += j + 2          # closing brace and ';'
+        else:
+            value = rest.split(";", 1)[0]
+            i += len(value) + 1
+        attrs[key.upper()] = value
+    return attrs
+
+
+class TestOdbcConnectionString:
+    """odbc_connection_string"""
+
+    def test_login_cannot_add_attributes(self):
+        attrs = attributes(odbc_connection_string(
+            "ODBC Driver 18 for SQL Server", "db1,1433", "master",
+            "x;Trusted_Connection=yes", "pw"))
+        assert attrs["UID"] == "x;Trusted_Connection=yes"
+        assert "TRUSTED_CONNECTION" not in attrs
+
+    def test_braces_are_escaped(self):
+        attrs = attributes(odbc_connection_string(
+            "ODBC Driver 18 for SQL Server", "db1", "master", "a}b{c", "p}w;x=1"))
+        assert attrs["UID"] == "a}b{c"
+        assert attrs["PWD"] == "p}w;x=1"
+        assert set(attrs) == {"DRIVER", "SERVER", "DATABASE", "UID", "PWD",
+                              "ENCRYPT", "TRUSTSERVERCERTIFICATE"}
+
+    def test_encryption_defaults_verify_the_server(self):
+        attrs = attributes(odbc_connection_string("D", "db1", "master", "u", "p"))
+        assert (attrs["ENCRYPT"], attrs["TRUSTSERVERCERTIFICATE"]) == ("yes", "no")
+
+    def test_encryption_settings(self):
+        attrs = attributes(odbc_connection_string("D", "db1", "master", "u", "p",
+                                                  encrypt="optional", trust_server_certificate=True))
+        assert (attrs["ENCRYPT"], attrs["TRUSTSERVERCERTIFICATE"]) == ("optional", "yes")
@@ -0,0 +1,154 @@
+"""
+Tests for sqlcmd_parser: result-set detection, splitting and typed values
+"""
+
+import datetime
+
+from sqlcmd_parser import convert_column, convert_rows, iter_result_set, parse_result_sets
+
+
+def sqlcmd_output(*result_sets, between="\n"):
+    """`sqlcmd -W -s "|"` text for (columns, rows) pairs"""
+    blocks = []
+    for columns, rows in result_sets:
+        lines = ["|".join(columns), "|".join("-" * len(c) for c in columns)]
+        lines += ["|".join(row) for row in rows]
+        blocks.append("\n".join(lines) + "\n")
+    return between.join(blocks)
+
+
+class TestResultSets:
+    """Result-set detection"""
+
+    def test_multiple_result_sets_in_order(self):
+        text = sqlcmd_output(
+            (["Id", "Name"], [["1", "a"], ["2", "b"]]),
+            (["Total"], [["3"]]),
+            between="\nsome PRINT output\n\n",
+        )
+        assert parse_result_sets(text) == [
+            (["Id", "Name"], [("1", "a"), ("2", "b")]),
+            (["Total"], [("3",)]),
+        ]
+
+    def test_rows_affected_line_is_not_a_row(self):
+        text = "Id\n--\n1\n2\n(2 rows affected)\n"
+        assert parse_result_sets(text) == [(["Id"], [("1",), ("2",)])]
+
+    def test_empty_result_set(self):
+        assert parse_result_sets("Id|Name\n--|----\n\n") == [(["Id", "Name"], [])]
+
+    def test_empty_string_rows_in_single_column_set(self):
+        # sqlcmd -W prints an empty value as an empty line; the rows after
+        # it belong to the same set
+        text = "Name\n----\na\n\nb\n\n\nc\n\nTotal\n-----\n3\n"
+        assert parse_result_sets(text) == [
+            (["Name"], [("a",), ("",), ("b",), ("",), ("",), ("c",)]),
+            (["Total"], [("3",)]),
+        ]
+
+    def test_empty_string_rows_before_footer_and_end(self):
+        assert parse_result_sets("Name\n----\na\n\n\n(2 rows affected)\n") == [
+            (["Name"], [("a",), ("",)])]
+        assert parse_result_sets("Name\n----\n\nb\n") == [(["Name"], [("",), ("b",)])]
+        assert parse_result_sets("Name\n----\n\nTotal\n-----\n3\n") == [
+            (["Name"], []), (["Total"], [("3",)])]
+
+    def test_crlf_output(self):
+        text = sqlcmd_output((["Id"], [["1"], ["2"]])).replace("\n", "\r\n")
+        assert parse_result_sets(text) == [(["Id"], [("1",), ("2",)])]
+
+
+class TestSplitting:
+    """Delimited and fixed-width splitting"""
+
+    def test_delimiter_inside_value_does_not_shift_other_rows(self):
+        # The long line and the short line together hold the expected
+        # number of delimiters; each row must still be split on its own.
+        text = "A|B\n-|-\n1|x|y\n2\n3|z\n\n"
+        (columns, rows), = parse_result_sets(text)
+        assert rows == [("1", "x"), ("2", None), ("3", "z")]
+
+    def test_fixed_width_reads_delimiter_inside_value(self):
+        text = ("Id Name \n"
+                "-- -----\n"
+                "1  a|b  \n"
+                "2  c    \n\n")
+        (columns, rows), = parse_result_sets(text, fixed_width=True)
+        assert columns == ["Id", "Name"]
+        assert rows == [("1", "a|b"), ("2", "c")]
+
+
+class TestTypedValues:
+    """typed=True conversion"""
+
+    def test_column_types(self):
+        text = sqlcmd_output((
+            ["I", "F", "D", "DT", "S"],
+            [["1", "1.50", "2025-01-02", "2025-01-02 03:04:05.123", "x"],
+             ["-2", "-0.25", "2025-12-31", "2025-12-31 23:59:59.000", "y"]],
+        ))
+        (columns, rows), = parse_result_sets(text, typed=True)
+        assert rows == [
+            (1, 1.5, datetime.date(2025, 1, 2), datetime.datetime(2025, 1, 2, 3, 4, 5, 123000), "x"),
+            (-2, -0.25, datetime.date(2025, 12, 31), datetime.datetime(2025, 12, 31, 23, 59, 59), "y"),
+        ]
+
+    def test_nulls_become_none(self):
+        assert convert_column(["1", "NULL", "3"]) == [1, None, 3]
+        assert convert_column(["a", "NULL"]) == ["a", None]
+        assert convert_column(["NULL", "NULL"]) == [None, None]
+        assert convert_column(["1", None]) == [1, None]
+
+    def test_zero_padded_codes_stay_text(self):
+        for column in (["007", "1"], ["-01.5", "2"], ["00", "5"]):
+            assert convert_column(list(column)) == column
+
+    def test_bare_decimal_points_stay_text(self):
+        for column in ([".5", "1"], ["5.", "1"], ["5.e3", "1"], ["-.5", "1"]):
+            assert convert_column(list(column)) == column
+
+    def test_zero_is_a_number(self):
+        assert convert_column(["0", "-0", "10"]) == [0, 0, 10]
+        assert convert_column(["0.5", "-0.25", "1e5"]) == [0.5, -0.25, 1e5]
+
+    def test_mixed_column_stays_text(self):
+        assert convert_column(["1", "abc"]) == ["1", "abc"]
+        assert convert_column(["1.5", ""]) == ["1.5", ""]
+
+    def test_convert_rows_types_whole_columns(self):
+        assert convert_rows([["123", "1"], ["PROD", "NULL"]]) == [("123", 1), ("PROD", None)]
+        assert convert_rows([]) == []
+
+
+class TestStreaming:
+    """iter_result_set against parse_result_sets"""
+
+    TEXT = sqlcmd_output(
+        (["Id", "Amount", "Code", "At", "Note"],
+         [["1", "10.25", "007", "2025-01-02 03:04:05.123", "NULL"],
+          ["2", "NULL", "012", "2025-01-03 00:00:00.000", "a|b"],
+          ["3", "-0.50", "099", "NULL", "c"]]),
+        (["Other"], [["x"]]),
+    )
+    MIXED = sqlcmd_output((["Id", "Code"], [["1", "123"], ["2", "PROD"], ["3", "7"]]))
+    SINGLE = "Name\n----\na\n\nb\n\nTotal\n-----\n3\n"
+
+    def stream(self, text, typed):
+        columns, rows = iter_result_set(text.splitlines(keepends=True), typed=typed)
+        return columns, [tuple(row) for row in rows]
+
+    def test_untyped_parity(self):
+        assert self.stream(self.TEXT, typed=False) == parse_result_sets(self.TEXT)[0]
+
+    def test_typed_parity(self):
+        assert self.stream(self.TEXT, typed=True) == parse_result_sets(self.TEXT, typed=True)[0]
+
+    def test_mixed_column_typed_parity(self):
+        streamed = self.stream(self.MIXED, typed=True)
+        assert streamed == parse_result_sets(self.MIXED, typed=True)[0]
+        assert streamed[1] == [(1, "123"), (2, "PROD"), (3, "7")]
+
+    def test_empty_string_rows_parity(self):
+        assert self.stream(self.SINGLE, typed=False) == parse_result_sets(self.SINGLE)[0]
+        assert self.stream(self.SINGLE, typed=False)[1] == [("a",), ("",), ("b",)]
@@ -2,37 +2,97 @@
 """
 Export SQL Server Health Report as HTML
 Handles large NVARCHAR(MAX) output that sqlcmd truncates
+
+By default the report is rendered locally (report_sections.py): the raw
+section result sets are fetched in parallel over a few connections and
+formatted here, so the monitored server only runs small SELECTs. Rendered
+sections are cached in <output dir>/.report_cache and reused while their
+source data is unchanged.
+
+With --render server the report is built by DBA_DailyHealthOverview_HTML
+and streamed: SQL Server splits the NVARCHAR(MAX) value into 8000-byte
+chunks and each chunk is decoded and written (optionally gzip-compressed)
+as it arrives, so client memory stays flat however large the report is.
+
+Fleet mode (--fleet servers.txt) generates the reports of many servers
+concurrently, each on its own connections within its own time budget, and
+writes an index page summarizing every server's status and generation time.
 """
 
+import argparse
+import codecs
+import gzip
+import html
+import json
 import pyodbc
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import os
 
-def export_html_report(server, user, password, output_file=None,
-                      top_queries=20, top_indexes=20, hours_back=48):
-    """
-    Generate and export HTML health report from SQL Server
+import report_sections
 
-    Args:
-        server: SQL Server address (e.g., 'servername,14333')
-        user: SQL username
-        password: SQL password
-        output_file: Output HTML file path (default: auto-generated)
-        top_queries: Number of slow queries to include
-        top_indexes: Number of missing indexes to include
-        hours_back: Hours to look back for statistics
+# Bytes per chunk row; 8000 keeps the column a non-LOB VARBINARY(8000),
+# which pyodbc fetches into bound buffers
+CHUNK_BYTES = 8000
+
+# Chunk rows per fetchmany() round trip (~4 MB)
+FETCH_ROWS = 500
+
+# Runs the report proc into a temp table and returns the HTML as ordered
+# UTF-16LE byte chunks (decoded client-side, so a surrogate pair split
+# between two chunks is still decoded correctly)
+REPORT_CHUNKS_SQL = f"""
+SET NOCOUNT ON
+CREATE TABLE #HTML (Content NVARCHAR(MAX))
+
+INSERT INTO #HTML
+EXEC DBATools.dbo.DBA_DailyHealthOverview_HTML
+    @TopSlowQueries = ?,
+    @TopMissingIndexes = ?,
+    @HoursBackForIssues = ?
+
+DECLARE @Bytes VARBINARY(MAX) = (SELECT TOP (1) CAST(Content AS VARBINARY(MAX)) FROM #HTML)
+
+;WITH Chunks (n) AS (
+    SELECT CAST(0 AS BIGINT) WHERE @Bytes IS NOT NULL
+    UNION ALL
+    SELECT n + 1 FROM Chunks WHERE (n + 1) * {CHUNK_BYTES} < DATALENGTH(@Bytes)
+)
+SELECT CAST(SUBSTRING(@Bytes, n * {CHUNK_BYTES} + 1, {CHUNK_BYTES}) AS VARBINARY({CHUNK_BYTES})) AS Chunk
+FROM Chunks
+ORDER BY n
+OPTION (MAXRECURSION 0)
+"""
+
+def generate_report(server, user, password, output_file,
+                    top_queries=20, top_indexes=20, hours_back=48,
+                    compress=False, query_timeout=0, render='local',
+                    cache=True, section_parallel=3):
     """
+    Generate the HTML health report of one server into `output_file`.
 
-    # Auto-generate filename if not provided
-    if output_file is None:
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        output_file = f'health_report_{timestamp}.html'
+    render='local' formats the report here from the section queries
+    (section_parallel connections, cached sections reused when `cache`);
+    render='server' streams the output of DBA_DailyHealthOverview_HTML.
+
+    query_timeout is a wall-clock budget in seconds (0 = none) for the whole
+    report: logins, every query and the streaming of its output. Each query
+    runs with the time still left as its timeout.
+
+    Returns (html_length, file_size, cached_sections); raises pyodbc.Error
+    on database errors (including a query cancelled at its timeout),
+    TimeoutError when the budget ran out between queries and ValueError
+    when there is no report data. A partial file is never left behind.
+    """
+    deadline = time.monotonic() + query_timeout if query_timeout else None
 
     # Ensure output directory exists
     output_dir = os.path.dirname(output_file)
-    if output_dir and not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
 
     # Build connection string
     conn_str = (
@@ -45,49 +105,249 @@ def export_html_report(server, user, password, output_file=None,
         f'Encrypt=Optional'
     )
 
-    print(f"Connecting to {server}...")
+    # Write into a .part file; it only replaces output_file once the whole
+    # report was written
+    part_file = output_file + '.part'
+
+    if render == 'local':
+        def connect():
+            return pyodbc.connect(conn_str, timeout=_login_timeout(deadline))
 
+        options = {'top_queries': int(top_queries), 'top_indexes': int(top_indexes),
+                   'hours_back': int(hours_back)}
+        cache_file = None
+        if cache:
+            cache_file = os.path.join(os.path.dirname(os.path.abspath(output_file)),
+                                      '.report_cache', _file_label(server) + '.json')
+        try:
+            html_length, cached = render_report_locally(
+                connect, server, options, part_file, compress,
+                cache_file, section_parallel, deadline)
+        except BaseException:
+            _remove_quietly(part_file)
+            raise
+        os.replace(part_file, output_file)
+        return html_length, os.path.getsize(output_file), cached
+    if render != 'server':
+        raise ValueError(f"render must be 'local' or 'server', got {render!r}")
+
+    conn = pyodbc.connect(conn_str, timeout=_login_timeout(deadline))
     try:
-        # Connect to database
-        conn = pyodbc.connect(conn_str, timeout=30)
+        # The driver cancels the batch when the rest of the budget is used up
+        conn.timeout = _remaining_timeout(deadline)
+        cursor = conn.cursor()
+        cursor.execute(REPORT_CHUNKS_SQL,
+                       int(top_queries), int(top_indexes), int(hours_back))
+        html_length = stream_report(cursor, part_file, compress, deadline)
+        cursor.close()
+    except BaseException:
+        _remove_quietly(part_file)
+        raise
+    finally:
+        conn.close()
+
+    if html_length == 0:
+        _remove_quietly(part_file)
+        raise ValueError("No HTML returned from procedure")
+
+    os.replace(part_file, output_file)
+    return html_length, os.path.getsize(output_file), 0
+
+
+def _remaining_timeout(deadline):
+    """
+    Seconds left before `deadline` (time.monotonic()) as a pyodbc query
+    timeout: 0 (none) without a deadline, at least 1 otherwise. Raises
+    TimeoutError once the deadline has passed.
+    """
+    if deadline is None:
+        return 0
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError("report time budget exhausted")
+    return max(1, int(remaining))
+
+
+def _login_timeout(deadline):
+    """Login timeout: 30 seconds, or less when the budget has less left."""
+    if deadline is None:
+        return 30
+    return min(30, _remaining_timeout(deadline))
+
+
+class _SectionConnections:
+    """
+    Worker threads for the section queries, each with its own connection
+    (a pyodbc connection must not be used by two threads at once). Every
+    query gets the time left before `deadline` as its timeout.
+    """
+
+    def __init__(self, connect, size, deadline=None):
+        self._connect = connect
+        self._deadline = deadline
+        self._local = threading.local()
+        self._conns = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, size))
+
+    def execute(self, sql, params=()):
+        """Run a query on the calling worker thread's connection."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            with self._lock:
+                self._conns.append(conn)
+        conn.timeout = _remaining_timeout(self._deadline)
         cursor = conn.cursor()
+        try:
+            cursor.execute(sql, *params)
+            while cursor.description is None:
+                if not cursor.nextset():
+                    return []
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
 
-        # Execute stored procedure
-        sql = f"""
-        SET NOCOUNT ON
-        EXEC DBATools.dbo.DBA_DailyHealthOverview_HTML
-            @TopSlowQueries = {top_queries},
-            @TopMissingIndexes = {top_indexes},
-            @HoursBackForIssues = {hours_back}
-        """
+    def query(self, sql, params=()):
+        """Run a query on a worker thread and wait for its rows."""
+        return self._executor.submit(self.execute, sql, params).result()
 
-        print(f"Generating HTML report...")
-        cursor.execute(sql)
+    def map(self, fn, items):
+        return list(self._executor.map(fn, items))
 
-        # Fetch result
-        row = cursor.fetchone()
+    def __enter__(self):
+        return self
 
-        if row is None or row[0] is None:
-            print("ERROR: No HTML returned from procedure")
-            return False
+    def __exit__(self, *exc):
+        self._executor.shutdown(wait=True)
+        for conn in self._conns:
+            try:
+                conn.close()
+            except pyodbc.Error:
+                pass
 
-        html_content = row[0]
 
-        # Write to file
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+def _load_section_cache(path):
+    if path is None:
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            cached = json.load(f)
+        return cached if isinstance(cached, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_section_cache(path, sections):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(sections, f)
+    os.replace(tmp, path)
+
+
+def render_report_locally(connect, server, options, path, compress=False,
+                          cache_file=None, parallel=3, deadline=None):
+    """
+    Render the report from the section queries into `path`.
+
+    One version query decides which sections changed since the cached
+    render; only those are queried (in parallel over up to `parallel`
+    connections) and re-rendered. All queries must finish before
+    `deadline` (time.monotonic(); None = no limit). Returns
+    (html_length, cached_sections).
+    """
+    cache = _load_section_cache(cache_file)
+    with _SectionConnections(connect, parallel, deadline) as conns:
+        versions = conns.query(report_sections.VERSION_SQL, (options['hours_back'],))
+        if not versions or versions[0]['LatestRunID'] is None:
+            raise ValueError("No snapshot data in DBATools.dbo.PerfSnapshotRun")
+        versions = versions[0]
 
-        # Get file stats
-        file_size = os.path.getsize(output_file)
+        html_by_section = {}
+        stale = []
+        for section in report_sections.SECTIONS:
+            version = [report_sections.RENDER_VERSION] + list(section.version(options, versions))
+            entry = cache.get(section.name)
+            if isinstance(entry, dict) and entry.get('version') == version:
+                html_by_section[section.name] = entry['html']
+            else:
+                stale.append((section, version))
+
+        def render(item):
+            section, version = item
+            rows = conns.execute(section.sql, section.params(options, versions))
+            return section.name, version, section.render(rows, options)
+
+        for name, version, section_html in conns.map(render, stale):
+            html_by_section[name] = section_html
+            cache[name] = {'version': version, 'html': section_html}
+
+    html_length = 0
+    with _open_output(path, compress) as out:
+        parts = [report_sections.render_page_header(
+            server, options['top_queries'], options['top_indexes'], options['hours_back'])]
+        parts += [html_by_section[s.name] for s in report_sections.SECTIONS]
+        parts.append(report_sections.PAGE_FOOTER)
+        for part in parts:
+            html_length += len(part)
+            out.write(part)
+
+    if cache_file is not None and stale:
+        try:
+            _save_section_cache(cache_file, cache)
+        except OSError as e:
+            print(f"⚠️  Could not write section cache {cache_file}: {e}")
+    return html_length, len(report_sections.SECTIONS) - len(stale)
+
+
+def export_html_report(server, user, password, output_file=None,
+                      top_queries=20, top_indexes=20, hours_back=48,
+                      compress=False, query_timeout=0, render='local',
+                      cache=True):
+    """
+    Generate and export HTML health report from SQL Server
+
+    Args:
+        server: SQL Server address (e.g., 'servername,14333')
+        user: SQL username
+        password: SQL password
+        output_file: Output HTML file path (default: auto-generated)
+        top_queries: Number of slow queries to include
+        top_indexes: Number of missing indexes to include
+        hours_back: Hours to look back for statistics
+        compress: Write gzip-compressed output (adds .gz to the file name)
+        query_timeout: Seconds the whole report may take before its queries
+            are cancelled (0 = none)
+        render: 'local' (format here, cached sections) or 'server'
+            (DBA_DailyHealthOverview_HTML)
+        cache: Reuse cached sections whose source data is unchanged
+    """
+
+    # Auto-generate filename if not provided
+    if output_file is None:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        output_file = f'health_report_{timestamp}.html'
+    if compress and not output_file.endswith('.gz'):
+        output_file += '.gz'
+
+    print(f"Connecting to {server}...")
+    print(f"Generating HTML report...")
+
+    try:
+        html_length, file_size, cached = generate_report(
+            server, user, password, output_file,
+            top_queries=top_queries, top_indexes=top_indexes,
+            hours_back=hours_back, compress=compress,
+            query_timeout=query_timeout, render=render, cache=cache)
 
         print(f"\n✅ Report generated successfully")
         print(f"   File: {output_file}")
         print(f"   Size: {file_size:,} bytes ({file_size/1024:.1f} KB)")
-        print(f"   HTML Length: {len(html_content):,} characters")
-
-        # Close connection
-        cursor.close()
-        conn.close()
+        print(f"   HTML Length: {html_length:,} characters")
+        if render == 'local':
+            print(f"   Sections from cache: {cached} of {len(report_sections.SECTIONS)}")
 
         return True
 
@@ -101,6 +361,172 @@ def export_html_report(server, user, password, output_file=None,
         return False
 
 
+def read_server_list(path):
+    """
+    Parse a server list: one server per line, either `address` or
+    `name address`; blank lines and # comments are ignored.
+    Returns [(name, address)].
+    """
+    servers = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            parts = line.split()
+            if len(parts) == 1:
+                name = address = parts[0]
+            elif len(parts) == 2:
+                name, address = parts
+            else:
+                raise ValueError(f"{path}: expected 'address' or 'name address', got {line!r}")
+            servers.append((name, address))
+    return servers
+
+
+def _file_label(name):
+    """Server name as a safe file name part ('host,14333' -> 'host_14333')."""
+    return ''.join(c if c.isalnum() or c in '-.' else '_' for c in name)
+
+
+def export_fleet_reports(servers, user, password, output_dir,
+                         max_parallel=4, timeout=600, compress=False,
+                         top_queries=20, top_indexes=20, hours_back=48,
+                         render='local', cache=True):
+    """
+    Generate the reports of all `servers` ([(name, address)]) concurrently
+    on at most `max_parallel` servers at a time, then write the fleet index
+    page. With render='local' each server uses up to 3 connections for its
+    section queries.
+
+    Each server gets `timeout` seconds of wall-clock time for its logins
+    and queries (0 = none); a failure or timeout on one server is recorded in its result and does not affect the rest.
+    Returns (results, index_file); results is one dict per server, in
+    list order.
+    """
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    os.makedirs(output_dir, exist_ok=True)
+    suffix = '.html.gz' if compress else '.html'
+
+    def run(server):
+        name, address = server
+        output_file = os.path.join(
+            output_dir, f'health_report_{_file_label(name)}_{timestamp}{suffix}')
+        result = {'name': name, 'server': address, 'file': None,
+                  'size': 0, 'chars': 0, 'error': None}
+        started = time.monotonic()
+        try:
+            result['chars'], result['size'], _ = generate_report(
+                address, user, password, output_file,
+                top_queries=top_queries, top_indexes=top_indexes,
+                hours_back=hours_back, compress=compress,
+                query_timeout=timeout, render=render, cache=cache)
+            result['file'] = output_file
+        except Exception as e:
+            result['error'] = str(e) or type(e).__name__
+        result['seconds'] = time.monotonic() - started
+        mark = '✅' if result['error'] is None else '❌'
+        detail = f"{result['size']:,} bytes" if result['error'] is None else result['error']
+        print(f"{mark} {name}: {result['seconds']:.1f}s, {detail}", flush=True)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as pool:
+        results = list(pool.map(run, servers))
+
+    index_file = os.path.join(output_dir, f'fleet_index_{timestamp}.html')
+    with open(index_file, 'w', encoding='utf-8') as f:
+        f.write(fleet_index_html(results, datetime.now()))
+    return results, index_file
+
+
+def fleet_index_html(results, generated_at):
+    """Index page: one row per server with status, generation time and link."""
+    ok = sum(1 for r in results if r['error'] is None)
+    rows = []
+    for r in results:
+        if r['error'] is None:
+            status = '<td class="ok">OK</td>'
+            link = os.path.basename(r['file'])
+            report = f'<a href="{html.escape(link)}">{html.escape(link)}</a>'
+            size = f"{r['size'] / 1024:,.1f} KB"
+        else:
+            status = '<td class="failed">FAILED</td>'
+            report = html.escape(r['error'])
+            size = ''
+        rows.append(
+            f"<tr><td>{html.escape(r['name'])}</td><td>{html.escape(r['server'])}</td>"
+            f"{status}<td class=\"num\">{r['seconds']:.1f}s</td>"
+            f"<td class=\"num\">{size}</td><td>{report}</td></tr>")
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>SQL Server Fleet Health Reports</title>
+<style>
+body {{ font-family: Segoe UI, Arial, sans-serif; margin: 20px; }}
+table {{ border-collapse: collapse; }}
+th, td {{ border: 1px solid #ccc; padding: 6px 10px; text-align: left; }}
+th {{ background: #2c3e50; color: #fff; }}
+td.num {{ text-align: right; }}
+td.ok {{ color: #27ae60; font-weight: bold; }}
+td.failed {{ color: #c0392b; font-weight: bold; }}
+</style>
+</head>
+<body>
+<h1>SQL Server Fleet Health Reports</h1>
+<p>Generated {generated_at:%Y-%m-%d %H:%M:%S}: {ok} of {len(results)} servers OK</p>
+<table>
+<tr><th>Name</th><th>Server</th><th>Status</th><th>Time</th><th>Size</th><th>Report</th></tr>
+{chr(10).join(rows)}
+</table>
+</body>
+</html>
+"""
+
+
+def stream_report(cursor, path, compress=False, deadline=None):
+    """
+    Write the chunk rows of REPORT_CHUNKS_SQL to `path` as UTF-8 (gzip if
+    `compress`). Returns the number of characters written (0 = no HTML).
+    Raises TimeoutError if `deadline` (time.monotonic()) passes while the
+    chunks are still being fetched.
+    """
+    # Skip anything before the chunk result set (INSERT ... EXEC row counts)
+    while cursor.description is None:
+        if not cursor.nextset():
+            return 0
+
+    decoder = codecs.getincrementaldecoder('utf-16-le')()
+    html_length = 0
+    with _open_output(path, compress) as out:
+        while True:
+            _remaining_timeout(deadline)
+            rows = cursor.fetchmany(FETCH_ROWS)
+            if not rows:
+                break
+            for row in rows:
+                text = decoder.decode(bytes(row[0]))
+                html_length += len(text)
+                out.write(text)
+        text = decoder.decode(b'', final=True)
+        html_length += len(text)
+        out.write(text)
+    return html_length
+
+
+def _open_output(path, compress):
+    if compress:
+        return gzip.open(path, 'wt', encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
 if __name__ == '__main__':
     # Default configuration
     SERVER = 'sqltest.schoolvision.net,14333'
@@ -108,37 +534,84 @@ if __name__ == '__main__':
     PASSWORD = 'Gv51076!'
     OUTPUT_DIR = '/mnt/e/Downloads/sql_monitor/reports'
 
-    # Parse command line arguments
-    if len(sys.argv) > 1:
-        SERVER = sys.argv[1]
-    if len(sys.argv) > 2:
-        USER = sys.argv[2]
-    if len(sys.argv) > 3:
-        PASSWORD = sys.argv[3]
+    parser = argparse.ArgumentParser(description="SQL Server Health Report Generator")
+    parser.add_argument('server', nargs='?', default=SERVER)
+    parser.add_argument('user', nargs='?', default=USER)
+    parser.add_argument('password', nargs='?', default=PASSWORD)
+    parser.add_argument('--gzip', action='store_true',
+                        help="write gzip-compressed reports (.html.gz)")
+    parser.add_argument('--fleet', metavar='SERVERS_FILE',
+                        help="generate reports for every server in the list "
+                             "('address' or 'name address' per line)")
+    parser.add_argument('--parallel', type=int, default=4,
+                        help="fleet mode: concurrent servers (default 4)")
+    parser.add_argument('--timeout', type=int, default=None,
+                        help="time budget per server in seconds for its logins and "
+                             "queries (default 600 in fleet mode, none otherwise; 0 = none)")
+    parser.add_argument('--render', choices=('local', 'server'), default='local',
+                        help="format the report here from the section queries "
+                             "(default) or on the server with DBA_DailyHealthOverview_HTML")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="re-query every section instead of reusing unchanged ones")
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    args = parser.parse_args()
 
-    # Generate timestamp filename
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    output_file = os.path.join(OUTPUT_DIR, f'health_report_{timestamp}.html')
+    OUTPUT_DIR = args.output_dir
+    COMPRESS = args.gzip
 
     # Ensure output directory exists
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+    if args.fleet:
+        servers = read_server_list(args.fleet)
+
+        print("=" * 50)
+        print("SQL Server Fleet Health Report Generator")
+        print("=" * 50)
+        print(f"Servers: {len(servers)} ({args.parallel} in parallel)")
+        print(f"Output: {OUTPUT_DIR}")
+        print("")
+
+        results, index_file = export_fleet_reports(
+            servers, args.user, args.password, OUTPUT_DIR,
+            max_parallel=args.parallel,
+            timeout=600 if args.timeout is None else args.timeout,
+            compress=COMPRESS, render=args.render, cache=not args.no_cache)
+
+        failed = [r['name'] for r in results if r['error'] is not None]
+        print(f"\n{len(results) - len(failed)} of {len(results)} reports generated")
+        print(f"Index: file://{index_file}")
+        if failed:
+            print(f"Failed: {', '.join(failed)}")
+            sys.exit(1)
+        sys.exit(0)
+
+    # Generate timestamp filename
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    output_file = os.path.join(OUTPUT_DIR, f'health_report_{timestamp}.html')
+    if COMPRESS:
+        output_file += '.gz'
+
     print("=" * 50)
     print("SQL Server Health Report Generator")
     print("=" * 50)
-    print(f"Server: {SERVER}")
+    print(f"Server: {args.server}")
     print(f"Output: {output_file}")
     print("")
 
     # Export report
     success = export_html_report(
-        server=SERVER,
-        user=USER,
-        password=PASSWORD,
+        server=args.server,
+        user=args.user,
+        password=args.password,
         output_file=output_file,
         top_queries=20,
         top_indexes=20,
-        hours_back=48
+        hours_back=48,
+        compress=COMPRESS,
+        query_timeout=args.timeout or 0,
+        render=args.render,
+        cache=not args.no_cache
     )
 
     if success:
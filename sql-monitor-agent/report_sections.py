@@ -0,0 +1,528 @@
+#!/usr/bin/env python3
+"""
+Client-side rendering of the SQL Server Health Report
+
+Python port of DBA_DailyHealthOverview_HTML (15_create_html_formatter.sql):
+each report section is one small query against the DBATools snapshot
+tables plus a template that renders its rows, so the HTML formatting no
+longer runs on the monitored server.
+
+Every section also has a version: values from VERSION_SQL that change
+whenever the section's source data changes (latest snapshot run, its row
+count in the section's table, the runs inside the lookback window).
+export_html_report caches rendered sections by version and only re-queries
+the sections whose version moved since the last run.
+"""
+
+import html
+import re
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from string import Template
+
+# Bump when a template changes so cached sections are re-rendered
+RENDER_VERSION = 1
+
+# One round trip: latest run plus what each section's version depends on
+VERSION_SQL = """
+SET NOCOUNT ON
+DECLARE @RunID BIGINT = (SELECT MAX(PerfSnapshotRunID) FROM dbo.PerfSnapshotRun)
+DECLARE @HoursBack INT = ?
+
+SELECT
+    @RunID AS LatestRunID,
+    (SELECT COUNT(*) FROM dbo.PerfSnapshotQueryStats WHERE PerfSnapshotRunID = @RunID) AS QueryStatsRows,
+    (SELECT COUNT(*) FROM dbo.PerfSnapshotMissingIndexes WHERE PerfSnapshotRunID = @RunID) AS MissingIndexRows,
+    (SELECT COUNT(*) FROM dbo.PerfSnapshotDB WHERE PerfSnapshotRunID = @RunID) AS DatabaseRows,
+    (SELECT COUNT(*) FROM dbo.PerfSnapshotErrorLog WHERE PerfSnapshotRunID = @RunID) AS ErrorLogRows,
+    w.WindowFirstRunID,
+    w.WindowRuns
+FROM (
+    SELECT MIN(PerfSnapshotRunID) AS WindowFirstRunID, COUNT(*) AS WindowRuns
+    FROM dbo.PerfSnapshotRun
+    WHERE SnapshotUTC >= DATEADD(HOUR, -@HoursBack, SYSUTCDATETIME())
+) w
+"""
+
+NULL_HTML = '<span class="null-value">NULL</span>'
+
+# Characters fn_CleanTextForXML strips (control characters except tab/CR/LF)
+_CONTROL_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _text(value, null=NULL_HTML):
+    if value is None:
+        return null
+    return html.escape(_CONTROL_CHARS.sub('', str(value)))
+
+
+def _number(value, places):
+    """FORMAT(value, 'N<places>'): grouped, rounded half away from zero."""
+    if value is None:
+        return NULL_HTML
+    value = Decimal(str(value)).quantize(Decimal(1).scaleb(-places), ROUND_HALF_UP)
+    return f'{value:,.{places}f}'
+
+
+def _n0(value):
+    return _number(value, 0)
+
+
+def _n2(value):
+    return _number(value, 2)
+
+
+def _int(value):
+    return NULL_HTML if value is None else str(value)
+
+
+def _utc(value):
+    if value is None:
+        return NULL_HTML
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return _text(value)
+
+
+SECTION_TEMPLATE = Template('''<div class="section">
+    <div class="section-header">$title</div>
+    <table>
+        <tr>$headings</tr>
+$rows
+    </table></div>
+''')
+
+PAGE_HEADER_TEMPLATE = Template('''<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>SQL Server Health Report - $server</title>
+    <style>
+        body {
+            font-family: "Segoe UI", Arial, sans-serif;
+            margin: 20px;
+            background-color: #f5f5f5;
+            color: #333;
+        }
+        .header {
+            background-color: #0078d4;
+            color: white;
+            padding: 20px;
+            border-radius: 5px;
+            margin-bottom: 20px;
+        }
+        .header h1 {
+            margin: 0 0 10px 0;
+            font-size: 24px;
+        }
+        .header p {
+            margin: 5px 0;
+            font-size: 14px;
+        }
+        .section {
+            background-color: white;
+            margin-bottom: 20px;
+            border-radius: 5px;
+            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+            overflow: hidden;
+        }
+        .section-header {
+            background-color: #e8e8e8;
+            padding: 12px 15px;
+            font-weight: bold;
+            font-size: 16px;
+            border-bottom: 2px solid #ccc;
+        }
+        table {
+            width: 100%;
+            border-collapse: collapse;
+        }
+        th {
+            background-color: #f0f0f0;
+            padding: 10px;
+            text-align: left;
+            font-weight: 600;
+            font-size: 13px;
+            border-bottom: 2px solid #ddd;
+        }
+        td {
+            padding: 8px 10px;
+            border-bottom: 1px solid #eee;
+            font-size: 13px;
+        }
+        tr:hover {
+            background-color: #fafafa;
+        }
+        .severity-INFO {
+            background-color: #e7f3ff;
+            border-left: 4px solid #0078d4;
+        }
+        .severity-ATTENTION {
+            background-color: #fff8e1;
+            border-left: 4px solid #ffc107;
+        }
+        .severity-WARNING {
+            background-color: #fff3e0;
+            border-left: 4px solid #ff9800;
+        }
+        .severity-CRITICAL {
+            background-color: #ffebee;
+            border-left: 4px solid #f44336;
+        }
+        .metric-value {
+            font-weight: 600;
+            color: #0078d4;
+        }
+        .null-value {
+            color: #999;
+            font-style: italic;
+        }
+        .db-group-header {
+            background-color: #e8e8e8;
+            font-weight: bold;
+            border-top: 2px solid #0078d4;
+        }
+        .footer {
+            text-align: center;
+            padding: 20px;
+            color: #666;
+            font-size: 12px;
+        }
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h1>SQL Server Daily Health Report</h1>
+        <p><strong>Server:</strong> $server</p>
+        <p><strong>Report Generated:</strong> $report_date</p>
+        <p><strong>Parameters:</strong> Top $top_queries Slow Queries, Top $top_indexes Missing Indexes, $hours_back hours lookback</p>
+    </div>
+''')
+
+PAGE_FOOTER = '''
+    <div class="footer">
+        <p>Generated by export_html_report.py from DBATools snapshot tables</p>
+        <p>SQL Server Health Monitoring System</p>
+    </div>
+</body>
+</html>'''
+
+
+def render_section(title, headings, rows):
+    return SECTION_TEMPLATE.substitute(
+        title=title,
+        headings=''.join(f'<th>{h}</th>' for h in headings),
+        rows='\n'.join(rows))
+
+
+def render_page_header(server, top_queries, top_indexes, hours_back):
+    return PAGE_HEADER_TEMPLATE.substitute(
+        server=_text(server),
+        report_date=datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S') + ' UTC',
+        top_queries=int(top_queries), top_indexes=int(top_indexes),
+        hours_back=int(hours_back))
+
+
+class Section:
+    """
+    One report section.
+
+    sql/params: the query and its parameters (a function of the report
+    options and the VERSION_SQL row). version: the values that identify the
+    section's source data. render: rows (dicts) and options -> HTML, or ''
+    to leave the section out.
+    """
+
+    def __init__(self, name, sql, params, version, render):
+        self.name = name
+        self.sql = sql
+        self.params = params
+        self.version = version
+        self.render = render
+
+
+# ---------------------------------------------------------------------------
+# Report Header / Current System Health: latest PerfSnapshotRun row
+# ---------------------------------------------------------------------------
+
+LATEST_RUN_SQL = """
+SELECT ServerName, SnapshotUTC, SqlVersion, SessionsCount, RequestsCount,
+       CpuSignalWaitPct, BlockingSessionCount, DeadlockCountRecent,
+       MemoryGrantWarningCount, TopWaitType, TopWaitMsPerSec
+FROM dbo.PerfSnapshotRun
+WHERE PerfSnapshotRunID = ?
+"""
+
+
+def _render_report_header(rows, options):
+    rows = [
+        '<tr><td>Server Name</td><td>' + _text(r['ServerName']) + '</td></tr>'
+        '<tr><td>Snapshot Date (UTC)</td><td>' + _utc(r['SnapshotUTC']) + '</td></tr>'
+        '<tr><td>SQL Version</td><td>' + _text(r['SqlVersion']) + '</td></tr>'
+        '<tr><td>Total Sessions</td><td class="metric-value">' + _int(r['SessionsCount']) + '</td></tr>'
+        '<tr><td>Total Requests</td><td class="metric-value">' + _int(r['RequestsCount']) + '</td></tr>'
+        for r in rows
+    ]
+    return render_section('Report Header', ['Field', 'Value'], rows)
+
+
+CPU_THRESHOLDS = ((40, 'CRITICAL', 'CRITICAL - High CPU pressure'),
+                  (20, 'WARNING', 'WARNING - Elevated CPU usage'),
+                  (10, 'ATTENTION', 'ATTENTION - Moderate CPU usage'))
+BLOCKING_THRESHOLDS = ((30, 'CRITICAL', 'CRITICAL - Severe blocking'),
+                       (15, 'WARNING', 'WARNING - High blocking'),
+                       (5, 'ATTENTION', 'ATTENTION - Moderate blocking'))
+DEADLOCK_THRESHOLDS = ((5, 'CRITICAL', 'CRITICAL - Frequent deadlocks'),
+                       (1, 'WARNING', 'WARNING - Deadlocks detected'),
+                       (None, 'INFO', 'INFO - None detected'))
+MEMORY_GRANT_THRESHOLDS = ((10, 'CRITICAL', 'CRITICAL - Frequent spills'),
+                           (1, 'WARNING', 'WARNING - Memory spills detected'),
+                           (None, 'INFO', 'INFO - None detected'))
+
+
+def _health_row(label, value, display, thresholds):
+    level, message = 'INFO', 'INFO - Normal'
+    for limit, lvl, msg in thresholds:
+        if limit is None:
+            message = msg
+        elif value is not None and value >= limit:
+            level, message = lvl, msg
+            break
+    return (f'<tr class="severity-{level}"><td>{label}</td>'
+            f'<td class="metric-value">{display}</td><td>{message}</td></tr>')
+
+
+def _render_current_health(rows, options):
+    out = []
+    for r in rows:
+        cpu = r['CpuSignalWaitPct']
+        out.append(_health_row('CPU Signal Wait %', cpu,
+                               (_int(cpu) + '%'), CPU_THRESHOLDS))
+        out.append(_health_row('Blocking Sessions', r['BlockingSessionCount'],
+                               _int(r['BlockingSessionCount']), BLOCKING_THRESHOLDS))
+        out.append(_health_row('Recent Deadlocks (last 10 min)', r['DeadlockCountRecent'],
+                               _int(r['DeadlockCountRecent']), DEADLOCK_THRESHOLDS))
+        out.append(_health_row('Memory Grant Warnings', r['MemoryGrantWarningCount'],
+                               _int(r['MemoryGrantWarningCount']), MEMORY_GRANT_THRESHOLDS))
+        out.append('<tr><td>Top Wait Type</td><td class="metric-value">'
+                   + _text(r['TopWaitType']) + '</td><td>'
+                   + _int(r['TopWaitMsPerSec']) + ' ms/sec</td></tr>')
+    return render_section('Current System Health', ['Metric', 'Value', 'Status'], out)
+
+
+# ---------------------------------------------------------------------------
+# Summary Statistics: runs inside the lookback window
+# ---------------------------------------------------------------------------
+
+SUMMARY_STATS_SQL = """
+SELECT
+    COUNT(*) AS TotalSnapshots,
+    AVG(CpuSignalWaitPct) AS AvgCpuSignalWaitPct,
+    MAX(CpuSignalWaitPct) AS MaxCpuSignalWaitPct,
+    SUM(DeadlockCountRecent) AS TotalDeadlocks,
+    SUM(CASE WHEN BlockingSessionCount > 0 THEN 1 ELSE 0 END) AS SnapshotsWithBlocking,
+    AVG(SessionsCount) AS AvgSessions,
+    MAX(SessionsCount) AS MaxSessions
+FROM dbo.PerfSnapshotRun
+WHERE SnapshotUTC >= DATEADD(HOUR, -?, SYSUTCDATETIME())
+"""
+
+
+def _render_summary_stats(rows, options):
+    out = []
+    for r in rows:
+        out += [
+            '<tr><td>Total Snapshots</td><td class="metric-value">' + _n0(r['TotalSnapshots']) + '</td></tr>',
+            '<tr><td>Avg CPU Signal Wait %</td><td class="metric-value">' + _n2(r['AvgCpuSignalWaitPct']) + '%</td></tr>',
+            '<tr><td>Max CPU Signal Wait %</td><td class="metric-value">' + _n2(r['MaxCpuSignalWaitPct']) + '%</td></tr>',
+            '<tr><td>Total Deadlocks</td><td class="metric-value">' + _int(r['TotalDeadlocks']) + '</td></tr>',
+            '<tr><td>Snapshots with Blocking</td><td class="metric-value">' + _int(r['SnapshotsWithBlocking']) + '</td></tr>',
+            '<tr><td>Avg Sessions</td><td class="metric-value">' + _n0(r['AvgSessions']) + '</td></tr>',
+            '<tr><td>Max Sessions</td><td class="metric-value">' + _int(r['MaxSessions']) + '</td></tr>',
+        ]
+    title = f"Summary Statistics (Last {int(options['hours_back'])} Hours)"
+    return render_section(title, ['Metric', 'Value'], out)
+
+
+# ---------------------------------------------------------------------------
+# Slow Queries: top 10 per database by total CPU
+# ---------------------------------------------------------------------------
+
+SLOW_QUERIES_SQL = """
+SELECT DatabaseName, SqlText, TotalCpuMs, AvgElapsedMs, ExecutionCount, AvgLogicalReads, RowNum
+FROM (
+    SELECT
+        DatabaseName,
+        LEFT(SqlText, 101) AS SqlText,
+        TotalCpuMs,
+        AvgElapsedMs,
+        ExecutionCount,
+        AvgLogicalReads,
+        ROW_NUMBER() OVER (PARTITION BY DatabaseName ORDER BY TotalCpuMs DESC) AS RowNum
+    FROM dbo.PerfSnapshotQueryStats
+    WHERE PerfSnapshotRunID = ?
+) q
+WHERE RowNum <= 10
+ORDER BY DatabaseName, RowNum
+"""
+
+
+def _render_slow_queries(rows, options):
+    if not rows:
+        return ''
+    out = []
+    for r in rows:
+        database = _text(r['DatabaseName'])
+        if r['RowNum'] == 1:
+            out.append('<tr class="db-group-header"><td colspan="7" style="padding: 8px 10px;">'
+                       '📊 Database: ' + _text(r['DatabaseName'], 'NULL') + '</td></tr>')
+        sql_text = r['SqlText']
+        if sql_text is not None:
+            sql_text = _CONTROL_CHARS.sub('', sql_text)
+            sql_text = html.escape(sql_text[:100]) + ('...' if len(sql_text) > 100 else '')
+        else:
+            sql_text = NULL_HTML
+        out.append(
+            '<tr>'
+            f"<td>{r['RowNum']}</td>"
+            f'<td style="font-weight: bold;">{database}</td>'
+            f'<td style="font-family: monospace; font-size: 11px;">{sql_text}</td>'
+            f"<td class=\"metric-value\">{_n0(r['TotalCpuMs'])}</td>"
+            f"<td class=\"metric-value\">{_n2(r['AvgElapsedMs'])}</td>"
+            f"<td>{_n0(r['ExecutionCount'])}</td>"
+            f"<td>{_n0(r['AvgLogicalReads'])}</td>"
+            '</tr>')
+    return render_section('Top 10 Slow Queries per Database (by Total CPU)',
+                          ['Rank', 'Database', 'SQL Text', 'Total CPU (ms)',
+                           'Avg Duration (ms)', 'Execution Count', 'Avg Reads'], out)
+
+
+# ---------------------------------------------------------------------------
+# Missing Indexes: top N by impact score
+# ---------------------------------------------------------------------------
+
+MISSING_INDEXES_SQL = """
+SELECT TOP (?)
+    DatabaseName, ObjectName, EqualityColumns, InequalityColumns, IncludedColumns,
+    AvgUserImpact, UserSeeks, ImpactScore
+FROM dbo.PerfSnapshotMissingIndexes
+WHERE PerfSnapshotRunID = ?
+ORDER BY ImpactScore DESC
+"""
+
+
+def _render_missing_indexes(rows, options):
+    if not rows:
+        return ''
+    mono = '<td style="font-family: monospace; font-size: 11px;">'
+    dash = '<span class="null-value">-</span>'
+    out = []
+    for i, r in enumerate(rows, 1):
+        out.append(
+            '<tr>'
+            f'<td>{i}</td>'
+            f"<td>{_text(r['DatabaseName'])}</td>"
+            f"{mono}{_text(r['ObjectName'])}</td>"
+            f"{mono}{_text(r['EqualityColumns'], dash)}</td>"
+            f"{mono}{_text(r['InequalityColumns'], dash)}</td>"
+            f"{mono}{_text(r['IncludedColumns'], dash)}</td>"
+            f"<td class=\"metric-value\">{_n2(r['AvgUserImpact'])}%</td>"
+            f"<td>{_n0(r['UserSeeks'])}</td>"
+            f"<td class=\"metric-value\">{_n0(r['ImpactScore'])}</td>"
+            '</tr>')
+    return render_section(f"Top {int(options['top_indexes'])} Missing Indexes",
+                          ['#', 'Database', 'Table', 'Equality Columns',
+                           'Inequality Columns', 'Included Columns', 'Avg Impact',
+                           'User Seeks', 'Impact Score'], out)
+
+
+# ---------------------------------------------------------------------------
+# Database Sizes
+# ---------------------------------------------------------------------------
+
+DATABASE_SIZES_SQL = """
+SELECT DatabaseName, StateDesc, RecoveryModelDesc, TotalDataMB, TotalLogMB, LogReuseWaitDesc
+FROM dbo.PerfSnapshotDB
+WHERE PerfSnapshotRunID = ?
+ORDER BY (TotalDataMB + TotalLogMB) DESC
+"""
+
+
+def _render_database_sizes(rows, options):
+    out = []
+    for r in rows:
+        data, log = r['TotalDataMB'], r['TotalLogMB']
+        total = None if data is None or log is None else data + log
+        out.append(
+            '<tr>'
+            f"<td>{_text(r['DatabaseName'])}</td>"
+            f"<td>{_text(r['StateDesc'])}</td>"
+            f"<td>{_text(r['RecoveryModelDesc'])}</td>"
+            f'<td class="metric-value">{_n0(data)}</td>'
+            f'<td class="metric-value">{_n0(log)}</td>'
+            f'<td class="metric-value">{_n0(total)}</td>'
+            f"<td style=\"font-size: 11px;\">{_text(r['LogReuseWaitDesc'])}</td>"
+            '</tr>')
+    return render_section('Database Sizes',
+                          ['Database', 'State', 'Recovery Model', 'Data Size (MB)',
+                           'Log Size (MB)', 'Total Size (MB)', 'Log Reuse Wait'], out)
+
+
+# ---------------------------------------------------------------------------
+# Recent Error Log
+# ---------------------------------------------------------------------------
+
+ERROR_LOG_SQL = """
+SELECT LogDateUTC, ProcessInfo, LogText
+FROM dbo.PerfSnapshotErrorLog
+WHERE PerfSnapshotRunID = ?
+ORDER BY LogDateUTC DESC
+"""
+
+
+def _render_error_log(rows, options):
+    if not rows:
+        return ''
+    out = [
+        '<tr>'
+        f"<td style=\"white-space: nowrap;\">{_utc(r['LogDateUTC'])}</td>"
+        f"<td>{_text(r['ProcessInfo'])}</td>"
+        f"<td style=\"font-size: 11px;\">{_text(r['LogText'])}</td>"
+        '</tr>'
+        for r in rows
+    ]
+    return render_section('Recent Error Log Entries (Last 20)',
+                          ['Date/Time (UTC)', 'Process', 'Message'], out)
+
+
+def _run_id(options, v):
+    return (v['LatestRunID'],)
+
+
+# Report order, as in DBA_DailyHealthOverview_HTML
+SECTIONS = (
+    Section('report_header', LATEST_RUN_SQL, _run_id,
+            lambda o, v: [v['LatestRunID']],
+            _render_report_header),
+    Section('current_health', LATEST_RUN_SQL, _run_id,
+            lambda o, v: [v['LatestRunID']],
+            _render_current_health),
+    Section('summary_stats', SUMMARY_STATS_SQL,
+            lambda o, v: (int(o['hours_back']),),
+            lambda o, v: [int(o['hours_back']), v['WindowFirstRunID'], v['WindowRuns']],
+            _render_summary_stats),
+    Section('slow_queries', SLOW_QUERIES_SQL, _run_id,
+            lambda o, v: [v['LatestRunID'], v['QueryStatsRows']],
+            _render_slow_queries),
+    Section('missing_indexes', MISSING_INDEXES_SQL,
+            lambda o, v: (int(o['top_indexes']), v['LatestRunID']),
+            lambda o, v: [v['LatestRunID'], v['MissingIndexRows'], int(o['top_indexes'])],
+            _render_missing_indexes),
+    Section('database_sizes', DATABASE_SIZES_SQL, _run_id,
+            lambda o, v: [v['LatestRunID'], v['DatabaseRows']],
+            _render_database_sizes),
+    Section('error_log', ERROR_LOG_SQL, _run_id,
+            lambda o, v: [v['LatestRunID'], v['ErrorLogRows']],
+            _render_error_log),
+)
@@ -119,6 +119,13 @@ def dashboard_queries(dashboards):
 
     return all_queries
 
+def pytest_addoption(parser):
+    parser.addoption(
+        "--compile-only", action="store_true", default=False,
+        help="compile dashboard queries (SHOWPLAN_XML / sp_describe_first_result_set) "
+             "instead of executing them; records each query's estimated cost"
+    )
+
 def pytest_generate_tests(metafunc):
     """Generate parameterized tests for each dashboard query"""
     if "dashboard_query" in metafunc.fixturenames:
@@ -153,15 +160,21 @@ def pytest_generate_tests(metafunc):
         )
 
 @pytest.fixture
-def query_executor(db_connection, test_config):
+def query_executor(db_connection, test_config, request):
     """Execute SQL queries with retry logic"""
+    from sql_compile_check import compile_query
+
     class QueryExecutor:
-        def __init__(self, connection, config):
+        def __init__(self, connection, config, compile_only):
             self.connection = connection
             self.retry_enabled = config['retry']['enabled']
             self.max_attempts = config['retry']['max_attempts']
             self.delay = config['retry']['delay_seconds']
             self.timeout = config['query_timeout']
+            self.compile_only = compile_only
+            # Set by execute() in compile-only mode
+            self.last_estimated_cost = None
+            self.last_compile_warning = None
 
         def execute(self, query: str) -> Tuple[bool, int, str]:
             """Execute query and return (success, row_count, error)"""
@@ -172,6 +185,13 @@ def query_executor(db_connection, test_config):
             # Replace Grafana macros with actual SQL
             query = self._replace_grafana_macros(query)
 
+            if self.compile_only:
+                # Compile errors are not transient, so no retries
+                compiled = compile_query(self.connection, query)
+                self.last_estimated_cost = compiled.estimated_cost
+                self.last_compile_warning = compiled.warning
+                return (compiled.success, 0, compiled.error)
+
             attempts = 0
             last_error = None
 
@@ -277,4 +297,6 @@ def query_executor(db_connection, test_config):
 
             return query
 
-    return QueryExecutor(db_connection, test_config)
+    compile_only = (request.config.getoption("--compile-only")
+                    or test_config.get('compile_only', False))
+    return QueryExecutor(db_connection, test_config, compile_only)
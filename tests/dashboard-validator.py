@@ -4,16 +4,22 @@ Dashboard E2E Validator
 Tests all Grafana dashboards by executing their SQL queries and reporting missing data/stored procedures
 """
 
+import argparse
 import json
 import os
+import queue
 import sys
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Tuple
 import pymssql
 from dataclasses import dataclass
 from collections import defaultdict
 
+from sql_compile_check import compile_query
+
 @dataclass
 class QueryResult:
     """Result of a query test"""
@@ -23,6 +29,10 @@ class QueryResult:
     error: str = None
     row_count: int = 0
     missing_objects: List[str] = None
+    estimated_cost: float = None     # compile-only mode
+    columns: List[Tuple[str, str]] = None
+    verified: bool = True
+    warning: str = None
 
 @dataclass
 class DashboardReport:
@@ -37,35 +47,103 @@ class DashboardReport:
     query_results: List[QueryResult]
 
 class DashboardValidator:
-    """Validates Grafana dashboards against SQL Server"""
+    """Validates Grafana dashboards against SQL Server
+
+    With pool_size > 1, queries run concurrently on a pool of that many
+    connections; reports and their query results keep dashboard/panel order.
+    query_timeout is the per-query timeout in seconds.
+
+    With compile_only, queries are compiled (SHOWPLAN_XML and
+    sp_describe_first_result_set) instead of executed, and each result
+    records the query's estimated cost and output columns.
+    """
 
-    def __init__(self, server: str, database: str, user: str, password: str):
+    def __init__(self, server: str, database: str, user: str, password: str,
+                 pool_size: int = 1, query_timeout: int = 30,
+                 compile_only: bool = False):
         self.server = server
         self.database = database
         self.user = user
         self.password = password
+        self.pool_size = max(1, pool_size)
+        self.query_timeout = query_timeout
+        self.compile_only = compile_only
         self.connection = None
+        self._pool = queue.Queue()
+        self._pool_connections = []
+
+    def _open_connection(self):
+        return pymssql.connect(
+            server=self.server,
+            database=self.database,
+            user=self.user,
+            password=self.password,
+            login_timeout=30,
+            timeout=self.query_timeout
+        )
 
     def connect(self):
-        """Connect to SQL Server"""
+        """Connect to SQL Server (pool_size connections)"""
         try:
-            self.connection = pymssql.connect(
-                server=self.server,
-                database=self.database,
-                user=self.user,
-                password=self.password,
-                timeout=30
-            )
-            print(f"✅ Connected to {self.server}/{self.database}")
+            self.connection = self._open_connection()
+            self._pool_connections = [self.connection]
+            for _ in range(self.pool_size - 1):
+                self._pool_connections.append(self._open_connection())
+            for connection in self._pool_connections:
+                self._pool.put(connection)
+            pool_info = f" ({self.pool_size} connections)" if self.pool_size > 1 else ""
+            print(f"✅ Connected to {self.server}/{self.database}{pool_info}")
             return True
         except Exception as e:
             print(f"❌ Failed to connect to database: {e}")
+            self.close()
             return False
 
     def close(self):
-        """Close database connection"""
-        if self.connection:
-            self.connection.close()
+        """Close database connections"""
+        for connection in self._pool_connections:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        self._pool_connections = []
+        self._pool = queue.Queue()
+        self.connection = None
+
+    def _test_pooled_query(self, panel_title: str, query: str) -> QueryResult:
+        """Test a query on a connection borrowed from the pool"""
+        connection = self._pool.get()
+        try:
+            result = self.test_query(panel_title, query, connection)
+            if not result.success and self._connection_broken(result.error):
+                # A timed-out or dropped connection is replaced so the
+                # following queries do not fail with it
+                connection = self._replace_connection(connection)
+            return result
+        finally:
+            self._pool.put(connection)
+
+    @staticmethod
+    def _connection_broken(error: str) -> bool:
+        error = error.lower()
+        return ('timeout' in error or 'timed out' in error
+                or 'dbprocess is dead' in error or 'not connected' in error)
+
+    def _replace_connection(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        try:
+            replacement = self._open_connection()
+        except Exception as e:
+            print(f"   ⚠️  Could not reopen pooled connection: {e}")
+            return connection
+        index = self._pool_connections.index(connection)
+        self._pool_connections[index] = replacement
+        if connection is self.connection:
+            self.connection = replacement
+        return replacement
 
     def extract_queries_from_dashboard(self, dashboard_path: str) -> Tuple[str, str, List[Tuple[str, str]]]:
         """Extract all SQL queries from a dashboard JSON file"""
@@ -117,10 +195,12 @@ class DashboardValidator:
 
         return missing
 
-    def test_query(self, panel_title: str, query: str) -> QueryResult:
-        """Test a single SQL query"""
+    def test_query(self, panel_title: str, query: str, connection=None) -> QueryResult:
+        """Test a single SQL query (on `connection`, default self.connection)"""
+        if self.compile_only:
+            return self.compile_test_query(panel_title, query, connection)
         try:
-            cursor = self.connection.cursor()
+            cursor = (connection or self.connection).cursor()
             cursor.execute(query)
 
             # Try to fetch results
@@ -151,21 +231,45 @@ class DashboardValidator:
                 missing_objects=missing_objects
             )
 
+    def compile_test_query(self, panel_title: str, query: str, connection=None) -> QueryResult:
+        """Validate a single SQL query without executing it"""
+        compiled = compile_query(connection or self.connection, query)
+        return QueryResult(
+            panel_title=panel_title,
+            query=query[:200],
+            success=compiled.success,
+            error=compiled.error,
+            missing_objects=self.identify_missing_objects(compiled.error) if compiled.error else None,
+            estimated_cost=compiled.estimated_cost,
+            columns=compiled.columns,
+            verified=compiled.verified,
+            warning=compiled.warning
+        )
+
     def validate_dashboard(self, dashboard_path: str) -> DashboardReport:
         """Validate all queries in a dashboard"""
         dashboard_name, dashboard_title, queries = self.extract_queries_from_dashboard(dashboard_path)
-
+        query_results = self._run_queries(queries)
+        return self._build_report(dashboard_name, dashboard_title, queries, query_results)
+
+    def _run_queries(self, queries: List[Tuple[str, str]]) -> List[QueryResult]:
+        """Test (panel_title, query) pairs; results are in input order"""
+        if self.pool_size == 1:
+            return [self.test_query(panel_title, query) for panel_title, query in queries]
+        with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+            return list(executor.map(lambda q: self._test_pooled_query(*q), queries))
+
+    def _build_report(self, dashboard_name: str, dashboard_title: str,
+                      queries: List[Tuple[str, str]],
+                      query_results: List[QueryResult]) -> DashboardReport:
+        """Summarize a dashboard's query results"""
         print(f"\n📊 Testing: {dashboard_title} ({len(queries)} queries)")
         print(f"   File: {dashboard_name}.json")
 
-        query_results = []
         missing_tables = set()
         missing_procedures = set()
 
-        for panel_title, query in queries:
-            result = self.test_query(panel_title, query)
-            query_results.append(result)
-
+        for result in query_results:
             if not result.success:
                 if result.missing_objects:
                     for obj in result.missing_objects:
@@ -210,11 +314,24 @@ class DashboardValidator:
         print(f"{'='*80}")
         print(f"Found {len(dashboard_files)} dashboards to validate")
 
-        reports = []
-        for dashboard_file in dashboard_files:
-            report = self.validate_dashboard(str(dashboard_file))
-            reports.append(report)
+        # Queries of all dashboards go through one pool so a slow dashboard
+        # does not leave connections idle; results are regrouped in order
+        dashboards = [self.extract_queries_from_dashboard(str(f)) for f in dashboard_files]
+        all_queries = [q for _, _, queries in dashboards for q in queries]
 
+        started = time.monotonic()
+        all_results = self._run_queries(all_queries)
+        elapsed = time.monotonic() - started
+
+        reports = []
+        position = 0
+        for dashboard_name, dashboard_title, queries in dashboards:
+            query_results = all_results[position:position + len(queries)]
+            position += len(queries)
+            reports.append(self._build_report(dashboard_name, dashboard_title, queries, query_results))
+
+        print(f"\n⏱️  {len(all_queries)} queries in {elapsed:.1f}s "
+              f"({self.pool_size} connection{'s' if self.pool_size > 1 else ''})")
         return reports
 
     def print_summary(self, reports: List[DashboardReport]):
@@ -253,6 +370,24 @@ class DashboardValidator:
                 print(f"   - {proc} (used in {count} dashboard{'s' if count > 1 else ''})")
             print()
 
+        if self.compile_only:
+            results = [(r.dashboard_title, q) for r in reports for q in r.query_results]
+            unverified = [q for _, q in results if not q.verified]
+            costed = sorted((q.estimated_cost, title, q.panel_title) for title, q in results
+                            if q.estimated_cost is not None)
+            if unverified:
+                print(f"ℹ️  {len(unverified)} queries use temp tables and could not be compiled without running them")
+            warned = [(title, q) for title, q in results if q.warning]
+            if warned:
+                print(f"⚠️  {len(warned)} queries compiled but have no estimated cost:")
+                for title, q in warned:
+                    print(f"   - {title} / {q.panel_title}: {q.warning}")
+            if costed:
+                print(f"💰 MOST EXPENSIVE QUERIES (estimated cost):")
+                for cost, title, panel in reversed(costed[-10:]):
+                    print(f"   - {cost:,.2f}  {title} / {panel}")
+                print()
+
         # Dashboards fully working
         fully_working = [r for r in reports if r.failed_queries == 0 and r.total_panels > 0]
         if fully_working:
@@ -330,6 +465,14 @@ class DashboardValidator:
                     for result in failed_results:
                         f.write(f"- **{result.panel_title}**: {result.error[:100]}\n")
 
+                # Estimated costs (compile-only mode)
+                costed = [r for r in report.query_results if r.estimated_cost is not None]
+                if costed:
+                    f.write("\n**Estimated Cost**:\n\n")
+                    for result in sorted(costed, key=lambda r: r.estimated_cost, reverse=True):
+                        columns = f" ({len(result.columns)} columns)" if result.columns is not None else ""
+                        f.write(f"- **{result.panel_title}**: {result.estimated_cost:,.4f}{columns}\n")
+
                 f.write("\n")
 
         print(f"\n📝 Detailed report written to: {output_file}")
@@ -343,8 +486,20 @@ def main():
     DASHBOARDS_DIR = "/mnt/d/Dev2/sql-monitor/dashboards/grafana/dashboards"
     REPORT_FILE = "/mnt/d/Dev2/sql-monitor/tests/dashboard-validation-report.md"
 
+    parser = argparse.ArgumentParser(description="Validate Grafana dashboard queries")
+    parser.add_argument("--pool", type=int, default=1,
+                        help="number of connections to run queries on concurrently (default 1)")
+    parser.add_argument("--timeout", type=int, default=30,
+                        help="per-query timeout in seconds (default 30)")
+    parser.add_argument("--compile-only", action="store_true",
+                        help="compile queries (SHOWPLAN_XML / sp_describe_first_result_set) "
+                             "instead of executing them, and report estimated costs")
+    args = parser.parse_args()
+
     # Validate
-    validator = DashboardValidator(SERVER, DATABASE, USER, PASSWORD)
+    validator = DashboardValidator(SERVER, DATABASE, USER, PASSWORD,
+                                   pool_size=args.pool, query_timeout=args.timeout,
+                                   compile_only=args.compile_only)
 
     if not validator.connect():
         sys.exit(1)
@@ -0,0 +1,133 @@
+"""
+Compile-only validation of dashboard SQL
+
+Checks that a query compiles against the database without executing it:
+SET SHOWPLAN_XML ON compiles the batch (resolving every table, column and
+procedure) and returns the estimated plan, from which the estimated cost
+is taken; sp_describe_first_result_set returns the output columns.
+
+Batches that create and then read a #temp table cannot be compiled before
+the table exists: an "Invalid object name '#name'" error is reported as
+unverified rather than failed, but only when the batch itself creates
+#name (CREATE TABLE or SELECT ... INTO). sp_describe_first_result_set
+cannot describe some statements (dynamic SQL, temp tables); those compile
+without columns.
+
+A plan that cannot be read (e.g. XML cut short by the driver) leaves
+estimated_cost unset and is reported in CompileResult.warning.
+"""
+
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from typing import List, Optional, Set, Tuple
+
+SHOWPLAN_NS = '{http://schemas.microsoft.com/sqlserver/2004/07/showplan}'
+
+# Invalid object name '#Temp' - a temp table that does not exist yet
+_TEMP_TABLE_ERROR = re.compile(r"Invalid object name '(#[^']+)'")
+
+# Temp tables a batch creates: CREATE TABLE #t / SELECT ... INTO #t
+# (INSERT INTO and MERGE INTO need the table to exist already)
+_CREATE_TEMP_TABLE = re.compile(r"\bCREATE\s+TABLE\s+(#[\w@$#]+)", re.IGNORECASE)
+_INTO_TEMP_TABLE = re.compile(r"(\S+)\s+INTO\s+(#[\w@$#]+)", re.IGNORECASE)
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+
+
+@dataclass
+class CompileResult:
+    """Result of compiling one query"""
+    success: bool
+    error: str = None
+    verified: bool = True
+    columns: List[Tuple[str, str]] = None   # (name, type) of the first result set
+    estimated_cost: float = None
+    warning: str = None     # compiled, but the plan could not be read
+
+
+def estimated_cost(plans: List[str]) -> Optional[float]:
+    """
+    Sum of StatementSubTreeCost over the statements of the plan XML documents.
+    Raises ET.ParseError if a document is not well-formed, rather than
+    returning the cost of the remaining statements only.
+    """
+    total = None
+    for plan in plans:
+        root = ET.fromstring(plan)
+        for stmt in root.iter(SHOWPLAN_NS + 'StmtSimple'):
+            cost = stmt.get('StatementSubTreeCost')
+            if cost is not None:
+                total = (total or 0.0) + float(cost)
+    return total
+
+
+def _showplan(connection, query: str) -> List[str]:
+    """Compile `query` under SHOWPLAN_XML and return the plan documents"""
+    cursor = connection.cursor()
+    try:
+        # TDS 7.0 clients (conftest) get the plan as text, which is cut at TEXTSIZE
+        cursor.execute("SET TEXTSIZE 2147483647")
+        cursor.execute("SET SHOWPLAN_XML ON")
+        try:
+            cursor.execute(query)
+            plans = []
+            while True:
+                if cursor.description is not None:
+                    plans.extend(row[0] for row in cursor.fetchall() if row and row[0])
+                if not cursor.nextset():
+                    break
+            return plans
+        finally:
+            # The connection must never be left in showplan mode
+            cursor.execute("SET SHOWPLAN_XML OFF")
+    finally:
+        cursor.close()
+
+
+def _describe(connection, query: str) -> List[Tuple[str, str]]:
+    """Visible columns of the query's first result set"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("EXEC sp_describe_first_result_set @tsql = %s", (query,))
+        names = [d[0] for d in cursor.description]
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    hidden, name, type_name = (names.index('is_hidden'), names.index('name'),
+                               names.index('system_type_name'))
+    return [(row[name], row[type_name]) for row in rows if not row[hidden]]
+
+
+def created_temp_tables(query: str) -> Set[str]:
+    """Lower-cased names of the #temp tables `query` creates itself"""
+    query = _COMMENT.sub(' ', query)
+    names = set(_CREATE_TEMP_TABLE.findall(query))
+    names.update(name for before, name in _INTO_TEMP_TABLE.findall(query)
+                 if before.upper() not in ('INSERT', 'MERGE'))
+    return {name.lower() for name in names}
+
+
+def compile_query(connection, query: str) -> CompileResult:
+    """Validate `query` without executing it"""
+    try:
+        plans = _showplan(connection, query)
+    except Exception as e:
+        missing = _TEMP_TABLE_ERROR.search(str(e))
+        if missing and missing.group(1).lower() in created_temp_tables(query):
+            return CompileResult(success=True, verified=False)
+        return CompileResult(success=False, error=str(e))
+
+    cost, warning = None, None
+    try:
+        cost = estimated_cost(plans)
+    except ET.ParseError as e:
+        warning = f"unreadable showplan XML: {e}"
+    try:
+        columns = _describe(connection, query)
+    except Exception as e:
+        if 'could not be determined' in str(e):
+            # Compiled fine, only the output shape is unknown
+            return CompileResult(success=True, estimated_cost=cost, warning=warning)
+        return CompileResult(success=False, error=str(e), estimated_cost=cost, warning=warning)
+
+    return CompileResult(success=True, columns=columns, estimated_cost=cost, warning=warning)